@@ -21,16 +21,26 @@ import urllib.parse
 import re
 import json
 from collections import defaultdict
+from functools import lru_cache, partial
 import m3u_epg_editor as editor
-from jellyfin_export import generate_jellyfin_export, iter_m3u
+from jellyfin_export import (
+    ARTIFACT_ENCODINGS, PRECOMPRESSED_ARTIFACTS, _file_signature, generate_jellyfin_export, group_categories,
+    iter_m3u, stamp_m3u,
+)
+from jellyfin_pipeline import export_jellyfin_profile, export_jellyfin_profiles
 from jellyfin_vod_export import generate_vod_fixture, _safe
 from jellyfin_profiles import load_profiles, save_profile
-from jellyfin_vod_catalog import generate_vod_catalog, read_catalog_page
-from provider_mirrors import normalize_mirrors, normalize_origin, rewrite_provider_url
+from jellyfin_vod_catalog import (
+    PARSE_CACHE_FILE, VodParseCache, iter_catalog_archive, overrides_digest, read_catalog_page,
+)
+from provider_mirrors import ProviderRewriter, normalize_mirrors, normalize_origin
 from provider_health import probe_xtream_provider
+from xmltv_index import build_xmltv_index
+from epg_store import build_epg_store, store_path as epg_store_path
 from credential_crypto import decrypt_password, store_password
 from security_controls import rate_limit, redact_data, redact_secrets
 from plugin_repository import PACKAGE_NAME, build_manifest
+from single_flight import KeyedLock, SingleFlight
 
 # Setup DNS for the whole app
 editor.setup_custom_dns()
@@ -38,6 +48,11 @@ editor.setup_custom_dns()
 # ── Background job tracking ──────────────────────────────────────────────────
 _jobs: dict = {}
 _jobs_lock = threading.Lock()
+# Exports and analyses already running for the same playlist and parameters
+# are joined instead of started again
+_single_flight = SingleFlight()
+# Exports of one playlist write the same staging files, whatever their profiles
+_playlist_exports = KeyedLock()
 
 def _job_set(job_id: str, step: str, status: str = None, **kw):
     with _jobs_lock:
@@ -50,6 +65,24 @@ def _job_set(job_id: str, step: str, status: str = None, **kw):
             j['status'] = status
         j.update(kw)
 
+def _new_job(**kw) -> str:
+    """Purge jobs older than 30 minutes and register a new one; returns its id."""
+    cutoff = datetime.utcnow() - timedelta(minutes=30)
+    job_id = uuid.uuid4().hex[:10]
+    with _jobs_lock:
+        for k in [k for k, v in _jobs.items() if v['created'] < cutoff]:
+            del _jobs[k]
+        _jobs[job_id] = {
+            'status':   'running',
+            'step':     'Queued…',
+            'steps':    [],
+            'created':  datetime.utcnow(),
+            'analyzed': None,
+            'error':    None,
+            **kw,
+        }
+    return job_id
+
 
 # Load environment variables
 load_dotenv()
@@ -61,6 +94,7 @@ PLUGIN_REPOSITORY_DIR = STATIC_DIR / 'plugin-repository'
 TEMPLATES_DIR = BASE_DIR / 'templates'
 LOG_DIR = BASE_DIR / 'logs'
 SESSION_DIR = BASE_DIR / 'data' / 'sessions'
+ANALYSIS_ASSET_MAX_AGE = 365 * 24 * 3600
 
 # Ensure directories exist
 for directory in [STATIC_DIR, TEMPLATES_DIR, LOG_DIR, SESSION_DIR]:
@@ -328,39 +362,158 @@ def jellyfin_account():
         })
     return jsonify({'playlists': playlists})
 
-@app.route('/api/jellyfin/playlists/<path:playlist_name>/export', methods=['POST'])
-def jellyfin_api_export(playlist_name):
-    token = _integration_auth()
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
+def _vod_workers():
+    """Worker processes for VOD catalog exports (``M3UGUIDE_VOD_WORKERS``); 0 keeps them in-process."""
+    try:
+        return max(0, int(os.getenv('M3UGUIDE_VOD_WORKERS', '0')))
+    except ValueError:
+        return 0
+
+def _export_key(playlist_path, profiles, options, all_profiles=False):
+    """Single-flight key of a Jellyfin export: the playlist, its profiles and options.
+
+    ``all_profiles`` exports answer with another body, so they never join a
+    single-profile export, even of a playlist that has only one profile.
+    """
+    return ('jellyfin-export', str(playlist_path),
+            json.dumps([all_profiles, profiles, options], sort_keys=True, default=str))
+
+def _jellyfin_export_request(token, playlist_name):
+    """Resolve an export request to ``(key, export, None)``, or ``(None, None, error response)``.
+
+    ``export(progress=None)`` runs the export and returns the response body:
+    the manifest, or ``{'profiles': ...}`` for ``all_profiles``.
+    """
     playlist = Playlist.query.filter_by(user_id=token.user_id, name=playlist_name).first()
     if not playlist:
-        return jsonify({'error': 'Playlist not found'}), 404
+        return None, None, (jsonify({'error': 'Playlist not found'}), 404)
     playlist_path = playlist_manager.get_playlist_path(token.user_id, playlist.name)
-    requested_profile = str((request.get_json(silent=True) or {}).get('profile', 'default'))
+    body = request.get_json(silent=True) or {}
     profiles = load_profiles(playlist_path)
+    details = dict(playlist.details or {})
+    options = {
+        'stream_base': details.get('stream_base'),
+        'active_mirror': details.get('active_mirror'),
+        'vod_workers': _vod_workers(),
+    }
+    if body.get('all_profiles'):
+        # One playlist and XMLTV pass for every profile instead of one per profile
+        def export(progress=None):
+            return {'profiles': export_jellyfin_profiles(playlist_path, profiles, progress=progress, **options)}
+        return _export_key(playlist_path, profiles, options, all_profiles=True), export, None
+    requested_profile = str(body.get('profile', 'default'))
     if requested_profile not in profiles:
-        return jsonify({'error': 'Export profile not found'}), 404
+        return None, None, (jsonify({'error': 'Export profile not found'}), 404)
     profile = profiles[requested_profile]
-    details = dict(playlist.details or {})
-    source = (playlist_path / 'tv_edited.m3u') if (playlist_path / 'tv_edited.m3u').exists() else (playlist_path / 'tv.m3u')
-    manifest = generate_jellyfin_export(
-        playlist_path,
-        profile=requested_profile,
-        group_prefixes=tuple(profile.get('live_group_prefixes', [])),
-        stream_base=details.get('stream_base'),
-        active_mirror=details.get('active_mirror'),
+
+    def export(progress=None):
+        return export_jellyfin_profile(playlist_path, requested_profile, profile, progress=progress, **options)
+    return _export_key(playlist_path, {requested_profile: profile}, options), export, None
+
+_EXPORT_STAGES = {
+    'playlist': 'Scanning playlist…',
+    'xmltv': 'Trimming XMLTV guide…',
+    'vod': 'Publishing VOD catalog…',
+}
+# Latest progress of each running export, by single-flight key (guarded by _jobs_lock)
+_export_progress: dict = {}
+
+def _follow_export(job, progress):
+    """Copy an export's progress into a job waiting on it; the caller holds ``_jobs_lock``."""
+    if job['progress'].get('stage') != progress['stage']:
+        job['step'] = _EXPORT_STAGES.get(progress['stage'], progress['stage'])
+        job['steps'].append(job['step'])
+    job['progress'] = progress
+
+def _report_export_progress(key, stage, entries_scanned, bytes_written):
+    """Progress callback of a running export: every job waiting on ``key`` sees it,
+    including jobs that joined the export after it started."""
+    progress = {'stage': stage, 'entries_scanned': entries_scanned, 'bytes_written': bytes_written}
+    with _jobs_lock:
+        _export_progress[key] = progress
+        for job in _jobs.values():
+            if job.get('export_key') == key and job['status'] == 'running':
+                _follow_export(job, progress)
+
+def _run_export(key, export):
+    """Run ``export`` once per ``key`` at a time, and after any other export of the
+    same playlist, reporting its progress to the jobs waiting on it."""
+    _, playlist_path, _ = key
+
+    def run():
+        try:
+            with _playlist_exports.hold(playlist_path):
+                return export(progress=partial(_report_export_progress, key))
+        finally:
+            with _jobs_lock:
+                _export_progress.pop(key, None)
+    result, _ = _single_flight.do(key, run)
+    return result
+
+@app.route('/api/jellyfin/playlists/<path:playlist_name>/export', methods=['POST'])
+def jellyfin_api_export(playlist_name):
+    token = _integration_auth()
+    if not token:
+        return jsonify({'error': 'Unauthorized'}), 401
+    key, export, error = _jellyfin_export_request(token, playlist_name)
+    if error:
+        return error
+    return jsonify(_run_export(key, export))
+
+def _bg_jellyfin_export(app_ctx, job_id, key, export):
+    with app_ctx:
+        try:
+            if _single_flight.in_flight(key):
+                _job_set(job_id, 'Waiting for the export already running…')
+                with _jobs_lock:
+                    if key in _export_progress and job_id in _jobs:
+                        _follow_export(_jobs[job_id], _export_progress[key])
+            result = _run_export(key, export)
+            _job_set(job_id, 'Complete!', 'complete', result=result)
+        except Exception as e:
+            app.logger.error(f"Jellyfin export job error: {e}")
+            _job_set(job_id, f'Error: {str(e)}', 'error', error=str(e))
+
+@app.route('/api/jellyfin/playlists/<path:playlist_name>/export/jobs', methods=['POST'])
+def jellyfin_api_export_job(playlist_name):
+    """Start an export in the background; poll ``/api/jellyfin/export/jobs/<job_id>`` for it."""
+    token = _integration_auth()
+    if not token:
+        return jsonify({'error': 'Unauthorized'}), 401
+    key, export, error = _jellyfin_export_request(token, playlist_name)
+    if error:
+        return error
+    job_id = _new_job(
+        owner_id=token.user_id,
+        export_key=key,
+        progress={'stage': None, 'entries_scanned': 0, 'bytes_written': 0},
+        result=None,
     )
-    vod = generate_vod_catalog(
-        source,
-        playlist_path / 'exports' / 'jellyfin' / requested_profile,
-        profile,
-        overrides_path=playlist_path / 'vod-overrides.json',
-        stream_base=details.get('stream_base'),
-        active_mirror=details.get('active_mirror'),
+    t = threading.Thread(
+        target=_bg_jellyfin_export,
+        args=(app.app_context(), job_id, key, export),
+        daemon=True,
     )
-    manifest['vod'] = vod
-    return jsonify(manifest)
+    t.start()
+    return jsonify({'job_id': job_id, 'status_url': url_for('jellyfin_api_export_job_status', job_id=job_id)}), 202
+
+@app.route('/api/jellyfin/export/jobs/<job_id>')
+def jellyfin_api_export_job_status(job_id):
+    token = _integration_auth()
+    if not token:
+        return jsonify({'error': 'Unauthorized'}), 401
+    with _jobs_lock:
+        job = dict(_jobs.get(job_id) or {})
+    if not job or job.get('owner_id') != token.user_id:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'status':   job['status'],
+        'step':     job['step'],
+        'steps':    job['steps'][-10:],
+        'progress': job.get('progress'),
+        'result':   job.get('result'),
+        'error':    job.get('error'),
+    })
 
 @app.route('/api/jellyfin/playlists/<path:playlist_name>/profiles')
 def jellyfin_api_profiles(playlist_name):
@@ -374,7 +527,10 @@ def jellyfin_api_profiles(playlist_name):
 
 @app.route('/api/jellyfin/playlists/<path:playlist_name>/groups')
 def jellyfin_api_groups(playlist_name):
-    """Return selectable source groups and counts for each content kind."""
+    """Return selectable source groups and counts for each content kind.
+
+    Live groups also list the guide categories their channels get.
+    """
     token = _integration_auth()
     if not token:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -388,7 +544,7 @@ def jellyfin_api_groups(playlist_name):
 
     source_stat = source.stat()
     cache_path = playlist_path / 'jellyfin_groups.json'
-    signature = {'size': source_stat.st_size, 'mtime_ns': source_stat.st_mtime_ns}
+    signature = {'size': source_stat.st_size, 'mtime_ns': source_stat.st_mtime_ns, 'format': 2}
     if cache_path.exists():
         try:
             cached = json.loads(cache_path.read_text(encoding='utf-8'))
@@ -398,9 +554,12 @@ def jellyfin_api_groups(playlist_name):
             pass
 
     counts = {'live': defaultdict(int), 'movie': defaultdict(int), 'series': defaultdict(int)}
+    live_categories = {}
     for entry in iter_m3u(source):
         group = entry.attributes.get('group-title', '').strip() or 'Uncategorized'
         counts[entry.content_kind][group] += 1
+        if entry.content_kind == 'live' and group not in live_categories:
+            live_categories[group] = sorted(group_categories(entry.attributes.get('group-title', '')))
     raw_result = {
         kind: [
             {'name': name, 'count': count}
@@ -408,6 +567,8 @@ def jellyfin_api_groups(playlist_name):
         ]
         for kind, groups in counts.items()
     }
+    for group in raw_result['live']:
+        group['categories'] = live_categories[group['name']]
     cache_path.write_text(
         json.dumps({'source': signature, 'groups': raw_result}, ensure_ascii=False),
         encoding='utf-8',
@@ -471,7 +632,11 @@ def _load_vod_overrides(playlist_path):
 
 @app.route('/api/jellyfin/playlists/<path:playlist_name>/profiles/<string:profile_name>/vod/diagnostics')
 def jellyfin_api_vod_diagnostics(playlist_name, profile_name):
-    """Return paginated parse failures with stable IDs and saved corrections."""
+    """Return paginated parse failures with stable IDs and saved corrections.
+
+    ``overrides_pending`` is true when corrections were saved after the last
+    export parsed the playlist (per its parse cache), null when unknown.
+    """
     token = _integration_auth()
     if not token:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -493,7 +658,15 @@ def jellyfin_api_vod_diagnostics(playlist_name, profile_name):
         record['override'] = overrides.get(record['id'])
     manifest_path = diagnostics.parent / 'vod.manifest.json'
     manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
-    return jsonify({'items': records, 'next_cursor': next_cursor, 'counts': manifest.get('counts', {})})
+    parsed_with = VodParseCache.recorded_signature(playlist_path / PARSE_CACHE_FILE)
+    pending = (
+        parsed_with.get('overrides') != overrides_digest(playlist_path / 'vod-overrides.json')
+        if parsed_with else None
+    )
+    return jsonify({
+        'items': records, 'next_cursor': next_cursor, 'counts': manifest.get('counts', {}),
+        'overrides_pending': pending,
+    })
 
 
 @app.route('/api/jellyfin/playlists/<path:playlist_name>/vod/overrides/<string:item_id>', methods=['PUT', 'DELETE'])
@@ -588,7 +761,7 @@ def jellyfin_api_provider_health(playlist_name):
         if source.exists():
             first = next(iter_m3u(source), None)
             if first:
-                media_url = rewrite_provider_url(first.url, details.get('stream_base'), origin)
+                media_url = ProviderRewriter(details.get('stream_base'), origin)(first.url)
         result = probe_xtream_provider(
             origin,
             username,
@@ -632,10 +805,70 @@ def jellyfin_api_vod_page(playlist_name, profile_name):
     except ValueError:
         return jsonify({'error': 'cursor and limit must be integers'}), 400
     export_path = playlist_manager.get_playlist_path(token.user_id, playlist.name) / 'exports' / 'jellyfin' / profile_name
-    catalog = export_path / 'vod.catalog.jsonl'
     manifest_path = export_path / 'vod.manifest.json'
+    if not manifest_path.exists():
+        return jsonify({'error': 'VOD manifest not found; generate the export first'}), 404
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    catalog = export_path / manifest.get('catalog_file', 'vod.catalog.jsonl')
+    if not catalog.exists():
+        return jsonify({'error': 'VOD catalog not found; generate the export first'}), 404
+    revision = manifest.get('revision', '')
+    expected_revision = request.args.get('revision')
+    if expected_revision and expected_revision != revision:
+        return jsonify({
+            'error': 'VOD catalog revision changed; restart synchronization',
+            'revision': revision,
+        }), 409
+    records, next_cursor = read_catalog_page(catalog, cursor, limit)
+    return jsonify({
+        'items': records,
+        'next_cursor': next_cursor,
+        'revision': revision,
+        'total_records': manifest.get('records'),
+    })
+
+@app.route('/api/jellyfin/playlists/<path:playlist_name>/profiles/<string:profile_name>/vod/archive')
+def jellyfin_api_vod_archive(playlist_name, profile_name):
+    """Stream the whole VOD library of a catalog revision as one zip."""
+    token = _integration_auth()
+    if not token:
+        return jsonify({'error': 'Unauthorized'}), 401
+    playlist = Playlist.query.filter_by(user_id=token.user_id, name=playlist_name).first()
+    if not playlist:
+        return jsonify({'error': 'Playlist not found'}), 404
+    export_path = playlist_manager.get_playlist_path(token.user_id, playlist.name) / 'exports' / 'jellyfin' / profile_name
+    manifest_path = export_path / 'vod.manifest.json'
+    if not manifest_path.exists():
+        return jsonify({'error': 'VOD manifest not found; generate the export first'}), 404
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    catalog = export_path / manifest.get('catalog_file', 'vod.catalog.jsonl')
     if not catalog.exists():
         return jsonify({'error': 'VOD catalog not found; generate the export first'}), 404
+    response = app.response_class(iter_catalog_archive(catalog), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{secure_filename(profile_name)}-vod.zip"'
+    # The revision lets a client continue with /vod/delta?since=<revision>
+    response.set_etag(manifest.get('revision', ''))
+    return response
+
+@app.route('/api/jellyfin/playlists/<path:playlist_name>/profiles/<string:profile_name>/vod/delta')
+def jellyfin_api_vod_delta(playlist_name, profile_name):
+    """Page through the records added, changed or removed since ``since``."""
+    token = _integration_auth()
+    if not token:
+        return jsonify({'error': 'Unauthorized'}), 401
+    playlist = Playlist.query.filter_by(user_id=token.user_id, name=playlist_name).first()
+    if not playlist:
+        return jsonify({'error': 'Playlist not found'}), 404
+    since = request.args.get('since', '')
+    if not since:
+        return jsonify({'error': 'since must name a previously synchronized revision'}), 400
+    try:
+        cursor = max(0, int(request.args.get('cursor', '0')))
+        limit = min(1000, max(1, int(request.args.get('limit', '500'))))
+    except ValueError:
+        return jsonify({'error': 'cursor and limit must be integers'}), 400
+    export_path = playlist_manager.get_playlist_path(token.user_id, playlist.name) / 'exports' / 'jellyfin' / profile_name
+    manifest_path = export_path / 'vod.manifest.json'
     if not manifest_path.exists():
         return jsonify({'error': 'VOD manifest not found; generate the export first'}), 404
     manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
@@ -646,8 +879,81 @@ def jellyfin_api_vod_page(playlist_name, profile_name):
             'error': 'VOD catalog revision changed; restart synchronization',
             'revision': revision,
         }), 409
-    records, next_cursor = read_catalog_page(catalog, cursor, limit)
-    return jsonify({'items': records, 'next_cursor': next_cursor, 'revision': revision})
+    response = {
+        'since': since,
+        'revision': revision,
+        'remove_missing': manifest.get('remove_missing', True),
+    }
+    if since == revision:
+        return jsonify({**response, 'items': [], 'next_cursor': None})
+    delta = manifest.get('delta') or {}
+    delta_path = export_path / 'vod.delta.jsonl'
+    if delta.get('from') != since or not delta_path.exists():
+        return jsonify({
+            'error': 'No delta from that revision; run a full synchronization',
+            'revision': revision,
+        }), 409
+    records, next_cursor = read_catalog_page(delta_path, cursor, limit)
+    return jsonify({**response, 'items': records, 'next_cursor': next_cursor})
+
+@lru_cache(maxsize=256)
+def _manifest_artifacts(path, mtime_ns, size):
+    try:
+        manifest = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return {
+        name: (artifact.get('bytes'), artifact.get('mtime_ns'), artifact.get('sha256'))
+        for name, artifact in (manifest.get('artifacts') or {}).items()
+    }
+
+def _artifact_etag(directory, filename):
+    """The artifact's SHA-256 from the export manifest, so a republish of the
+    same bytes keeps its ETag; None when the manifest does not describe the
+    file on disk, i.e. a different size or mtime (e.g. mid-publish)."""
+    manifest = directory / 'manifest.json'
+    try:
+        stat = manifest.stat()
+        # A manifest rewritten in place gets a new mtime or size, and a new cache entry
+        artifacts = _manifest_artifacts(str(manifest), stat.st_mtime_ns, stat.st_size)
+        size, mtime_ns, digest = artifacts.get(filename, (None, None, None))
+        artifact = (directory / filename).stat()
+        if digest and (size, mtime_ns) == (artifact.st_size, artifact.st_mtime_ns):
+            return digest[:32]
+    except OSError:
+        pass
+    return None
+
+# Last signature of each playlist file served on the stream routes, so an
+# unchanged file is hashed once rather than on every poll
+_stream_signatures = {}
+
+def _stream_file_etag(path):
+    """A content-derived ETag for a playlist file that has no export manifest."""
+    signature = _file_signature(Path(path), _stream_signatures.get(path))
+    _stream_signatures[path] = signature
+    return signature['sha256'][:32]
+
+def _send_export_artifact(directory, filename):
+    """Send an export artifact, or its precompressed sibling when the client
+    accepts that encoding; the sibling is sent as-is with its own length.
+    Matching If-None-Match/If-Modified-Since requests get a 304. Files the
+    manifest does not describe get Werkzeug's own mtime/size ETag."""
+    etag = _artifact_etag(directory, filename) or True
+    if filename not in PRECOMPRESSED_ARTIFACTS:
+        return send_from_directory(directory, filename, etag=etag)
+    for encoding, suffix in ARTIFACT_ENCODINGS:
+        if request.accept_encodings[encoding] and (directory / f'{filename}{suffix}').exists():
+            response = send_from_directory(
+                directory, f'{filename}{suffix}', download_name=filename,
+                etag=f'{etag}-{encoding}' if etag is not True else True,
+            )
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, etag=etag)
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/api/jellyfin/playlists/<path:playlist_name>/artifacts/<string:filename>')
 def jellyfin_api_artifact(playlist_name, filename):
@@ -665,7 +971,7 @@ def jellyfin_api_artifact(playlist_name, filename):
     artifact_dir = root if filename == 'vod-fixture.zip' else root / profile_name
     if not (artifact_dir / filename).exists():
         return jsonify({'error': 'Artifact not found; generate the export first'}), 404
-    return send_from_directory(artifact_dir, filename)
+    return _send_export_artifact(artifact_dir, filename)
 
 @app.route('/api/jellyfin/token', methods=['DELETE'])
 def jellyfin_revoke_token():
@@ -752,6 +1058,10 @@ def _bg_process_playlist(app_ctx, job_id, user_id, name, source, form_data, file
                          error='Failed to fetch playlist from provider')
                 return
 
+            prog('Stamping playlist entries…')
+            _stamp_playlist(m3u_path)
+            prog('Indexing EPG guide…')
+            _index_epg(epg_path)
             prog('Saving to library…')
             playlist_manager.add_playlist(user_id, playlist_data)
 
@@ -787,22 +1097,7 @@ def process_playlist():
         f = request.files[key]
         files_data[key] = {'filename': secure_filename(f.filename), 'content': f.read()}
 
-    # Purge stale jobs (> 30 min)
-    cutoff = datetime.utcnow() - timedelta(minutes=30)
-    with _jobs_lock:
-        for k in [k for k, v in _jobs.items() if v['created'] < cutoff]:
-            del _jobs[k]
-
-    job_id = uuid.uuid4().hex[:10]
-    with _jobs_lock:
-        _jobs[job_id] = {
-            'status':   'running',
-            'step':     'Queued…',
-            'steps':    [],
-            'created':  datetime.utcnow(),
-            'analyzed': None,
-            'error':    None,
-        }
+    job_id = _new_job(owner_id=user_id)
 
     t = threading.Thread(
         target=_bg_process_playlist,
@@ -819,7 +1114,7 @@ def job_status(job_id):
         return jsonify({'error': 'Unauthorized'}), 403
     with _jobs_lock:
         job = dict(_jobs.get(job_id) or {})
-    if not job:
+    if not job or job.get('owner_id') != session['user_id']:
         return jsonify({'error': 'Job not found'}), 404
     return jsonify({
         'status':   job['status'],
@@ -830,6 +1125,19 @@ def job_status(job_id):
     })
 
 # Create a new internal function for analysis
+def _run_analyzer(analyzer_script, m3u_path, epg_path, analysis_dir):
+    """Run the analyzer script, or wait for the run already in progress for this playlist."""
+    result, _ = _single_flight.do(
+        ('analyze', str(analysis_dir)),
+        subprocess.run,
+        [sys.executable, str(analyzer_script), str(m3u_path), str(epg_path)],
+        cwd=str(analysis_dir),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result
+
 def analyze_playlist_internal(user_id, playlist_name):
     """Internal function to analyze playlist without HTTP request handling"""
     playlist = Playlist.query.filter_by(user_id=user_id, name=playlist_name).first()
@@ -851,13 +1159,7 @@ def analyze_playlist_internal(user_id, playlist_name):
         raise FileNotFoundError('Required files not found for analysis')
 
     # Run analyzer script
-    result = subprocess.run(
-        [sys.executable, str(analyzer_script), str(m3u_path), str(epg_path)],
-        cwd=str(analysis_dir),
-        capture_output=True,
-        text=True,
-        check=True
-    )
+    result = _run_analyzer(analyzer_script, m3u_path, epg_path, analysis_dir)
 
     # Process command data and update playlist just like in analyze_playlist route
     command_file = analysis_dir / 'command.json'
@@ -1072,6 +1374,34 @@ def process_m3u_file(files, m3u_path, epg_path, details):
         app.logger.error(f"M3U File processing error: {str(e)}")
         return False
 
+def _stamp_playlist(m3u_path):
+    """Stamp each entry's content kind and stable ID into the downloaded playlist."""
+    if not m3u_path.exists():
+        return
+    try:
+        stamp_m3u(m3u_path)
+    except Exception as error:
+        # Readers classify and hash unstamped entries themselves
+        app.logger.warning('Playlist entries not stamped for %s: %s', m3u_path, error)
+
+def _index_epg(epg_path):
+    """Build the byte-range index, and the SQLite store when enabled, that
+    guide consumers query instead of parsing the whole file."""
+    if not epg_path.exists():
+        return
+    try:
+        build_xmltv_index(epg_path)
+    except Exception as error:
+        # Exports fall back to parsing the whole guide
+        app.logger.warning('XMLTV index not built for %s: %s', epg_path, error)
+    if os.getenv('M3UGUIDE_EPG_STORE', '').strip().lower() not in ('1', 'true', 'yes'):
+        epg_store_path(epg_path).unlink(missing_ok=True)
+        return
+    try:
+        build_epg_store(epg_path)
+    except Exception as error:
+        app.logger.warning('EPG store not built for %s: %s', epg_path, error)
+
 def download_file(url, path):
     """Use the robust editor download logic with enhanced headers and DNS"""
     headers = {
@@ -1119,9 +1449,18 @@ def serve_analysis_file(user_id, playlist_name, filename):
     try:
         # Construct the relative path from the static directory
         relative_path = f'playlists/{user_id}/{secure_filename(playlist_name)}/analysis/{filename}'
-        
+
+        # Versioned assets and data shards (?v=<content hash>) never change
+        # under the same URL, so the browser may keep them
+        max_age = ANALYSIS_ASSET_MAX_AGE if request.args.get('v') else None
+
         # Use send_from_directory with the static folder
-        return send_from_directory(app.static_folder, relative_path)
+        response = send_from_directory(app.static_folder, relative_path, max_age=max_age)
+        if max_age:
+            # Per-user content: only the browser cache, never a shared proxy
+            response.cache_control.public = False
+            response.cache_control.private = True
+        return response
     except Exception as e:
         app.logger.error(f"Error serving analysis file: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -1325,13 +1664,7 @@ def analyze_playlist():
             return jsonify({'error': 'Required files not found for analysis'}), 400
 
         # Run analyzer script
-        result = subprocess.run(
-            [sys.executable, str(analyzer_script), str(m3u_path), str(epg_path)],
-            cwd=str(analysis_dir),
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        result = _run_analyzer(analyzer_script, m3u_path, epg_path, analysis_dir)
 
         # Read the command data
         command_file = analysis_dir / 'command.json'
@@ -1444,7 +1777,10 @@ def optimize_playlist():
         env['PYTHONPATH'] = str(BASE_DIR)
 
         try:
-            result = subprocess.run(
+            # Same output directory and groups: join a run already in progress
+            result, _ = _single_flight.do(
+                ('optimize', str(optimized_dir), groups),
+                subprocess.run,
                 command_parts,
                 capture_output=True,
                 text=True,
@@ -1517,7 +1853,7 @@ def stream_playlist_file(token, playlist_name, filetype):
         file_path = os.path.join(app.static_folder, relative_path)
         if not os.path.exists(file_path):
             return jsonify({'error': 'File not found'}), 404
-        response = send_from_directory(app.static_folder, relative_path)
+        response = send_from_directory(app.static_folder, relative_path, etag=_stream_file_etag(file_path))
         response.headers['Access-Control-Allow-Origin'] = '*'
         return response
     except Exception as e:
@@ -1544,15 +1880,17 @@ def export_playlist_for_jellyfin(user_id, playlist_name):
             + f'/stream/{user.stream_token}/{safe_name}/jellyfin'
         )
         playlist_path = playlist_manager.get_playlist_path(user_id, playlist_name)
-        manifest = generate_jellyfin_export(
-            playlist_path,
-            public_base_url=public_base,
-        )
-        vod_counts = generate_vod_fixture(
-            (playlist_path / 'tv_edited.m3u') if (playlist_path / 'tv_edited.m3u').exists()
-            else (playlist_path / 'tv.m3u'),
-            playlist_path / 'exports' / 'jellyfin' / 'vod-fixture',
-        )
+        with _playlist_exports.hold(str(playlist_path)):
+            manifest = generate_jellyfin_export(
+                playlist_path,
+                public_base_url=public_base,
+            )
+            vod_counts = generate_vod_fixture(
+                (playlist_path / 'tv_edited.m3u') if (playlist_path / 'tv_edited.m3u').exists()
+                else (playlist_path / 'tv.m3u'),
+                playlist_path / 'exports' / 'jellyfin' / 'vod-fixture',
+                tree=False,
+            )
         manifest['vod'] = {
             'counts': vod_counts,
             'package_url': f'{public_base}/vod-fixture.zip',
@@ -1584,7 +1922,7 @@ def stream_jellyfin_export(token, playlist_name, filename):
     export_dir = export_root if filename == 'vod-fixture.zip' else export_root / 'default'
     if not (export_dir / filename).exists():
         return jsonify({'error': 'Artifact not found'}), 404
-    response = send_from_directory(export_dir, filename)
+    response = _send_export_artifact(export_dir, filename)
     response.headers['Access-Control-Allow-Origin'] = '*'
     return response
 
@@ -1847,7 +2185,7 @@ def detect_stream_base(m3u_path):
 
 def apply_mirror_substitution(content, stream_base, active_mirror):
     """Substitute the stream base URL with the active mirror in M3U content."""
-    return rewrite_provider_url(content, stream_base, active_mirror)
+    return ProviderRewriter(stream_base, active_mirror)(content)
     # Proxy-wrapped URLs encode only the colon: http%3A//hostname — use safe='/'
 
 
@@ -2021,6 +2359,8 @@ def refresh_source(user_id, playlist_name):
         else:
             return jsonify({'error': f'Unknown source type: {source}'}), 400
 
+        _stamp_playlist(m3u_path)
+        _index_epg(epg_path)
         playlist.last_sync = datetime.utcnow()
         db.session.commit()
 
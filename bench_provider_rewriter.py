@@ -0,0 +1,60 @@
+"""Benchmark per-entry provider URL rewriting against the one-off function.
+
+Run with ``python bench_provider_rewriter.py``. Exports rewrite every stream
+URL against the same source and active origins; ``rewrite_provider_url``
+normalizes and percent-encodes both origins on each call, while a
+``ProviderRewriter`` does that once per export. The corpus mixes direct
+Xtream URLs, proxy-wrapped ones and URLs on other hosts. Every URL is checked
+for identical output before timing.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from urllib.parse import quote
+
+from provider_mirrors import ProviderRewriter, rewrite_provider_url
+
+
+SOURCE = "http://line.provider.example:8080"
+ACTIVE = "https://mirror.provider.example"
+KINDS = ["live", "movie", "series"]
+
+
+def corpus(size: int = 200000, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    urls = []
+    for number in range(size):
+        path = f"/{rng.choice(KINDS)}/user/pass/{number}.{rng.choice(['ts', 'mkv', 'mp4'])}"
+        style = rng.randrange(10)
+        if style < 7:
+            urls.append(SOURCE + path)
+        elif style < 9:
+            urls.append("https://guide.example/stream_proxy?url=" + quote(SOURCE + path, safe="/"))
+        else:
+            urls.append("http://other.example" + path)
+    return urls
+
+
+def _timed(rewrite, urls) -> float:
+    started = time.perf_counter()
+    for url in urls:
+        rewrite(url)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    urls = corpus()
+    rewriter = ProviderRewriter(SOURCE, ACTIVE)
+    mismatches = [url for url in urls if rewriter(url) != rewrite_provider_url(url, SOURCE, ACTIVE)]
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} URLs differ, e.g. {mismatches[0]!r}")
+    before = _timed(lambda url: rewrite_provider_url(url, SOURCE, ACTIVE), urls)
+    after = _timed(rewriter, urls)
+    print(f"{len(urls)} URLs   per call {before / len(urls) * 1e9:>6,.0f} ns"
+          f"   rewriter {after / len(urls) * 1e9:>6,.0f} ns   x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
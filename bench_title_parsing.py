@@ -0,0 +1,185 @@
+"""Benchmark the shared title parser against the code it replaced.
+
+Run with ``python bench_title_parsing.py [playlist.m3u]`` from a git checkout.
+The old implementations are not copies: the analyzer and
+``jellyfin_vod_export`` are loaded as they were in the parent of the commit
+that added ``title_parsing.py``, and both sides are called through the same
+entry points (``parse_series_info``, ``_episode_info``, ``_movie_info`` and
+``_lazy_group_data``). Every title is checked for identical results before
+timing, so the numbers only count if the parser still behaves like the old
+code.
+
+The sample is the VOD entries of the given playlist, by default the retained
+StreamvisionTV fixture. Without one, a synthetic catalog is generated in which
+every title is distinct, as in a real provider listing, so the memoization
+does not inflate the numbers. Caches are cleared before each timed run; the
+"cached" column repeats the new run with the caches kept.
+"""
+
+from __future__ import annotations
+
+import itertools
+from pathlib import Path
+import re
+import subprocess
+import sys
+import time
+import types
+
+from jellyfin_export import M3uEntry, iter_m3u
+import jellyfin_vod_export
+import title_parsing
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_PLAYLIST = ROOT / "testdata" / "private" / "StreamvisionTV" / "tv.m3u"
+ANALYZER = "m3u_analyzer_beefy-new.py"
+
+SHOWS = [
+    "The Office (US)", "Breaking Bad", "Salcedo (2026) (CO)", "Money Heist", "Dark", "Stranger Things",
+    "One Piece", "La Casa de Papel", "Daily Show", "Ted Lasso", "Doctor Who (2005)", "Planet Earth III",
+    "Sherlock", "The Bear", "Succession", "Slow Horses", "Severance", "Shogun (2024)", "Bluey", "Reacher",
+]
+PREFIXES = ["", "NF - ", "AMZ - ", "4K-AMZ - ", "US: ", "UK| ", "EN - ", "TOP - ", "HULU - "]
+FORMATS = [
+    "{show} S{s:02d}E{e:02d} - Episode {e}",
+    "{show} S{s:02d} E{e:02d}",
+    "{show} Season {s} Episode {e} - Title {e}",
+    "{show} Saison {s} Épisode {e} - Titre {e}",
+    "{show} {s}x{e:02d} - Title {e}",
+    "{show} (2024) (US) S{s:02d}E{e:02d} - NF - {show} (2024) (US) - S{s:02d}E{e:02d} - Part {e}",
+]
+MOVIE_TITLES = [
+    "Film", "Dune Part Two", "Oppenheimer", "Heat", "Amélie", "Blade Runner 2049", "Up", "The Matrix",
+    "Alien", "Arrival", "Casablanca", "Parasite", "Roma", "Whiplash", "Jaws", "Vertigo",
+]
+
+
+def _entry(title: str) -> M3uEntry:
+    return M3uEntry(f"#EXTINF:-1,{title}", "", {})
+
+
+def synthetic_sample() -> list[M3uEntry]:
+    """A catalog of distinct titles: every episode of every show once, plus movies."""
+    series = [
+        prefix + fmt.format(show=show, s=s, e=e)
+        for (prefix, show), fmt, s, e in itertools.product(
+            zip(itertools.cycle(PREFIXES), SHOWS), FORMATS, range(1, 6), range(1, 25))
+    ]
+    movies = [
+        f"{prefix}{title} ({year})"
+        for prefix, title, year in itertools.product(PREFIXES, MOVIE_TITLES, range(1990, 2026))
+    ]
+    return [_entry(title) for title in series + movies]
+
+
+def playlist_sample(path: Path) -> list[M3uEntry]:
+    return [entry for entry in iter_m3u(path) if entry.content_kind in ("movie", "series")]
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(["git", *args], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+
+
+def legacy_module(path: str, name: str) -> types.ModuleType:
+    """``path`` as it was just before ``title_parsing.py`` was added."""
+    added = _git("log", "--diff-filter=A", "--format=%H", "-1", "--", "title_parsing.py").strip()
+    source = _git("show", f"{added}~1:{path}")
+    module = types.ModuleType(name)
+    module.__file__ = str(ROOT / path)
+    sys.modules[name] = module
+    exec(compile(source, f"{added[:12]}~1:{path}", "exec"), module.__dict__)
+    return module
+
+
+def current_analyzer() -> types.ModuleType:
+    module = types.ModuleType("m3u_analyzer")
+    module.__file__ = str(ROOT / ANALYZER)
+    sys.modules[module.__name__] = module
+    exec(compile((ROOT / ANALYZER).read_text(encoding="utf-8"), ANALYZER, "exec"), module.__dict__)
+    return module
+
+
+def _markers(data: dict) -> list:
+    """``_lazy_group_data`` output without the raw names, which the marker change does not touch."""
+    return sorted(
+        (series, season, episode["ep"])
+        for series, seasons in data.items() for season, episodes in seasons.items() for episode in episodes
+    )
+
+
+# The one intended change: the lazy pages now also read "S01 E02" like "S01E02"
+_SPACED_MARKER = re.compile(r"([Ss]\d+)\s+([Ee]\d+)")
+
+
+def check(old_analyzer, new_analyzer, old_vod, entries: list[M3uEntry]) -> None:
+    for entry in {entry.extinf: entry for entry in entries}.values():
+        title = entry.extinf.rsplit(",", 1)[-1].strip()
+        pairs = [
+            ("parse_series_info", old_analyzer.parse_series_info(title), new_analyzer.parse_series_info(title)),
+            ("_episode_info", old_vod._episode_info(entry), jellyfin_vod_export._episode_info(entry)),
+            ("_movie_info", old_vod._movie_info(entry), jellyfin_vod_export._movie_info(entry)),
+            (
+                "_lazy_group_data",
+                _markers(old_analyzer._lazy_group_data([{"name": _SPACED_MARKER.sub(r"\1\2", title)}], True)),
+                _markers(new_analyzer._lazy_group_data([{"name": title}], True)),
+            ),
+        ]
+        for function, old, new in pairs:
+            if old != new:
+                raise AssertionError(f"{function}({title!r}): {old!r} != {new!r}")
+
+
+def _clear_caches() -> None:
+    for parser in (title_parsing.parse_series_title, title_parsing.parse_episode_title,
+                   title_parsing.parse_movie_title, title_parsing.parse_episode_marker):
+        parser.cache_clear()
+
+
+def _timed(function, items, cold: bool = True) -> float:
+    if cold:
+        _clear_caches()
+    started = time.perf_counter()
+    function(items)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    playlist = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PLAYLIST
+    if playlist.exists():
+        entries = playlist_sample(playlist)
+        print(f"{len(entries)} VOD entries from {playlist}")
+    else:
+        entries = synthetic_sample()
+        print(f"{len(entries)} synthetic titles ({playlist} not found)")
+    titles = [entry.extinf.rsplit(",", 1)[-1].strip() for entry in entries]
+    print(f"{len(set(titles))} distinct titles")
+
+    old_analyzer = legacy_module(ANALYZER, "legacy_m3u_analyzer")
+    old_vod = legacy_module("jellyfin_vod_export.py", "legacy_jellyfin_vod_export")
+    new_analyzer = current_analyzer()
+    check(old_analyzer, new_analyzer, old_vod, entries)
+    print("old and new results are identical")
+
+    channels = [{"name": title} for title in titles]
+    runs = [
+        ("series grouping", lambda module: lambda items: [module.parse_series_info(t) for t in items], titles,
+         old_analyzer, new_analyzer),
+        ("jellyfin episodes", lambda module: lambda items: [module._episode_info(e) for e in items], entries,
+         old_vod, jellyfin_vod_export),
+        ("jellyfin movies", lambda module: lambda items: [module._movie_info(e) for e in items], entries,
+         old_vod, jellyfin_vod_export),
+        ("lazy page markers", lambda module: lambda items: module._lazy_group_data(items, True), channels,
+         old_analyzer, new_analyzer),
+    ]
+    for label, call, items, old, new in runs:
+        before = min(_timed(call(old), items) for _ in range(3))
+        after = min(_timed(call(new), items) for _ in range(3))
+        # A second pass over the same titles, as in another profile's export or a later sync
+        warm = min(_timed(call(new), items, cold=False) for _ in range(3))
+        print(f"{label:18} old {len(items) / before:>10,.0f}/s   new {len(items) / after:>10,.0f}/s"
+              f"   x{before / after:.1f}   cached x{before / warm:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Helpers shared by the test modules."""
+
+import threading
+from unittest import mock
+
+import single_flight
+
+
+class WatchJoiners:
+    """Patch the events ``SingleFlight`` calls wait on, so a test can block until callers have joined."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.joined = 0
+        watcher = self
+
+        class WatchedEvent(threading.Event):
+            def wait(self, timeout=None):
+                with watcher.condition:
+                    watcher.joined += 1
+                    watcher.condition.notify_all()
+                return super().wait(timeout)
+
+        self.patch = mock.patch.object(single_flight, "Event", WatchedEvent)
+
+    def __enter__(self):
+        self.patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.patch.stop()
+
+    def wait_for(self, count, timeout=5):
+        """True once ``count`` callers wait on a running call."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.joined >= count, timeout)
@@ -0,0 +1,274 @@
+"""SQLite store of an XMLTV file's channels and programmes.
+
+Every consumer of ``epg.xml`` (Jellyfin guide trims, the EPG editor and the
+analyzer's match check) otherwise parses the whole document. When enabled,
+the store is built once, when the guide is downloaded, with programmes
+indexed on ``(channel, start)``, so those consumers run indexed queries for
+the channels and time window they need. Elements are stored as their
+serialized XML, so rebuilt guides match a full parse. A store that no longer
+matches the guide's size and mtime is ignored, and callers fall back to
+parsing the file.
+"""
+
+from __future__ import annotations
+
+import calendar
+from pathlib import Path
+import re
+import sqlite3
+from typing import Iterable, Iterator
+
+from lxml import etree
+
+
+STORE_VERSION = 1
+# Stored elements are parsed together up to this many bytes
+MAX_CHUNK_BYTES = 8 * 1024 * 1024
+_BATCH_ROWS = 5000
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE channels (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    folded TEXT NOT NULL,
+    xml BLOB NOT NULL
+);
+CREATE TABLE programmes (
+    seq INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    folded TEXT NOT NULL,
+    start INTEGER,
+    stop INTEGER,
+    xml BLOB NOT NULL
+);
+CREATE TABLE categories (
+    programme INTEGER NOT NULL REFERENCES programmes (seq),
+    category TEXT NOT NULL
+);
+"""
+# Created after the bulk load, which is much faster than maintaining them
+_INDEXES = """
+CREATE INDEX channels_folded ON channels (folded);
+CREATE INDEX programmes_channel_start ON programmes (folded, start);
+CREATE INDEX programmes_raw_channel ON programmes (channel);
+CREATE INDEX categories_category ON categories (category, programme);
+"""
+_XMLTV_TIME = re.compile(
+    r"\s*(\d{4})(\d\d)(\d\d)(\d\d)?(\d\d)?(\d\d)?(?:\.\d+)?\s*(?:([+-])(\d\d):?(\d\d))?"
+)
+
+
+def store_path(source: Path) -> Path:
+    return Path(source).with_name(f"{Path(source).name}.sqlite3")
+
+
+def xmltv_timestamp(value: str | None) -> int | None:
+    """Seconds since the epoch for an XMLTV time such as ``20240101120000 +0100``.
+
+    Times without an offset are taken as UTC. Returns None when ``value``
+    cannot be read.
+    """
+    match = _XMLTV_TIME.match(value or "")
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, sign, offset_hours, offset_minutes = match.groups()
+    try:
+        seconds = calendar.timegm((
+            int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+        ))
+    except (OverflowError, ValueError):
+        return None
+    if sign:
+        offset = int(offset_hours) * 3600 + int(offset_minutes) * 60
+        seconds -= offset if sign == "+" else -offset
+    return seconds
+
+
+def build_epg_store(source: Path) -> Path | None:
+    """Load ``source`` into its store, replacing any previous one.
+
+    Returns the store path, or None (removing any old store) when the file
+    has no channels or programmes to store.
+    """
+    source = Path(source)
+    destination = store_path(source)
+    stat = source.stat()
+    staged = destination.with_name(f".{destination.name}.tmp")
+    staged.unlink(missing_ok=True)
+    connection = sqlite3.connect(str(staged))
+    try:
+        connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + _SCHEMA)
+        stored = _load(connection, source)
+        if stored:
+            connection.executescript(_INDEXES)
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", (
+                ("version", STORE_VERSION),
+                ("bytes", stat.st_size),
+                ("mtime_ns", stat.st_mtime_ns),
+            ))
+            connection.commit()
+    finally:
+        connection.close()
+    if not stored:
+        staged.unlink(missing_ok=True)
+        destination.unlink(missing_ok=True)
+        return None
+    staged.replace(destination)
+    return destination
+
+
+def _load(connection: sqlite3.Connection, source: Path) -> int:
+    channels, programmes, categories = [], [], []
+
+    def flush():
+        connection.executemany("INSERT INTO channels VALUES (?, ?, ?, ?)", channels)
+        connection.executemany("INSERT INTO programmes VALUES (?, ?, ?, ?, ?, ?)", programmes)
+        connection.executemany("INSERT INTO categories VALUES (?, ?)", categories)
+        channels.clear()
+        programmes.clear()
+        categories.clear()
+
+    def add(element):
+        nonlocal seq
+        seq += 1
+        xml = etree.tostring(element, encoding="utf-8")
+        if etree.QName(element).localname == "channel":
+            channel = element.get("id") or ""
+            channels.append((seq, channel, channel.strip().casefold(), xml))
+        else:
+            channel = element.get("channel") or ""
+            programmes.append((
+                seq, channel, channel.strip().casefold(),
+                xmltv_timestamp(element.get("start")), xmltv_timestamp(element.get("stop")), xml,
+            ))
+            categories.extend(
+                (seq, category.text.strip())
+                for category in element.iterchildren("category")
+                if category.text and category.text.strip()
+            )
+        if len(channels) + len(programmes) >= _BATCH_ROWS:
+            flush()
+
+    # An element's whitespace tail may not be parsed yet at its end event,
+    # so each one is stored at the next element's event.
+    seq = 0
+    pending = None
+    for _, element in etree.iterparse(
+        str(source), events=("end",), tag=("channel", "programme"), recover=True, huge_tree=True
+    ):
+        if pending is not None:
+            add(pending)
+        pending = element
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+    if pending is not None:
+        add(pending)
+    flush()
+    return seq
+
+
+def load_epg_store(source: Path) -> "EpgStore | None":
+    """The store for ``source`` if one exists and still matches the file."""
+    source = Path(source)
+    path = store_path(source)
+    try:
+        stat = source.stat()
+        if not path.exists():
+            return None
+        store = EpgStore(path)
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        meta = dict(store.connection.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error:
+        meta = {}
+    if meta != {"version": STORE_VERSION, "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}:
+        store.close()
+        return None
+    return store
+
+
+class EpgStore:
+    """Read-only queries against a built store."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "EpgStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def programme_channel_ids(self) -> set[str]:
+        """The ``channel`` attribute of every programme, as written in the guide."""
+        return {row[0] for row in self.connection.execute("SELECT DISTINCT channel FROM programmes")}
+
+    def latest_start(self, folded_ids: Iterable[str]) -> int | None:
+        """The latest programme start of ``folded_ids``, whatever the window."""
+        self._select(folded_ids)
+        return self.connection.execute(
+            "SELECT MAX(start) FROM programmes WHERE folded IN (SELECT folded FROM temp.wanted)"
+        ).fetchone()[0]
+
+    def iter_elements(
+        self,
+        folded_ids: Iterable[str],
+        *,
+        start_from: int | None = None,
+        start_to: int | None = None,
+        stop_from: int | None = None,
+    ) -> Iterator[etree._Element]:
+        """Yield the <channel> and <programme> elements of ``folded_ids`` in file order.
+
+        Programmes are limited to those starting in ``[start_from, start_to)``
+        and, with ``stop_from``, to those ending after it (or starting after
+        it, without a stop time). Programmes without a readable start are
+        always included.
+        """
+        self._select(folded_ids)
+        rows = self.connection.execute(
+            """
+            SELECT seq, xml FROM channels WHERE folded IN (SELECT folded FROM temp.wanted)
+            UNION ALL
+            SELECT seq, xml FROM programmes
+            WHERE folded IN (SELECT folded FROM temp.wanted)
+              AND (start IS NULL OR (start >= ? AND start < ? AND COALESCE(stop, start) > ?))
+            ORDER BY seq
+            """,
+            (
+                start_from if start_from is not None else -(2 ** 63),
+                start_to if start_to is not None else 2 ** 63 - 1,
+                stop_from if stop_from is not None else -(2 ** 63),
+            ),
+        )
+        parser = etree.XMLParser(recover=True, huge_tree=True)
+        chunk, size = [], 0
+        for _, xml in rows:
+            chunk.append(xml)
+            size += len(xml)
+            if size >= MAX_CHUNK_BYTES:
+                yield from _parse_chunk(chunk, parser)
+                chunk, size = [], 0
+        if chunk:
+            yield from _parse_chunk(chunk, parser)
+
+    def _select(self, folded_ids: Iterable[str]) -> None:
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (folded TEXT PRIMARY KEY)")
+        self.connection.execute("DELETE FROM temp.wanted")
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO temp.wanted VALUES (?)", ((folded,) for folded in folded_ids)
+        )
+
+
+def _parse_chunk(chunk: list[bytes], parser: etree.XMLParser) -> list[etree._Element]:
+    root = etree.fromstring(b"<tv>" + b"".join(chunk) + b"</tv>", parser)
+    # Callers clear and detach elements as they go, so hand out a copy of the list
+    return [] if root is None else list(root)
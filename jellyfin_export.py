@@ -3,24 +3,44 @@
 from __future__ import annotations
 
 from collections import Counter
+from contextlib import ExitStack
+from copy import deepcopy
 from dataclasses import dataclass
+from functools import cached_property
 from datetime import datetime, timezone
+import gzip
 import hashlib
+import io
 import json
 from pathlib import Path
 import re
 import shutil
+import sys
 import tempfile
+import time
 from typing import Iterator
+import zlib
 from urllib.parse import unquote, urlsplit, urlunsplit
 
 from lxml import etree
-from provider_mirrors import rewrite_provider_url
+try:
+    import brotli
+except ImportError:  # optional: adds .br siblings to precompressed artifacts
+    brotli = None
+from epg_store import load_epg_store, xmltv_timestamp
+from provider_mirrors import ProviderRewriter
+from xmltv_index import iter_indexed_elements, load_xmltv_index
 
 
 _ATTRIBUTE_RE = re.compile(r'([A-Za-z0-9_-]+)="([^"]*)"')
 _TVG_CHNO_RE = re.compile(r'\s+tvg-chno="[^"]*"', re.IGNORECASE)
-_M3UGUIDE_ID_RE = re.compile(r'\s+x-m3uguide-id="[^"]*"', re.IGNORECASE)
+_M3UGUIDE_STAMPS = r'\s+x-m3uguide-(?:kind|id|urlsum)="[^"]*"'
+_M3UGUIDE_STAMPS_RE = re.compile(_M3UGUIDE_STAMPS, re.IGNORECASE)
+# Stamps are inserted into the raw bytes of tv.m3u, which need not be UTF-8
+_M3UGUIDE_STAMP_BYTES_RE = re.compile(_M3UGUIDE_STAMPS.encode("ascii"), re.IGNORECASE)
+_EXTINF_DURATION_RE = re.compile(rb"#EXTINF:\s*-?[0-9.]*", re.IGNORECASE)
+_STABLE_ID_RE = re.compile(r"[0-9a-f]{24}")
+_CONTENT_KINDS = {"live", "movie", "series"}
 
 _CATEGORY_KEYWORDS = {
     "Movie": ("movie", "movies", "cinema", "film"),
@@ -42,10 +62,11 @@ class M3uEntry:
     url: str
     attributes: dict[str, str]
 
-    @property
+    @cached_property
     def content_kind(self) -> str:
+        """``live``, ``movie`` or ``series``; a stamped ``x-m3uguide-kind`` is trusted like the stamped id."""
         explicit_kind = self.attributes.get("x-m3uguide-kind", "").strip().casefold()
-        if explicit_kind in {"live", "movie", "series"}:
+        if explicit_kind in _CONTENT_KINDS and self.attributes.get("x-m3uguide-urlsum") == _url_checksum(self.url):
             return explicit_kind
 
         # Proxy URLs carry the provider URL in a percent-encoded query value, so
@@ -57,6 +78,24 @@ class M3uEntry:
             return "series"
         return "live"
 
+    @cached_property
+    def stable_id(self) -> str:
+        """The first 24 hex digits of the URL's SHA-256.
+
+        The ``x-m3uguide-id`` stamped at import is used instead while its
+        ``x-m3uguide-urlsum`` still matches the URL, so an edited line or one
+        copied with a stale stamp gets the id of its own URL.
+        """
+        stamped = self.attributes.get("x-m3uguide-id", "")
+        if _STABLE_ID_RE.fullmatch(stamped) and self.attributes.get("x-m3uguide-urlsum") == _url_checksum(self.url):
+            return stamped
+        return hashlib.sha256(self.url.encode("utf-8")).hexdigest()[:24]
+
+
+def _url_checksum(url: str) -> str:
+    """CRC-32 of a stream URL, stamped next to its id to detect stale stamps."""
+    return f"{zlib.crc32(url.encode('utf-8')):08x}"
+
 
 def iter_m3u(path: Path) -> Iterator[M3uEntry]:
     """Stream complete EXTINF/URL pairs from an M3U playlist."""
@@ -79,11 +118,79 @@ def iter_m3u(path: Path) -> Iterator[M3uEntry]:
                 pending = None
 
 
+def _stamped_extinf(raw_line: bytes, url: str) -> bytes:
+    line = raw_line.strip()
+    text = line.decode("utf-8", errors="replace")
+    attributes = {key.casefold(): value for key, value in _ATTRIBUTE_RE.findall(text)}
+    entry = M3uEntry(extinf=text, url=url, attributes=attributes)
+    if (
+        attributes.get("x-m3uguide-urlsum") == _url_checksum(url)
+        and attributes.get("x-m3uguide-kind") == entry.content_kind
+        and attributes.get("x-m3uguide-id") == entry.stable_id
+    ):
+        return raw_line
+    stamps = (
+        f' x-m3uguide-kind="{entry.content_kind}" x-m3uguide-id="{entry.stable_id}"'
+        f' x-m3uguide-urlsum="{_url_checksum(url)}"'
+    ).encode("ascii")
+    line = _M3UGUIDE_STAMP_BYTES_RE.sub(b"", line)
+    duration = _EXTINF_DURATION_RE.match(line)
+    return line[:duration.end()] + stamps + line[duration.end():] + raw_line[len(raw_line.rstrip()):]
+
+
+def stamp_m3u(path: Path) -> int:
+    """Stamp ``x-m3uguide-kind``, ``x-m3uguide-id`` and ``x-m3uguide-urlsum`` into the EXTINF lines of ``path``.
+
+    Run when a playlist is imported or refreshed, so every later reader takes
+    an entry's kind and stable id from its attributes instead of classifying
+    and hashing its URL again. The stamps are inserted into the raw bytes:
+    the file is served as is to IPTV clients, so its encoding, byte order
+    mark, line endings and every other byte are kept. Entries whose stamps
+    still match their URL are left alone, and the file is only replaced when
+    something was stamped. Returns the number of entries stamped.
+    """
+    path = Path(path)
+    staged = path.with_name(f".{path.name}.tmp")
+    stamped = 0
+    # An EXTINF line and any directives after it, until the entry's URL
+    pending: list[bytes] = []
+    with path.open("rb") as source:
+        header = source.readline()
+        if not header.removeprefix(b"\xef\xbb\xbf").strip().upper().startswith(b"#EXTM3U"):
+            return 0
+        with staged.open("wb") as output:
+            output.write(header)
+            for raw_line in source:
+                line = raw_line.strip()
+                if line.upper().startswith(b"#EXTINF:"):
+                    output.writelines(pending)
+                    pending = [raw_line]
+                elif pending and line and not line.startswith(b"#"):
+                    # Decoded the way iter_m3u reads it, so the id matches the one it would compute
+                    extinf = _stamped_extinf(pending[0], raw_line.decode("utf-8", errors="replace").strip())
+                    if extinf is not pending[0]:
+                        pending[0] = extinf
+                        stamped += 1
+                    output.writelines(pending)
+                    output.write(raw_line)
+                    pending = []
+                elif pending:
+                    pending.append(raw_line)
+                else:
+                    output.write(raw_line)
+            output.writelines(pending)
+    if stamped:
+        staged.replace(path)
+    else:
+        staged.unlink()
+    return stamped
+
+
 def _jellyfin_extinf(entry: M3uEntry, channel_number: int) -> str:
     """Add Jellyfin ordering and a provisional stable source identifier."""
     line = _TVG_CHNO_RE.sub("", entry.extinf)
-    line = _M3UGUIDE_ID_RE.sub("", line)
-    source_id = hashlib.sha256(entry.url.encode("utf-8")).hexdigest()[:24]
+    line = _M3UGUIDE_STAMPS_RE.sub("", line)
+    source_id = entry.stable_id
     comma = line.rfind(",")
     if comma < 0:
         raise ValueError("EXTINF line has no display-name separator")
@@ -102,7 +209,7 @@ def _jellyfin_stream_url(url: str) -> str:
     return url
 
 
-def _group_categories(group: str) -> set[str]:
+def group_categories(group: str) -> set[str]:
     """Return raw group facets plus Jellyfin's canonical programme categories."""
     facets = {part.strip() for part in re.split(r"[|,]", group) if part.strip()}
     searchable = " ".join(facets).casefold()
@@ -113,6 +220,10 @@ def _group_categories(group: str) -> set[str]:
     return categories
 
 
+# The name this helper had before it was shared with app.py
+_group_categories = group_categories
+
+
 def _matches_group_prefix(group: str, group_prefixes: tuple[str, ...]) -> bool:
     if not group_prefixes:
         return True
@@ -124,52 +235,292 @@ def _matches_group_prefix(group: str, group_prefixes: tuple[str, ...]) -> bool:
     )
 
 
-def _write_live_m3u(
-    source: Path,
-    destination: Path,
-    group_prefixes: tuple[str, ...],
-    stream_base: str | None = None,
-    active_mirror: str | None = None,
-) -> tuple[dict, dict[str, str], dict[str, set[str]]]:
-    counts = Counter()
-    epg_ids: dict[str, str] = {}
-    epg_categories: dict[str, set[str]] = {}
-    groups = set()
-    with destination.open("w", encoding="utf-8", newline="\n") as output:
-        output.write("#EXTM3U\n")
-        for entry in iter_m3u(source):
-            counts[f"source_{entry.content_kind}"] += 1
-            if entry.content_kind != "live":
-                continue
-
-            group = entry.attributes.get("group-title", "").strip()
-            if not _matches_group_prefix(group, group_prefixes):
-                counts["excluded_by_group"] += 1
-                continue
-
-            counts["exported_live"] += 1
-            tvg_id = entry.attributes.get("tvg-id", "").strip()
-            if tvg_id:
-                folded_id = tvg_id.casefold()
-                epg_ids.setdefault(folded_id, tvg_id)
-                epg_categories.setdefault(folded_id, set()).update(
-                    _group_categories(entry.attributes.get("group-title", ""))
-                )
-            else:
-                counts["live_without_tvg_id"] += 1
-            if group:
-                groups.add(group)
-            else:
-                counts["live_without_group"] += 1
+# Large artifacts also get compressed siblings, which the routes serve to
+# clients that accept them: (Content-Encoding, suffix)
+PRECOMPRESSED_ARTIFACTS = ("live.m3u8", "epg.xml")
+ARTIFACT_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class _BrotliFile:
+    def __init__(self, path: Path) -> None:
+        self._file = path.open("wb")
+        self._compressor = brotli.Compressor(quality=5)
+
+    def write(self, data) -> None:
+        self._file.write(self._compressor.process(bytes(data)))
 
-            output.write(_jellyfin_extinf(entry, counts["exported_live"]))
-            output.write("\n")
-            output.write(_jellyfin_stream_url(rewrite_provider_url(entry.url, stream_base, active_mirror)))
-            output.write("\n")
+    def close(self) -> None:
+        self._file.write(self._compressor.finish())
+        self._file.close()
 
-    counts["exported_groups"] = len(groups)
-    counts["unique_epg_ids"] = len(epg_ids)
-    return dict(counts), epg_ids, epg_categories
+
+class _HashingFile(io.RawIOBase):
+    """Binary output that keeps a SHA-256 and byte count of what it writes.
+
+    Artifacts are written through this (buffered, and text-wrapped where
+    needed), so their manifest digests need no second read of the file.
+    With ``precompress`` the same bytes also go to a ``.gz`` sibling, and to
+    a ``.br`` one when ``brotli`` is installed.
+    """
+
+    def __init__(self, path: Path, *, precompress: bool = False) -> None:
+        super().__init__()
+        self.path = path
+        self._file = path.open("wb", buffering=0)
+        self._siblings = []
+        if precompress:
+            # mtime=0 keeps the gzip bytes a function of the content
+            self._siblings.append(gzip.GzipFile(f"{path}.gz", "wb", compresslevel=6, mtime=0))
+            if brotli is not None:
+                self._siblings.append(_BrotliFile(Path(f"{path}.br")))
+        self.digest = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        written = self._file.write(data)
+        view = memoryview(data)[:written]
+        self.digest.update(view)
+        for sibling in self._siblings:
+            sibling.write(view)
+        self.bytes += written
+        return written
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+            for sibling in self._siblings:
+                sibling.close()
+        super().close()
+
+    def fingerprint(self) -> dict:
+        """Size, SHA-256 and mtime of the closed file; publishing renames it, which keeps the mtime."""
+        return {"bytes": self.bytes, "sha256": self.digest.hexdigest(), "mtime_ns": self.path.stat().st_mtime_ns}
+
+
+def _open_artifact(
+    path: Path, *, text: bool = True, precompress: bool = False
+) -> tuple[io.IOBase, _HashingFile]:
+    """Open ``path`` for writing; returns the stream and its ``_HashingFile``."""
+    raw = _HashingFile(path, precompress=precompress)
+    buffered = io.BufferedWriter(raw, buffer_size=1024 * 1024)
+    if not text:
+        return buffered, raw
+    return io.TextIOWrapper(buffered, encoding="utf-8", newline="\n"), raw
+
+
+class _LiveM3uWriter:
+    """Write selected live entries to a Jellyfin tuner playlist, one at a time.
+
+    ``add`` is called for every source entry (VOD entries are only counted)
+    and ``result`` returns the counts plus the tvg-id maps needed to trim the
+    XMLTV guide. Prefix selection and categories depend only on the
+    group-title, so they are worked out once per distinct group.
+    """
+
+    def __init__(
+        self,
+        destination: Path,
+        group_prefixes: tuple[str, ...],
+        stream_base: str | None = None,
+        active_mirror: str | None = None,
+    ) -> None:
+        self.group_prefixes = group_prefixes
+        self.rewrite = ProviderRewriter(stream_base, active_mirror)
+        self.counts = Counter()
+        self.epg_ids: dict[str, str] = {}
+        self.epg_categories: dict[str, set[str]] = {}
+        self.groups: set[str] = set()
+        # group-title -> (stripped group, selected by the prefixes, categories)
+        self.group_facts: dict[str, tuple[str, bool, set[str]]] = {}
+        self.output, self.artifact = _open_artifact(destination, precompress=True)
+        self.output.write("#EXTM3U\n")
+
+    def close(self) -> None:
+        self.output.close()
+
+    def add(self, entry: M3uEntry) -> None:
+        counts = self.counts
+        counts[f"source_{entry.content_kind}"] += 1
+        if entry.content_kind != "live":
+            return
+
+        raw_group = entry.attributes.get("group-title", "")
+        facts = self.group_facts.get(raw_group)
+        if facts is None:
+            group = raw_group.strip()
+            facts = self.group_facts[raw_group] = (
+                group, _matches_group_prefix(group, self.group_prefixes), group_categories(raw_group),
+            )
+        group, selected, categories = facts
+        if not selected:
+            counts["excluded_by_group"] += 1
+            return
+
+        counts["exported_live"] += 1
+        tvg_id = entry.attributes.get("tvg-id", "").strip()
+        if tvg_id:
+            folded_id = tvg_id.casefold()
+            self.epg_ids.setdefault(folded_id, tvg_id)
+            self.epg_categories.setdefault(folded_id, set()).update(categories)
+        else:
+            counts["live_without_tvg_id"] += 1
+        if group:
+            self.groups.add(group)
+        else:
+            counts["live_without_group"] += 1
+
+        self.output.write(_jellyfin_extinf(entry, counts["exported_live"]))
+        self.output.write("\n")
+        self.output.write(_jellyfin_stream_url(self.rewrite(entry.url)))
+        self.output.write("\n")
+
+    def result(self) -> tuple[dict, dict[str, str], dict[str, set[str]]]:
+        self.counts["exported_groups"] = len(self.groups)
+        self.counts["unique_epg_ids"] = len(self.epg_ids)
+        return dict(self.counts), self.epg_ids, self.epg_categories
+
+
+class _TrimmedGuide:
+    """One output guide of an XMLTV trim, with its own ids, window and counts."""
+
+    def __init__(
+        self,
+        output,
+        epg_ids: dict[str, str],
+        epg_categories: dict[str, set[str]],
+        window: tuple[int | None, int | None] | None = None,
+    ) -> None:
+        self.output = output
+        self.epg_ids = epg_ids
+        self.epg_categories = epg_categories
+        self.window = tuple(window) if window and any(bound is not None for bound in window) else None
+        self.counts = Counter()
+        self.written_channels: set[str] = set()
+        self.programme_ids: set[str] = set()
+
+    def channel(self, element, folded: str) -> None:
+        if folded in self.written_channels:
+            self.counts["duplicate_channels_removed"] += 1
+            return
+        element.set("id", self.epg_ids[folded])
+        self.output.write(element)
+        self.written_channels.add(folded)
+        self.counts["channels"] += 1
+
+    def in_window(self, start: int | None, stop: int | None) -> bool:
+        """Whether a programme airs in ``window``; unreadable times are kept."""
+        if self.window is None or start is None:
+            return True
+        not_before, not_after = self.window
+        if (not_before is not None and (stop if stop is not None else start) <= not_before) or (
+            not_after is not None and start >= not_after
+        ):
+            self.counts["programmes_outside_window"] += 1
+            return False
+        return True
+
+    def programme(self, element, folded: str) -> None:
+        element.set("channel", self.epg_ids[folded])
+        existing = {
+            (category.text or "").strip().casefold()
+            for category in element.findall("category")
+        }
+        for category in sorted(self.epg_categories.get(folded, set())):
+            if category.casefold() not in existing:
+                child = etree.SubElement(element, "category")
+                child.text = category
+                self.counts["categories_added"] += 1
+        self.output.write(element)
+        self.programme_ids.add(folded)
+        self.counts["programmes"] += 1
+
+    def result(self) -> dict:
+        counts = self.counts
+        counts["requested_channel_ids"] = len(self.epg_ids)
+        counts["matched_channel_ids"] = len(self.written_channels)
+        counts["channel_ids_with_programmes"] = len(self.programme_ids)
+        counts["channel_ids_missing_from_xmltv"] = len(set(self.epg_ids) - self.written_channels)
+        counts["channel_ids_without_programmes"] = len(set(self.epg_ids) - self.programme_ids)
+        return dict(counts)
+
+
+def _write_trimmed_xmltv_targets(
+    source: Path,
+    targets: list[tuple[Path | io.IOBase, dict[str, str], dict[str, set[str]], tuple | None]],
+) -> list[dict]:
+    """Trim one XMLTV source into a guide per ``(destination, epg_ids, epg_categories, window)``.
+
+    A destination is a path or an open binary stream, which is left open.
+    A window of ``(not_before, not_after)`` epoch seconds, either of them
+    None for no limit, keeps only the programmes airing in it.
+    The source is parsed once; a current ``epg_store`` is queried for the
+    selected channels instead, or else only the selected byte ranges of a
+    current ``xmltv_index`` are parsed. Each guide rewrites ids and appends its
+    own categories, so an element wanted by several guides is copied for all
+    but the last of them.
+    """
+    if not targets:
+        return []
+    with ExitStack() as stack:
+        guides = []
+        for destination, epg_ids, epg_categories, window in targets:
+            if isinstance(destination, Path):
+                destination = str(destination)
+            output = stack.enter_context(etree.xmlfile(destination, encoding="utf-8"))
+            output.write_declaration()
+            stack.enter_context(output.element(
+                "tv",
+                attrib={
+                    "generator-info-name": "m3u.guide Jellyfin export",
+                    "generator-info-url": "https://m3u.guide",
+                },
+            ))
+            guides.append(_TrimmedGuide(output, epg_ids, epg_categories, window))
+
+        selected = set().union(*(guide.epg_ids for guide in guides))
+        store = load_epg_store(source)
+        index = None if store is not None else load_xmltv_index(source)
+        if store is not None:
+            stack.callback(store.close)
+            windows = [guide.window or (None, None) for guide in guides]
+            elements = store.iter_elements(
+                selected,
+                start_to=None if any(w[1] is None for w in windows) else max(w[1] for w in windows),
+                stop_from=None if any(w[0] is None for w in windows) else min(w[0] for w in windows),
+            )
+        elif index is not None:
+            elements = iter_indexed_elements(source, index, selected)
+        else:
+            elements = (element for _, element in etree.iterparse(
+                str(source), events=("end",), tag=("channel", "programme"), recover=True
+            ))
+        for element in elements:
+            if etree.QName(element).localname == "channel":
+                folded = (element.get("id") or "").strip().casefold()
+                write = _TrimmedGuide.channel
+            else:
+                folded = (element.get("channel") or "").strip().casefold()
+                write = _TrimmedGuide.programme
+            wanted = [guide for guide in guides if folded in guide.epg_ids]
+            if write is _TrimmedGuide.programme and any(guide.window for guide in wanted):
+                start = xmltv_timestamp(element.get("start"))
+                stop = xmltv_timestamp(element.get("stop"))
+                wanted = [guide for guide in wanted if guide.in_window(start, stop)]
+            for guide in wanted[:-1]:
+                write(guide, deepcopy(element), folded)
+            if wanted:
+                write(wanted[-1], element, folded)
+
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    return [guide.result() for guide in guides]
 
 
 def _write_trimmed_xmltv(
@@ -177,65 +528,9 @@ def _write_trimmed_xmltv(
     destination: Path,
     epg_ids: dict[str, str],
     epg_categories: dict[str, set[str]],
+    window: tuple[int | None, int | None] | None = None,
 ) -> dict:
-    counts = Counter()
-    written_channels: set[str] = set()
-    programme_ids: set[str] = set()
-
-    with etree.xmlfile(str(destination), encoding="utf-8") as output:
-        output.write_declaration()
-        with output.element(
-            "tv",
-            attrib={
-                "generator-info-name": "m3u.guide Jellyfin export",
-                "generator-info-url": "https://m3u.guide",
-            },
-        ):
-            context = etree.iterparse(
-                str(source), events=("end",), tag=("channel", "programme"), recover=True
-            )
-            for _, element in context:
-                tag = etree.QName(element).localname
-                if tag == "channel":
-                    source_id = (element.get("id") or "").strip()
-                    folded = source_id.casefold()
-                    if folded in epg_ids and folded not in written_channels:
-                        element.set("id", epg_ids[folded])
-                        output.write(element)
-                        written_channels.add(folded)
-                        counts["channels"] += 1
-                    elif folded in written_channels:
-                        counts["duplicate_channels_removed"] += 1
-                else:
-                    source_id = (element.get("channel") or "").strip()
-                    folded = source_id.casefold()
-                    if folded in epg_ids:
-                        element.set("channel", epg_ids[folded])
-                        existing = {
-                            (category.text or "").strip().casefold()
-                            for category in element.findall("category")
-                        }
-                        for category in sorted(epg_categories.get(folded, set())):
-                            if category.casefold() not in existing:
-                                child = etree.SubElement(element, "category")
-                                child.text = category
-                                counts["categories_added"] += 1
-                        output.write(element)
-                        programme_ids.add(folded)
-                        counts["programmes"] += 1
-
-                element.clear()
-                parent = element.getparent()
-                if parent is not None:
-                    while element.getprevious() is not None:
-                        del parent[0]
-
-    counts["requested_channel_ids"] = len(epg_ids)
-    counts["matched_channel_ids"] = len(written_channels)
-    counts["channel_ids_with_programmes"] = len(programme_ids)
-    counts["channel_ids_missing_from_xmltv"] = len(set(epg_ids) - written_channels)
-    counts["channel_ids_without_programmes"] = len(set(epg_ids) - programme_ids)
-    return dict(counts)
+    return _write_trimmed_xmltv_targets(source, [(destination, epg_ids, epg_categories, window)])[0]
 
 
 def _sha256(path: Path) -> str:
@@ -246,44 +541,218 @@ def _sha256(path: Path) -> str:
     return digest.hexdigest()
 
 
-def generate_jellyfin_export(
-    playlist_dir: Path,
-    public_base_url: str | None = None,
-    *,
-    profile: str = "default",
-    group_prefixes: tuple[str, ...] = (),
-    stream_base: str | None = None,
-    active_mirror: str | None = None,
-) -> dict:
-    """Generate and publish a default Jellyfin export revision.
+# A file rewritten within this window of being hashed may keep its size and
+# mtime on coarse-clock filesystems, so such "racily clean" hashes are redone.
+_RACY_WINDOW_NS = 2_000_000_000
+# Signature fields that only say when/how cheaply a file was checked
+_VOLATILE_SIGNATURE_FIELDS = ("mtime_ns", "checked_ns")
 
-    The edited playlist is authoritative when present; otherwise the immutable
-    source is used for a first preview export.
+
+def _code_digest(*module_names: str) -> str:
+    """Hash the source of the modules that shape an export's output."""
+    digest = hashlib.sha256()
+    for name in module_names:
+        digest.update(Path(sys.modules[name].__file__).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _file_signature(path: Path, previous: dict | None = None) -> dict:
+    """Name, size, mtime and sha256 of an export input.
+
+    The sha256 from ``previous`` is reused while size and mtime are unchanged,
+    so an unchanged multi-GB XMLTV file costs one ``stat`` per export.
     """
-    playlist_dir = Path(playlist_dir)
-    edited = playlist_dir / "tv_edited.m3u"
-    m3u_source = edited if edited.exists() else playlist_dir / "tv.m3u"
-    xml_source = playlist_dir / "epg.xml"
-    if not m3u_source.exists():
-        raise FileNotFoundError(f"M3U source not found: {m3u_source}")
-    if not xml_source.exists():
-        raise FileNotFoundError(f"XMLTV source not found: {xml_source}")
-
-    if not re.fullmatch(r"[a-z0-9_-]+", profile):
-        raise ValueError("profile must contain only lowercase letters, numbers, _ or -")
-    export_dir = playlist_dir / "exports" / "jellyfin" / profile
-    export_dir.mkdir(parents=True, exist_ok=True)
-    staging = Path(tempfile.mkdtemp(prefix=".jellyfin-export-", dir=export_dir.parent))
+    stat = path.stat()
+    signature = {"name": path.name, "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if (
+        previous
+        and all(previous.get(key) == signature[key] for key in signature)
+        and stat.st_mtime_ns < previous.get("checked_ns", 0) - _RACY_WINDOW_NS
+    ):
+        signature["sha256"] = previous["sha256"]
+        signature["checked_ns"] = previous["checked_ns"]
+    else:
+        signature["checked_ns"] = time.time_ns()
+        signature["sha256"] = _sha256(path)
+    return signature
+
+
+def _stable_inputs(inputs: object) -> object:
+    """``inputs`` without the fields that change when nothing else does."""
+    if isinstance(inputs, dict):
+        return {
+            key: _stable_inputs(value) for key, value in inputs.items()
+            if key not in _VOLATILE_SIGNATURE_FIELDS
+        }
+    return inputs
+
+
+def _read_manifest(path: Path) -> dict:
     try:
-        live_path = staging / "live.m3u8"
-        epg_path = staging / "epg.xml"
-        m3u_counts, epg_ids, epg_categories = _write_live_m3u(
-            m3u_source, live_path, group_prefixes, stream_base, active_mirror
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _reusable_manifest(manifest: dict, inputs: dict, directory: Path, sizes: dict[str, int]) -> bool:
+    """True when ``manifest`` was built from ``inputs`` and its files are intact."""
+    if not manifest or not sizes or _stable_inputs(manifest.get("input")) != _stable_inputs(inputs):
+        return False
+    for name, size in sizes.items():
+        try:
+            if (directory / name).stat().st_size != size:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def _write_manifest(path: Path, manifest: dict) -> None:
+    staged = path.with_name(f".{path.name}.tmp")
+    staged.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    staged.replace(path)
+
+
+def playlist_source(playlist_dir: Path) -> Path:
+    """The edited playlist when one has been saved, otherwise the source."""
+    edited = Path(playlist_dir) / "tv_edited.m3u"
+    return edited if edited.exists() else Path(playlist_dir) / "tv.m3u"
+
+
+# A published guide is reused for this many hours after its window was set
+# when nothing else changed; windows reach that much further ahead to cover it.
+EPG_WINDOW_REUSE_HOURS = 6
+
+
+def _epg_window(past_hours: int | None, future_hours: int | None) -> list[int | None] | None:
+    """``[not_before, not_after]`` epoch seconds for a profile's guide window.
+
+    The window is widened to whole hours around the current one, and its end
+    by ``EPG_WINDOW_REUSE_HOURS``, so a guide reused that much later still
+    covers ``future_hours``.
+    """
+    if past_hours is None and future_hours is None:
+        return None
+    hour = int(time.time()) // 3600 * 3600
+    return [
+        hour - past_hours * 3600 if past_hours is not None else None,
+        hour + 3600 + (future_hours + EPG_WINDOW_REUSE_HOURS) * 3600 if future_hours is not None else None,
+    ]
+
+
+def _epg_window_current(published: list | None, window: list | None) -> bool:
+    """Whether a guide trimmed to ``published`` may stand in for ``window``."""
+    if window is None or published is None:
+        return window == published
+    shifts = {now - then for now, then in zip(window, published) if now is not None and then is not None}
+    return len(shifts) == 1 and 0 <= shifts.pop() <= EPG_WINDOW_REUSE_HOURS * 3600
+
+
+class LiveExport:
+    """One profile's live export, from its input check to publishing.
+
+    ``unchanged`` is the published manifest when the inputs still match it.
+    Otherwise ``open`` returns a writer for every playlist entry,
+    ``xmltv_target`` describes the guide to trim once the playlist is done,
+    ``stage`` completes the revision beside the published one, and
+    ``publish`` moves the staged files into place. ``discard`` drops
+    anything staged and is safe to call at any point.
+    """
+
+    def __init__(
+        self,
+        playlist_dir: Path,
+        public_base_url: str | None = None,
+        *,
+        profile: str = "default",
+        group_prefixes: tuple[str, ...] = (),
+        stream_base: str | None = None,
+        active_mirror: str | None = None,
+        epg_past_hours: int | None = None,
+        epg_future_hours: int | None = None,
+    ) -> None:
+        playlist_dir = Path(playlist_dir)
+        self.m3u_source = playlist_source(playlist_dir)
+        self.xml_source = playlist_dir / "epg.xml"
+        if not self.m3u_source.exists():
+            raise FileNotFoundError(f"M3U source not found: {self.m3u_source}")
+        if not self.xml_source.exists():
+            raise FileNotFoundError(f"XMLTV source not found: {self.xml_source}")
+
+        if not re.fullmatch(r"[a-z0-9_-]+", profile):
+            raise ValueError("profile must contain only lowercase letters, numbers, _ or -")
+        self.public_base_url = public_base_url
+        self.profile = profile
+        self.group_prefixes = group_prefixes
+        self.stream_base = stream_base
+        self.active_mirror = active_mirror
+        self.epg_hours = {"past": epg_past_hours, "future": epg_future_hours}
+        self.epg_window = _epg_window(epg_past_hours, epg_future_hours)
+        self.export_dir = playlist_dir / "exports" / "jellyfin" / profile
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self.staging: Path | None = None
+        self.writer: _LiveM3uWriter | None = None
+        self.guide: io.IOBase | None = None
+        self.guide_artifact: _HashingFile | None = None
+        self.m3u_counts: dict = {}
+        self.manifest: dict | None = None
+        self.fingerprints: dict[str, dict] = {}
+
+        # Scheduled syncs mostly find nothing changed: reuse the published
+        # revision when sources, filters, mirror settings and exporter match
+        # and its guide window is at most EPG_WINDOW_REUSE_HOURS old.
+        previous = _read_manifest(self.export_dir / "manifest.json")
+        previous_input = previous.get("input") or {}
+        self.inputs = {
+            "exporter": _code_digest(__name__, "provider_mirrors", "xmltv_index", "epg_store"),
+            "m3u": _file_signature(self.m3u_source, previous_input.get("m3u")),
+            "xmltv": _file_signature(self.xml_source, previous_input.get("xmltv")),
+            "options": {
+                "public_base_url": public_base_url,
+                "group_prefixes": list(group_prefixes),
+                "stream_base": stream_base,
+                "active_mirror": active_mirror,
+                "epg_hours": self.epg_hours,
+            },
+        }
+        artifact_sizes = {
+            name: artifact.get("bytes") for name, artifact in (previous.get("artifacts") or {}).items()
+        }
+        self.unchanged: dict | None = None
+        if _reusable_manifest(previous, self.inputs, self.export_dir, artifact_sizes) and _epg_window_current(
+            (previous.get("filters") or {}).get("epg_window"), self.epg_window
+        ):
+            if previous["input"] != self.inputs:
+                # Same content under a new mtime: remember it so the next sync skips hashing
+                previous["input"] = self.inputs
+                _write_manifest(self.export_dir / "manifest.json", previous)
+            self.unchanged = {**previous, "unchanged": True}
+
+    def open(self) -> _LiveM3uWriter:
+        self.staging = Path(tempfile.mkdtemp(prefix=".jellyfin-export-", dir=self.export_dir.parent))
+        self.writer = _LiveM3uWriter(
+            self.staging / "live.m3u8", self.group_prefixes, self.stream_base, self.active_mirror
         )
-        xml_counts = _write_trimmed_xmltv(
-            xml_source, epg_path, epg_ids, epg_categories
+        return self.writer
+
+    @property
+    def bytes_written(self) -> int:
+        """Bytes written to the staged playlist and guide so far."""
+        return sum(
+            artifact.bytes for artifact in (self.writer and self.writer.artifact, self.guide_artifact) if artifact
         )
 
+    def xmltv_target(self) -> tuple[io.IOBase, dict[str, str], dict[str, set[str]], list | None]:
+        """Close the playlist writer and return ``(guide stream, epg_ids, epg_categories, window)``."""
+        self.writer.close()
+        self.m3u_counts, epg_ids, epg_categories = self.writer.result()
+        self.fingerprints["live.m3u8"] = self.writer.artifact.fingerprint()
+        self.guide, self.guide_artifact = _open_artifact(self.staging / "epg.xml", text=False, precompress=True)
+        return self.guide, epg_ids, epg_categories, self.epg_window
+
+    def stage(self, xml_counts: dict) -> dict:
+        """Finish the staged revision and its manifest without publishing them; returns the manifest."""
+        m3u_counts = self.m3u_counts
         warnings = []
         if m3u_counts.get("live_without_tvg_id"):
             warnings.append(
@@ -299,40 +768,105 @@ def generate_jellyfin_export(
             )
 
         validation = {
-            "source": m3u_source.name,
+            "source": self.m3u_source.name,
             "m3u": m3u_counts,
             "xmltv": xml_counts,
             "warnings": warnings,
         }
-        (staging / "validation.json").write_text(
-            json.dumps(validation, indent=2), encoding="utf-8"
-        )
+        output, artifact = _open_artifact(self.staging / "validation.json")
+        with output:
+            output.write(json.dumps(validation, indent=2))
+        self.fingerprints["validation.json"] = artifact.fingerprint()
+        self.guide.close()
+        self.fingerprints["epg.xml"] = self.guide_artifact.fingerprint()
 
         generated_at = datetime.now(timezone.utc).isoformat()
         artifacts = {}
         for name in ("live.m3u8", "epg.xml", "validation.json"):
-            artifact = staging / name
             artifacts[name] = {
-                "bytes": artifact.stat().st_size,
-                "sha256": _sha256(artifact),
-                "url": f"{public_base_url}/{name}" if public_base_url else None,
+                **self.fingerprints[name],
+                "url": f"{self.public_base_url}/{name}" if self.public_base_url else None,
             }
         manifest = {
             "format": "m3u.guide-jellyfin-export",
             "version": 1,
-            "profile": profile,
-            "filters": {"group_prefixes": list(group_prefixes)},
-            "provider": {"source_origin": stream_base, "active_origin": active_mirror or stream_base},
+            "profile": self.profile,
+            "filters": {
+                "group_prefixes": list(self.group_prefixes),
+                "epg_past_hours": self.epg_hours["past"],
+                "epg_future_hours": self.epg_hours["future"],
+                "epg_window": self.epg_window,
+            },
+            "provider": {"source_origin": self.stream_base, "active_origin": self.active_mirror or self.stream_base},
             "generated_at": generated_at,
+            "input": self.inputs,
             "artifacts": artifacts,
             "counts": {"m3u": m3u_counts, "xmltv": xml_counts},
         }
-        (staging / "manifest.json").write_text(
+        (self.staging / "manifest.json").write_text(
             json.dumps(manifest, indent=2), encoding="utf-8"
         )
+        self.manifest = manifest
+        return manifest
 
+    def publish(self) -> dict:
+        """Replace the published artifacts with the staged revision; returns its manifest."""
         for name in ("live.m3u8", "epg.xml", "validation.json", "manifest.json"):
-            Path.replace(staging / name, export_dir / name)
-        return manifest
+            Path.replace(self.staging / name, self.export_dir / name)
+            if name in PRECOMPRESSED_ARTIFACTS:
+                for _, suffix in ARTIFACT_ENCODINGS:
+                    staged = self.staging / f"{name}{suffix}"
+                    if staged.exists():
+                        staged.replace(self.export_dir / staged.name)
+                    else:
+                        (self.export_dir / staged.name).unlink(missing_ok=True)
+        self.discard()
+        return self.manifest
+
+    def discard(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        if self.guide is not None:
+            self.guide.close()
+        if self.staging is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self.staging = None
+
+
+def generate_jellyfin_export(
+    playlist_dir: Path,
+    public_base_url: str | None = None,
+    *,
+    profile: str = "default",
+    group_prefixes: tuple[str, ...] = (),
+    stream_base: str | None = None,
+    active_mirror: str | None = None,
+    epg_past_hours: int | None = None,
+    epg_future_hours: int | None = None,
+) -> dict:
+    """Generate and publish a default Jellyfin export revision.
+
+    The edited playlist is authoritative when present; otherwise the immutable
+    source is used for a first preview export.
+    """
+    export = LiveExport(
+        playlist_dir,
+        public_base_url,
+        profile=profile,
+        group_prefixes=group_prefixes,
+        stream_base=stream_base,
+        active_mirror=active_mirror,
+        epg_past_hours=epg_past_hours,
+        epg_future_hours=epg_future_hours,
+    )
+    if export.unchanged is not None:
+        return export.unchanged
+    try:
+        live = export.open()
+        for entry in iter_m3u(export.m3u_source):
+            live.add(entry)
+        xml_counts = _write_trimmed_xmltv(export.xml_source, *export.xmltv_target())
+        export.stage(xml_counts)
+        return export.publish()
     finally:
-        shutil.rmtree(staging, ignore_errors=True)
+        export.discard()
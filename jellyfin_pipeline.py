@@ -0,0 +1,140 @@
+"""Publish Jellyfin live and VOD artifacts from one playlist and one XMLTV pass."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+from jellyfin_export import LiveExport, _write_trimmed_xmltv_targets, iter_m3u, playlist_source
+from jellyfin_vod_catalog import PARSE_CACHE_FILE, VodCatalogWriter, VodParseCache, VodPreparation, vod_catalog_inputs
+
+
+# Playlist entries between two progress reports
+PROGRESS_INTERVAL = 5000
+
+
+def export_jellyfin_profiles(
+    playlist_dir: Path,
+    profiles: dict[str, dict],
+    *,
+    stream_base: str | None = None,
+    active_mirror: str | None = None,
+    vod_workers: int | None = None,
+    progress: Callable[[str, int, int], None] | None = None,
+) -> dict[str, dict]:
+    """Export live M3U, trimmed XMLTV and the VOD catalog for each profile.
+
+    Every playlist entry is read once and handed to each profile's live and
+    catalog writers, which apply ``live_group_prefixes``, ``movie_groups`` and
+    ``series_groups`` themselves; the XMLTV source is then parsed once for
+    all guides, each limited to its profile's ``epg_past_hours`` and
+    ``epg_future_hours``. Each artifact keeps its own input signature, so unchanged
+    ones are reused as is. Every profile's live and catalog revision is
+    staged before any is published, so a failure leaves all of them as they
+    were. The catalog writers share the playlist's parse
+    cache, which is saved once they are published, and one preparation, so
+    an entry several profiles select is parsed and rendered once, in a pool
+    of ``vod_workers`` processes for the whole run when that is above one. ``progress`` is called
+    as ``progress(stage, entries_scanned, bytes_written)`` when each stage
+    (``"playlist"``, ``"xmltv"``, ``"vod"``) starts and every
+    ``PROGRESS_INTERVAL`` playlist entries. Returns the live manifest, with
+    the catalog manifest under ``"vod"``, for each profile name.
+    """
+    playlist_dir = Path(playlist_dir)
+    source = playlist_source(playlist_dir)
+    options = {
+        "overrides_path": playlist_dir / "vod-overrides.json",
+        "stream_base": stream_base,
+        "active_mirror": active_mirror,
+    }
+    lives: dict[str, LiveExport] = {}
+    catalogs: dict[str, VodCatalogWriter] = {}
+    results: dict[str, dict] = {}
+    parse_cache = None
+    preparation = None
+    scanned = 0
+
+    def report(stage: str) -> None:
+        if progress is not None:
+            written = sum(live.bytes_written for live in lives.values())
+            progress(stage, scanned, written + sum(catalog.bytes_written for catalog in catalogs.values()))
+
+    try:
+        for name, profile in profiles.items():
+            live = LiveExport(
+                playlist_dir,
+                profile=name,
+                group_prefixes=tuple(profile.get("live_group_prefixes", [])),
+                stream_base=stream_base,
+                active_mirror=active_mirror,
+                epg_past_hours=profile.get("epg_past_hours"),
+                epg_future_hours=profile.get("epg_future_hours"),
+            )
+            vod_inputs, vod = vod_catalog_inputs(source, live.export_dir, profile, **options)
+            results[name] = {**(live.unchanged or {}), "vod": vod}
+            if live.unchanged is None:
+                lives[name] = live
+            if vod is None:
+                if parse_cache is None:
+                    parse_cache = VodParseCache.load(playlist_dir / PARSE_CACHE_FILE, **options)
+                    preparation = VodPreparation(workers=vod_workers, **options)
+                catalogs[name] = VodCatalogWriter(
+                    live.export_dir, profile, vod_inputs,
+                    parse_cache=parse_cache, preparation=preparation, **options,
+                )
+
+        writers = [live.open() for live in lives.values()] + list(catalogs.values())
+        if writers:
+            report("playlist")
+            for entry in iter_m3u(source):
+                if parse_cache is not None:
+                    parse_cache.seen(entry)
+                for writer in writers:
+                    writer.add(entry)
+                scanned += 1
+                if scanned % PROGRESS_INTERVAL == 0:
+                    report("playlist")
+        if lives:
+            report("xmltv")
+            xml_source = next(iter(lives.values())).xml_source
+            xml_counts = _write_trimmed_xmltv_targets(
+                xml_source, [live.xmltv_target() for live in lives.values()]
+            )
+            for live, counts in zip(lives.values(), xml_counts):
+                live.stage(counts)
+        if catalogs:
+            report("vod")
+        for catalog in catalogs.values():
+            catalog.stage()
+        # Everything is built: only now replace the published revisions
+        for name, live in lives.items():
+            results[name].update(live.publish())
+        for name, catalog in catalogs.items():
+            results[name]["vod"] = catalog.publish()
+        if parse_cache is not None:
+            parse_cache.save()
+    finally:
+        for live in lives.values():
+            live.discard()
+        for catalog in catalogs.values():
+            catalog.discard()
+        if preparation is not None:
+            preparation.close()
+    return results
+
+
+def export_jellyfin_profile(
+    playlist_dir: Path,
+    profile_name: str,
+    profile: dict,
+    *,
+    stream_base: str | None = None,
+    active_mirror: str | None = None,
+    vod_workers: int | None = None,
+    progress: Callable[[str, int, int], None] | None = None,
+) -> dict:
+    """Export one profile; see ``export_jellyfin_profiles``."""
+    return export_jellyfin_profiles(
+        playlist_dir, {profile_name: profile},
+        stream_base=stream_base, active_mirror=active_mirror, vod_workers=vod_workers, progress=progress,
+    )[profile_name]
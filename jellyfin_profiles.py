@@ -17,6 +17,9 @@ DEFAULT_PROFILE = {
     "include_movies": True,
     "include_series": True,
     "remove_missing_vod": True,
+    "compress_catalog": False,
+    "epg_past_hours": None,
+    "epg_future_hours": None,
     "max_movies": None,
     "max_series": None,
     "max_episodes": None,
@@ -48,9 +51,13 @@ def save_profile(playlist_dir: Path, name: str, supplied: dict) -> dict:
     profile["name"] = name
     for key in ("live_group_prefixes", "movie_groups", "series_groups"):
         profile[key] = sorted({str(value).strip() for value in profile.get(key, []) if str(value).strip()})
+    profile["compress_catalog"] = bool(profile.get("compress_catalog"))
     for key in ("max_movies", "max_series", "max_episodes"):
         value = profile.get(key)
         profile[key] = max(1, int(value)) if value not in (None, "") else None
+    for key in ("epg_past_hours", "epg_future_hours"):
+        value = profile.get(key)
+        profile[key] = max(0, int(value)) if value not in (None, "") else None
     profiles[name] = profile
     path = Path(playlist_dir) / "jellyfin_profiles.json"
     path.write_text(json.dumps({"profiles": profiles}, indent=2) + "\n", encoding="utf-8")
@@ -2,19 +2,42 @@
 
 from __future__ import annotations
 
-from collections import Counter
+from bisect import bisect_right
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+import gzip
 import hashlib
+import heapq
 import json
+import multiprocessing
+import os
 from pathlib import Path
+import re
+import sys
+import threading
+from typing import Iterator
+import zlib
 
 from lxml import etree
 
-from jellyfin_export import _jellyfin_stream_url, iter_m3u
-from jellyfin_vod_export import _display_name, _episode_info, _movie_info, _safe, _stable_id
-from provider_mirrors import rewrite_provider_url
+from jellyfin_export import (
+    _code_digest, _file_signature, _jellyfin_stream_url, _read_manifest, _reusable_manifest,
+    M3uEntry, _write_manifest, iter_m3u,
+)
+from jellyfin_vod_export import (
+    _display_name, _episode_info, _movie_info, _safe, _stable_id, iter_library_archive,
+)
+from provider_mirrors import ProviderRewriter
 
 
-def _nfo(root_name: str, values: dict[str, object]) -> str:
+# Text lxml escapes beyond &, < and > (a carriage return) or refuses (other
+# control characters, surrogates, U+FFFE/U+FFFF)
+_NFO_SPECIAL_TEXT = re.compile("[\x00-\x08\x0b-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def _nfo_tree(root_name: str, values: dict[str, object]) -> str:
     root = etree.Element(root_name)
     for key, value in values.items():
         if value is None or value == "":
@@ -24,6 +47,34 @@ def _nfo(root_name: str, values: dict[str, object]) -> str:
     return etree.tostring(root, encoding="unicode")
 
 
+def _nfo(root_name: str, values: dict[str, object]) -> str:
+    """A flat NFO document, byte-identical to serializing it with lxml.
+
+    Catalogs render one for every record, so plain text is escaped with
+    string replacements instead of building a tree; values lxml would treat
+    specially go through ``_nfo_tree``, including the errors it raises.
+    """
+    children = []
+    for key, value in values.items():
+        if value is None or value == "":
+            continue
+        text = str(value)
+        if "&" in text or "<" in text or ">" in text:
+            text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        children.append(f"<{key}>{text}</{key}>")
+    if not children:
+        return f"<{root_name}/>"
+    body = "".join(children)
+    if _NFO_SPECIAL_TEXT.search(body):
+        return _nfo_tree(root_name, values)
+    return f"<{root_name}>{body}</{root_name}>"
+
+
+def _record_id(line: str) -> str:
+    # Every record is serialized with "id" first and ids never need escaping
+    return line[7:line.index('"', 7)]
+
+
 def _selected(group: str, selected_groups: list[str]) -> bool:
     return not selected_groups or group in selected_groups
 
@@ -32,6 +83,806 @@ def _below(count: int, limit: int | None) -> bool:
     return limit is None or count < limit
 
 
+def _json_line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+CATALOG_FILE = "vod.catalog.jsonl"
+DIAGNOSTICS_FILE = "vod.parse-diagnostics.jsonl"
+MANIFEST_FILE = "vod.manifest.json"
+INDEX_FILE = "vod.index.json"
+DELTA_FILE = "vod.delta.jsonl"
+# Block-compressed catalog (profile "compress_catalog"): gzip members that each
+# hold whole lines, plus an index of where every block starts
+BLOCK_CATALOG_FILE = "vod.catalog.jsonl.gz"
+BLOCK_INDEX_FILE = "vod.catalog.blocks.json"
+CATALOG_BLOCK_BYTES = 256 * 1024
+# Per playlist, next to vod-overrides.json
+PARSE_CACHE_FILE = "vod-parse-cache.json"
+PARSE_CACHE_VERSION = 1
+# Below this many selected entries, worker processes cost more than they save
+PARALLEL_MIN_ENTRIES = 5000
+# Selected entries handed to the workers at a time; at most two batches per
+# worker are in flight, which bounds what the writers hold in memory
+PARALLEL_BATCH_ENTRIES = 5000
+
+
+class _CatalogBlocks:
+    """Write catalog lines as independently decompressible gzip members.
+
+    Each member holds whole lines and roughly ``CATALOG_BLOCK_BYTES`` of
+    JSONL, so one page costs one block read, and the file as a whole is
+    still a valid gzip file for ordinary tools. ``close`` writes the block
+    index: ``[uncompressed_start, compressed_start, compressed_length]``,
+    plus the catalog's compressed size so a reader can tell whether the
+    index belongs to the catalog it opened.
+    """
+
+    def __init__(self, path: Path, index_path: Path) -> None:
+        self.output = path.open("wb")
+        self.index_path = index_path
+        self.pending: list[bytes] = []
+        self.pending_bytes = 0
+        self.blocks: list[list[int]] = []
+        self.uncompressed = 0
+        self.compressed = 0
+        self.records = 0
+
+    def write(self, line: str) -> None:
+        data = line.encode("utf-8")
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+        self.records += 1
+        if self.pending_bytes >= CATALOG_BLOCK_BYTES:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.pending:
+            return
+        raw = b"".join(self.pending)
+        block = gzip.compress(raw, mtime=0)
+        self.output.write(block)
+        self.blocks.append([self.uncompressed, self.compressed, len(block)])
+        self.uncompressed += len(raw)
+        self.compressed += len(block)
+        self.pending = []
+        self.pending_bytes = 0
+
+    def close(self) -> None:
+        if self.output.closed:
+            return
+        self._flush()
+        self.output.close()
+        self.index_path.write_text(json.dumps({
+            "uncompressed_bytes": self.uncompressed,
+            "compressed_bytes": self.compressed,
+            "records": self.records,
+            "blocks": self.blocks,
+        }, separators=(",", ":")), encoding="utf-8")
+
+
+@lru_cache(maxsize=16)
+def _block_index(path: str, mtime_ns: int) -> tuple[list[int], dict]:
+    index = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [block[0] for block in index["blocks"]], index
+
+
+def _read_block_page(path: Path, cursor: int, limit: int) -> tuple[list[dict], int | None]:
+    index_path = path.with_name(BLOCK_INDEX_FILE)
+    starts, index = _block_index(str(index_path), index_path.stat().st_mtime_ns)
+    total = index["uncompressed_bytes"]
+    records = []
+    position = bisect_right(starts, cursor) - 1
+    with path.open("rb") as catalog:
+        if os.fstat(catalog.fileno()).st_size != index.get("compressed_bytes"):
+            # The catalog and its index are replaced one after the other; read
+            # through a catalog published without its index (or before it)
+            return _read_stream_page(gzip.GzipFile(fileobj=catalog), cursor, limit)
+        while cursor < total and len(records) < limit:
+            start, offset, length = index["blocks"][position]
+            catalog.seek(offset)
+            data = zlib.decompress(catalog.read(length), 16 + zlib.MAX_WBITS)
+            line_start = cursor - start
+            while line_start < len(data) and len(records) < limit:
+                line_end = data.index(b"\n", line_start) + 1
+                records.append(json.loads(data[line_start:line_end]))
+                line_start = line_end
+            cursor = start + line_start
+            position += 1
+    return records, cursor if cursor < total else None
+
+
+def _read_stream_page(catalog, cursor: int, limit: int) -> tuple[list[dict], int | None]:
+    """Read a page from an open binary catalog by seeking to ``cursor``."""
+    records = []
+    catalog.seek(cursor)
+    while len(records) < limit:
+        line = catalog.readline()
+        if not line:
+            return records, None
+        records.append(json.loads(line))
+    next_cursor = catalog.tell()
+    if not catalog.read(1):
+        next_cursor = None
+    return records, next_cursor
+
+
+def _iter_catalog_lines(path: Path, compressed: bool):
+    opener = gzip.open if compressed else open
+    with opener(path, "rt", encoding="utf-8") as catalog:
+        yield from catalog
+
+
+def vod_catalog_inputs(
+    playlist: Path,
+    destination: Path,
+    profile: dict,
+    *,
+    overrides_path: Path | None = None,
+    stream_base: str | None = None,
+    active_mirror: str | None = None,
+) -> tuple[dict, dict | None]:
+    """Input signature for a catalog, plus the published manifest if it still matches.
+
+    A manifest whose ``input`` only differs in volatile file fields is
+    refreshed on disk so the next check is cheap again.
+    """
+    destination = Path(destination)
+    manifest_path = destination / MANIFEST_FILE
+    previous = _read_manifest(manifest_path)
+    previous_input = previous.get("input") or {}
+    overrides_file = Path(overrides_path) if overrides_path else None
+    inputs = {
+        "exporter": _code_digest(__name__, "jellyfin_vod_export", "title_parsing", "jellyfin_export", "provider_mirrors"),
+        "playlist": _file_signature(Path(playlist), previous_input.get("playlist")),
+        "overrides": (
+            _file_signature(overrides_file, previous_input.get("overrides"))
+            if overrides_file and overrides_file.exists() else None
+        ),
+        "profile": profile,
+        "stream_base": stream_base,
+        "active_mirror": active_mirror,
+    }
+    if not _reusable_manifest(previous, inputs, destination, {
+        previous.get("catalog_file", CATALOG_FILE): previous.get("catalog_bytes"),
+        DIAGNOSTICS_FILE: previous.get("diagnostics_bytes"),
+    }):
+        return inputs, None
+    if previous["input"] != inputs:
+        previous["input"] = inputs
+        _write_manifest(manifest_path, previous)
+    return inputs, {**previous, "unchanged": True}
+
+
+def overrides_digest(path: Path | None) -> str | None:
+    """sha256 of a ``vod-overrides.json`` file, or None when there is none."""
+    if not path or not Path(path).exists():
+        return None
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+class VodParseCache:
+    """Parsed titles and derived paths of a playlist's VOD entries, kept between exports.
+
+    Entries are keyed by stable id and display name, so a renamed or moved
+    stream is parsed again. They hold the results of title parsing, stable-ID
+    overrides, series aliases and stream URL rewriting, and the whole cache is
+    dropped when the overrides file, stream base, active mirror or parsing
+    code change. The cache is shared by all of the playlist's profiles, so
+    ``save`` keeps the entries of other profiles too and only drops those
+    whose stream was not ``seen`` in the playlist, so streams the provider
+    removed do not accumulate. Without a ``path`` the cache lives in memory
+    only.
+
+    The file holds two JSON lines, the signature and then the entries, so
+    ``recorded_signature`` can tell which overrides the last export parsed
+    without loading the entries.
+    """
+
+    def __init__(self, path: Path | None, signature: dict, entries: dict[str, dict] | None = None) -> None:
+        self.path = Path(path) if path else None
+        self.signature = signature
+        self.entries = entries or {}
+        self.used: dict[str, dict] = {}
+        self.present: set[str] = set()
+        self.misses = 0
+
+    @classmethod
+    def load(
+        cls,
+        path: Path | None,
+        *,
+        overrides_path: Path | None = None,
+        stream_base: str | None = None,
+        active_mirror: str | None = None,
+    ) -> "VodParseCache":
+        signature = {
+            "version": PARSE_CACHE_VERSION,
+            # jellyfin_export derives the stable ids the entries are keyed on
+            "code": _code_digest(__name__, "jellyfin_vod_export", "title_parsing", "jellyfin_export", "provider_mirrors"),
+            "overrides": overrides_digest(overrides_path),
+            "stream_base": stream_base,
+            "active_mirror": active_mirror,
+        }
+        entries = None
+        if path:
+            try:
+                with Path(path).open(encoding="utf-8") as cached:
+                    if json.loads(cached.readline()) == signature:
+                        entries = json.loads(cached.readline())
+            except (OSError, ValueError):
+                pass
+        return cls(path, signature, entries)
+
+    @staticmethod
+    def recorded_signature(path: Path) -> dict:
+        """The signature of the cache saved at ``path``, or ``{}``."""
+        try:
+            with Path(path).open(encoding="utf-8") as cached:
+                return json.loads(cached.readline())
+        except (OSError, ValueError):
+            return {}
+
+    def seen(self, entry: M3uEntry) -> None:
+        """Record a playlist entry, so ``save`` keeps its parse for any profile."""
+        if entry.content_kind != "live":
+            self.present.add(f"{entry.stable_id}:{_display_name(entry)}")
+
+    def get(self, item_id: str, name: str, kind: str) -> dict | None:
+        key = f"{item_id}:{name}"
+        entry = self.used.get(key) or self.entries.get(key)
+        if entry is None or entry.get("kind") != kind:
+            return None
+        self.used[key] = entry
+        return entry
+
+    def put(self, item_id: str, name: str, entry: dict) -> None:
+        self.used[f"{item_id}:{name}"] = entry
+        self.misses += 1
+
+    def save(self) -> None:
+        """Write the entries used since ``load`` and the stored ones still ``seen``, unless nothing changed."""
+        if self.path is None:
+            return
+        entries = {key: entry for key, entry in self.entries.items() if key in self.present}
+        entries.update(self.used)
+        if not self.misses and len(entries) == len(self.entries):
+            return
+        staged = self.path.with_name(f".{self.path.name}.tmp")
+        with staged.open("w", encoding="utf-8", newline="\n") as cached:
+            cached.write(json.dumps(self.signature, separators=(",", ":")) + "\n")
+            cached.write(json.dumps(entries, ensure_ascii=False, separators=(",", ":")) + "\n")
+        staged.replace(self.path)
+        self.entries, self.misses = entries, 0
+
+
+class _EntryPreparer:
+    """The part of catalog writing that depends on nothing but the entry.
+
+    Parsing an entry's title and rendering its record need neither writer
+    state nor the profile, so ``VodPreparation`` can run them in worker
+    processes, once for all profiles, and leave only the ordered work to
+    each ``VodCatalogWriter``.
+    """
+
+    def __init__(
+        self,
+        *,
+        overrides_path: Path | None = None,
+        stream_base: str | None = None,
+        active_mirror: str | None = None,
+    ) -> None:
+        self.rewrite = ProviderRewriter(stream_base, active_mirror)
+        self.aliases = {}
+        self.item_overrides = {}
+        if overrides_path and Path(overrides_path).exists():
+            override_data = json.loads(Path(overrides_path).read_text(encoding="utf-8"))
+            self.aliases = override_data.get("series_aliases", {})
+            self.item_overrides = override_data.get("items", {})
+
+    def prepare(self, entry: M3uEntry, route: str, item_id: str, parsed: dict | None = None) -> tuple[dict, str]:
+        """The parse of ``entry``, unless ``parsed`` is given, and its catalog or diagnostic line."""
+        if parsed is None:
+            parsed = self._parse_movie(entry, item_id) if route == "movie" else self._parse_episode(entry, item_id)
+        group = entry.attributes.get("group-title", "")
+        if route == "movie":
+            title, folder = parsed["title"], parsed["folder"]
+            return parsed, _json_line({
+                "id": item_id,
+                "kind": "movie",
+                "relative_path": f"{folder}/movie.strm",
+                "stream_url": parsed["stream_url"],
+                "nfo_relative_path": f"{folder}/movie.nfo",
+                "nfo": _nfo("movie", {
+                    "title": title, "originaltitle": entry.attributes.get("tvg-name") or title,
+                    "year": parsed["year"], "genre": group, "tag": group,
+                    "uniqueid": item_id, "thumb": entry.attributes.get("tvg-logo"),
+                }),
+            })
+        if "unparsed" in parsed:
+            return parsed, _json_line({
+                "id": item_id,
+                "original_title": _display_name(entry),
+                "inferred_series": parsed["series"],
+                "season": parsed["season"],
+                "episode": parsed["episode"],
+                "group": group,
+                "reason": parsed["unparsed"],
+            })
+        episode_title, season = parsed["episode_title"], parsed["season"]
+        folder = f'{parsed["show"]}/Season {season:02d}'
+        return parsed, _json_line({
+            "id": item_id, "kind": "episode",
+            "relative_path": f'{folder}/{parsed["stem"]}.strm',
+            "stream_url": parsed["stream_url"],
+            "nfo_relative_path": f'{folder}/{parsed["stem"]}.nfo',
+            "nfo": _nfo("episodedetails", {
+                "title": episode_title, "originaltitle": entry.attributes.get("tvg-name") or episode_title,
+                "showtitle": parsed["series"], "season": season,
+                "episode": parsed["episode"], "genre": group, "tag": group,
+                "uniqueid": item_id, "thumb": entry.attributes.get("tvg-logo"),
+            }),
+            "parse_note": parsed["parse_note"],
+        })
+
+    def _stream_url(self, entry: M3uEntry) -> str:
+        return _jellyfin_stream_url(self.rewrite(entry.url))
+
+    def _parse_movie(self, entry: M3uEntry, item_id: str) -> dict:
+        title, year = _movie_info(entry)
+        return {
+            "kind": "movie", "title": title, "year": year,
+            "folder": f"Movies/{_safe(title)} [m3u-{item_id}]",
+            "stream_url": self._stream_url(entry),
+        }
+
+    def _parse_episode(self, entry: M3uEntry, item_id: str) -> dict:
+        """The episode fields and paths of ``entry``, or its diagnostic under ``"unparsed"``."""
+        parsed = _episode_info(entry)
+        override = self.item_overrides.get(item_id)
+        applied = False
+        if override:
+            try:
+                parsed = (
+                    str(override["series"]).strip(), int(override.get("season", 1)),
+                    int(override["episode"]), str(override.get("episode_title") or f'Episode {override["episode"]}').strip(),
+                    "stable source ID override",
+                )
+                applied = True
+            except (KeyError, TypeError, ValueError):
+                parsed = None
+        if parsed is None or not parsed[0] or parsed[1] < 0 or parsed[2] < 1:
+            result = {
+                "kind": "episode", "override_applied": applied,
+                "unparsed": "invalid stable-ID override" if override else "no supported episode marker",
+                "series": parsed[0] if parsed else None,
+                "season": parsed[1] if parsed else None,
+                "episode": parsed[2] if parsed else None,
+            }
+        else:
+            series, season, episode, episode_title, parse_note = parsed
+            series = self.aliases.get(series, series)
+            series_id = hashlib.sha256(series.casefold().encode("utf-8")).hexdigest()[:24]
+            result = {
+                "kind": "episode", "override_applied": applied,
+                "series": series, "season": season, "episode": episode,
+                "episode_title": episode_title, "parse_note": parse_note, "series_id": series_id,
+                "show": f"Shows/{_safe(series)} [m3u-{series_id}]",
+                "stem": f"S{season:02d}E{episode:03d} [m3u-{item_id}]",
+                "stream_url": self._stream_url(entry),
+            }
+        return result
+
+
+# The run's preparer, sent once to each worker process
+_worker_preparer: _EntryPreparer | None = None
+
+
+def _start_worker(preparer: _EntryPreparer) -> None:
+    global _worker_preparer
+    _worker_preparer = preparer
+
+
+def _prepare_partition(items: list[tuple]) -> list[tuple[int, dict | None, str]]:
+    """Worker side of ``VodPreparation``: ``(position, parse, line)`` per item, the parse only when new."""
+    prepared = []
+    for position, entry, route, item_id, cached in items:
+        parsed, line = _worker_preparer.prepare(entry, route, item_id, cached)
+        prepared.append((position, None if cached is not None else parsed, line))
+    return prepared
+
+
+def _group_partitions(groups: list[str], count: int) -> list[list[int]]:
+    """Split the positions of ``groups`` into at most ``count`` partitions of whole groups.
+
+    Groups go largest first to the smallest partition. A group larger than an
+    even share is first cut into share-sized runs, so one huge group does not
+    leave the other workers idle.
+    """
+    positions = defaultdict(list)
+    for position, group in enumerate(groups):
+        positions[group].append(position)
+    share = max(1, -(-len(groups) // count))
+    runs = [run[start:start + share] for run in positions.values() for start in range(0, len(run), share)]
+    partitions: list[list[int]] = [[] for _ in range(min(count, len(runs)))]
+    sizes = [(0, number) for number in range(len(partitions))]
+    for run in sorted(runs, key=len, reverse=True):
+        size, number = heapq.heappop(sizes)
+        partitions[number].extend(run)
+        heapq.heappush(sizes, (size + len(run), number))
+    return partitions
+
+
+_main_lock = threading.Lock()
+
+
+@contextmanager
+def _without_main_script():
+    """Start worker processes without re-running the parent's ``__main__`` script.
+
+    A spawned process first imports the script its parent was started as,
+    which for ``python app.py`` would repeat the web server's setup in every
+    worker. The workers only need this module, so the script's path is
+    hidden from ``multiprocessing`` while they start.
+    """
+    main = sys.modules["__main__"]
+    with _main_lock:
+        path = main.__dict__.pop("__file__", None)
+        try:
+            yield
+        finally:
+            if path is not None:
+                main.__file__ = path
+
+
+class VodPreparation:
+    """Parse and render the entries selected by a run's catalog writers, once each.
+
+    The writers of one pipeline run share a preparation and are handed each
+    playlist entry in turn, so an entry that several profiles select is
+    prepared once and its line goes to each of them.
+
+    With ``workers`` above one, selected entries are queued and handed to
+    one process pool for the whole run in batches of
+    ``PARALLEL_BATCH_ENTRIES``, partitioned by group, while the playlist is
+    still being read. At most two batches per worker are in flight. Workers
+    are spawned rather than forked, because exports run in threads of the
+    web server, and a run that never fills a batch of
+    ``PARALLEL_MIN_ENTRIES`` is prepared in-process.
+    """
+
+    def __init__(
+        self,
+        *,
+        overrides_path: Path | None = None,
+        stream_base: str | None = None,
+        active_mirror: str | None = None,
+        workers: int | None = None,
+    ) -> None:
+        self.preparer = _EntryPreparer(
+            overrides_path=overrides_path, stream_base=stream_base, active_mirror=active_mirror
+        )
+        self.workers = workers or 1
+        self.writers: list[VodCatalogWriter] = []
+        self.pending: list[tuple] = []
+        self.pool: ProcessPoolExecutor | None = None
+        self.in_flight: deque[tuple[list[tuple], list]] = deque()
+        self.last_entry: M3uEntry | None = None
+        self.last_slot: list = []
+
+    def request(self, entry: M3uEntry, route: str, item_id: str, cached: dict | None) -> list:
+        """The slot that receives ``(parse, line)`` for ``entry`` once it is prepared."""
+        if entry is self.last_entry:
+            # Another profile selected the same playlist entry
+            return self.last_slot
+        slot: list = []
+        self.last_entry, self.last_slot = entry, slot
+        if self.workers == 1:
+            slot.append(self.preparer.prepare(entry, route, item_id, cached))
+            return slot
+        self.pending.append((entry, route, item_id, cached, slot))
+        if len(self.pending) >= PARALLEL_BATCH_ENTRIES:
+            self._submit_pending()
+        return slot
+
+    def finish(self) -> None:
+        """Prepare everything queued, in-process for a small run, and hand it to the writers."""
+        if self.pool is None and len(self.pending) < PARALLEL_MIN_ENTRIES:
+            batch, self.pending = self.pending, []
+            for entry, route, item_id, cached, slot in batch:
+                slot.append(self.preparer.prepare(entry, route, item_id, cached))
+        else:
+            if self.pending:
+                self._submit_pending()
+            while self.in_flight:
+                self._accept_batch(*self.in_flight.popleft())
+        self.close()
+        for writer in self.writers:
+            writer._accept_prepared()
+
+    def close(self) -> None:
+        """Stop the workers and drop whatever is still queued; a no-op after ``finish``."""
+        self.pending.clear()
+        self.in_flight.clear()
+        self.last_entry, self.last_slot = None, []
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def _submit_pending(self) -> None:
+        """Hand the queued entries to the workers, first accepting batches beyond the in-flight bound."""
+        batch, self.pending = self.pending, []
+        partitions = _group_partitions([entry.attributes.get("group-title", "") for entry, *_ in batch], self.workers)
+        # Workers start on demand, so any submission may spawn one
+        with _without_main_script():
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_start_worker, initargs=(self.preparer,),
+                )
+            futures = [
+                self.pool.submit(_prepare_partition, [(position, *batch[position][:4]) for position in partition])
+                for partition in partitions
+            ]
+        self.in_flight.append((batch, futures))
+        while len(self.in_flight) > 2 * self.workers:
+            self._accept_batch(*self.in_flight.popleft())
+
+    def _accept_batch(self, batch: list[tuple], futures: list) -> None:
+        for future in futures:
+            for position, parsed, line in future.result():
+                _, _, _, cached, slot = batch[position]
+                slot.append((parsed or cached, line))
+        for writer in self.writers:
+            writer._accept_prepared()
+
+
+class VodCatalogWriter:
+    """Build a catalog revision one playlist entry at a time.
+
+    Records go to hidden ``.partial`` files. ``stage`` completes them and the
+    manifest, and they only replace the published catalog and diagnostics,
+    followed by the manifest, on ``publish``. Until then, and after
+    ``discard``, the previous revision stays readable.
+
+    Publishing also writes ``vod.index.json`` (record id to content hash) and,
+    when the previous revision's index is on disk, ``vod.delta.jsonl``: the
+    added and changed records plus a ``"removed"`` tombstone per vanished id.
+
+    Entries are parsed through ``parse_cache`` and prepared by
+    ``preparation``, which callers share between the writers of one
+    playlist; the cache is saved after publishing. Without a
+    ``preparation`` the writer makes its own, with ``workers`` processes.
+    Limits, series and season records and the revision digest are applied
+    to prepared entries in playlist order, so the output is the same however
+    they were prepared.
+    """
+
+    def __init__(
+        self,
+        destination: Path,
+        profile: dict,
+        inputs: dict,
+        *,
+        overrides_path: Path | None = None,
+        stream_base: str | None = None,
+        active_mirror: str | None = None,
+        parse_cache: VodParseCache | None = None,
+        preparation: VodPreparation | None = None,
+        workers: int | None = None,
+    ) -> None:
+        self.destination = Path(destination)
+        self.destination.mkdir(parents=True, exist_ok=True)
+        self.profile = profile
+        self.inputs = inputs
+        self.owns_preparation = preparation is None
+        self.preparation = preparation or VodPreparation(
+            overrides_path=overrides_path, stream_base=stream_base, active_mirror=active_mirror, workers=workers
+        )
+        self.preparation.writers.append(self)
+        self.queue: deque[tuple] = deque()
+        self.parse_cache = parse_cache or VodParseCache.load(
+            None, overrides_path=overrides_path, stream_base=stream_base, active_mirror=active_mirror
+        )
+        self.counts = Counter()
+        self.series_written: set[str] = set()
+        self.seasons_written: set[tuple[str, int]] = set()
+        self.digest = hashlib.sha256()
+        self.records = 0
+        self.bytes_written = 0
+        self.items: dict[str, str] = {}
+        self.manifest: dict | None = None
+        self.compressed = bool(profile.get("compress_catalog"))
+        self.catalog_file = BLOCK_CATALOG_FILE if self.compressed else CATALOG_FILE
+        self._partial = {
+            name: self.destination / f".{name}.partial"
+            for name in (self.catalog_file, DIAGNOSTICS_FILE, DELTA_FILE, INDEX_FILE)
+            + ((BLOCK_INDEX_FILE,) if self.compressed else ())
+        }
+        if self.compressed:
+            self.catalog = _CatalogBlocks(self._partial[BLOCK_CATALOG_FILE], self._partial[BLOCK_INDEX_FILE])
+        else:
+            self.catalog = self._partial[CATALOG_FILE].open("w", encoding="utf-8", newline="\n")
+        self.diagnostics = self._partial[DIAGNOSTICS_FILE].open("w", encoding="utf-8", newline="\n")
+
+    def stage(self) -> dict:
+        """Finish the catalog, diagnostics, delta and index beside the published ones; returns the manifest."""
+        self.preparation.finish()
+        self.catalog.close()
+        self.diagnostics.close()
+        revision = self.digest.hexdigest()
+        delta = self._write_delta(_read_manifest(self.destination / MANIFEST_FILE), revision)
+        self._partial[INDEX_FILE].write_text(
+            json.dumps({"revision": revision, "items": self.items}, separators=(",", ":")), encoding="utf-8"
+        )
+        self.manifest = {
+            "format": "m3u.guide-vod-catalog",
+            "version": 1,
+            "profile": self.profile["name"],
+            "revision": revision,
+            "counts": dict(self.counts),
+            "records": self.records,
+            "catalog_file": self.catalog_file,
+            "catalog_bytes": self._partial[self.catalog_file].stat().st_size,
+            "diagnostics_bytes": self._partial[DIAGNOSTICS_FILE].stat().st_size,
+            "remove_missing": bool(self.profile.get("remove_missing_vod", True)),
+            "delta": delta,
+            "input": self.inputs,
+        }
+        return self.manifest
+
+    def publish(self) -> dict:
+        """Replace the published catalog, diagnostics, delta and index, then write the manifest."""
+        if self.manifest is None:
+            self.stage()
+        for name, path in self._partial.items():
+            if path.exists():
+                path.replace(self.destination / name)
+        if self.manifest["delta"] is None:
+            # No delta from the previous revision: do not leave an older one behind
+            (self.destination / DELTA_FILE).unlink(missing_ok=True)
+        # Drop the other storage format left by an earlier revision
+        stale = (CATALOG_FILE,) if self.compressed else (BLOCK_CATALOG_FILE, BLOCK_INDEX_FILE)
+        for name in stale:
+            (self.destination / name).unlink(missing_ok=True)
+        _write_manifest(self.destination / MANIFEST_FILE, self.manifest)
+        return self.manifest
+
+    def _write_delta(self, previous: dict, revision: str) -> dict | None:
+        """Stage the changes from the published revision; returns the manifest's ``delta``."""
+        if previous.get("revision") == revision:
+            # Same content again: the published delta still ends at this revision
+            return previous.get("delta")
+        index = _read_manifest(self.destination / INDEX_FILE)
+        if not previous.get("revision") or index.get("revision") != previous["revision"]:
+            return None
+        old = index.get("items") or {}
+        upserts = {item_id for item_id, digest in self.items.items() if old.get(item_id) != digest}
+        counts = Counter()
+        with self._partial[DELTA_FILE].open("w", encoding="utf-8", newline="\n") as delta:
+            for line in _iter_catalog_lines(self._partial[self.catalog_file], self.compressed):
+                item_id = _record_id(line)
+                if item_id in upserts:
+                    change = "changed" if item_id in old else "added"
+                    delta.write(f'{{"change":"{change}","record":{line.rstrip()}}}\n')
+                    counts[change] += 1
+            for item_id in sorted(old.keys() - self.items.keys()):
+                delta.write(json.dumps({"change": "removed", "id": item_id}) + "\n")
+                counts["removed"] += 1
+        return {"from": previous["revision"], **counts}
+
+    def discard(self) -> None:
+        """Drop an unpublished revision; a no-op after ``publish``."""
+        self.queue.clear()
+        if self.owns_preparation:
+            self.preparation.close()
+        self.catalog.close()
+        self.diagnostics.close()
+        for path in self._partial.values():
+            path.unlink(missing_ok=True)
+
+    def _write(self, record: dict) -> None:
+        self._write_line(record["id"], _json_line(record))
+
+    def _write_line(self, item_id: str, line: str) -> None:
+        encoded = line.encode("utf-8")
+        self.catalog.write(line)
+        self.digest.update(encoded)
+        self.records += 1
+        self.bytes_written += len(encoded)
+        digest = hashlib.blake2b(encoded, digest_size=8)
+        if item_id in self.items:
+            # The same stream listed twice: both records belong to the id
+            digest.update(self.items[item_id].encode("ascii"))
+        self.items[item_id] = digest.hexdigest()
+
+    def _room_for(self, route: str) -> bool:
+        if route == "movie":
+            return _below(self.counts["movies"], self.profile.get("max_movies"))
+        return _below(self.counts["episodes"], self.profile.get("max_episodes"))
+
+    def _route(self, entry: M3uEntry) -> str | None:
+        """``"movie"`` or ``"episode"`` when the profile selects ``entry``, otherwise None."""
+        group = entry.attributes.get("group-title", "")
+        if entry.content_kind == "movie" and self.profile.get("include_movies", True) and _selected(group, self.profile.get("movie_groups", [])):
+            return "movie"
+        if entry.content_kind == "series" and self.profile.get("include_series", True) and _selected(group, self.profile.get("series_groups", [])):
+            return "episode"
+        return None
+
+    def add(self, entry: M3uEntry) -> None:
+        route = self._route(entry)
+        # Counts only grow, so an entry over a limit now is never accepted later
+        if route is None or not self._room_for(route):
+            return
+        item_id, name = _stable_id(entry), _display_name(entry)
+        cached = self.parse_cache.get(item_id, name, route)
+        slot = self.preparation.request(entry, route, item_id, cached)
+        self.queue.append((entry, route, item_id, name, cached, slot))
+        self._accept_prepared()
+
+    def _accept_prepared(self) -> None:
+        """Accept the queued entries that are prepared, stopping at the first that is not."""
+        while self.queue and self.queue[0][5]:
+            entry, route, item_id, name, cached, slot = self.queue.popleft()
+            if self._room_for(route):
+                parsed, line = slot[0]
+                self._accept(entry, route, item_id, name, cached, parsed, line)
+
+    def _accept(
+        self, entry: M3uEntry, route: str, item_id: str, name: str, cached: dict | None, parsed: dict, line: str
+    ) -> None:
+        """Apply a prepared entry: counts, limits, series and season records, then its line."""
+        if cached is None:
+            self.parse_cache.put(item_id, name, parsed)
+        if route == "movie":
+            self._write_line(item_id, line)
+            self.counts["movies"] += 1
+            return
+        group = entry.attributes.get("group-title", "")
+        self.counts["selected_series_entries"] += 1
+        if parsed["override_applied"]:
+            self.counts["overrides_applied"] += 1
+        if "unparsed" in parsed:
+            self.counts["unparsed_episodes"] += 1
+            self.diagnostics.write(line)
+            return
+        self.counts["parsed_series_entries"] += 1
+        series, season, series_id, show = parsed["series"], parsed["season"], parsed["series_id"], parsed["show"]
+        if series_id not in self.series_written and not _below(self.counts["series"], self.profile.get("max_series")):
+            return
+        if series_id not in self.series_written:
+            show_record = {
+                "id": series_id, "kind": "series",
+                "relative_path": f"{show}/tvshow.nfo",
+                "content": _nfo("tvshow", {
+                    "title": series, "originaltitle": entry.attributes.get("tvg-name") or series,
+                    "genre": group, "tag": group, "uniqueid": series_id,
+                    "thumb": entry.attributes.get("tvg-logo"),
+                }),
+            }
+            self._write(show_record)
+            self.series_written.add(series_id)
+            self.counts["series"] += 1
+        season_key = (series_id, season)
+        if season_key not in self.seasons_written:
+            season_record = {
+                "id": f"{series_id}-season-{season}", "kind": "series",
+                "relative_path": f"{show}/Season {season:02d}/season.nfo",
+                "content": _nfo("season", {
+                    "title": f"Season {season}", "seasonnumber": season,
+                    "showtitle": series, "genre": group, "tag": group,
+                    "uniqueid": f"{series_id}-season-{season}",
+                    "thumb": entry.attributes.get("tvg-logo"),
+                }),
+            }
+            self._write(season_record)
+            self.seasons_written.add(season_key)
+            self.counts["seasons"] += 1
+        self._write_line(item_id, line)
+        self.counts["episodes"] += 1
+
+
 def generate_vod_catalog(
     playlist: Path,
     destination: Path,
@@ -40,156 +891,64 @@ def generate_vod_catalog(
     overrides_path: Path | None = None,
     stream_base: str | None = None,
     active_mirror: str | None = None,
+    workers: int | None = None,
 ) -> dict:
-    """Stream all selected VOD entries into JSONL plus a revision manifest."""
-    destination = Path(destination)
-    destination.mkdir(parents=True, exist_ok=True)
-    catalog_path = destination / "vod.catalog.jsonl"
-    overrides = {}
-    item_overrides = {}
-    if overrides_path and Path(overrides_path).exists():
-        override_data = json.loads(Path(overrides_path).read_text(encoding="utf-8"))
-        overrides = override_data.get("series_aliases", {})
-        item_overrides = override_data.get("items", {})
-    counts = Counter()
-    series_written: set[str] = set()
-    seasons_written: set[tuple[str, int]] = set()
-    digest = hashlib.sha256()
-    diagnostics_path = destination / "vod.parse-diagnostics.jsonl"
-
-    with catalog_path.open("w", encoding="utf-8", newline="\n") as catalog, diagnostics_path.open("w", encoding="utf-8", newline="\n") as diagnostics:
+    """Stream all selected VOD entries into JSONL plus a revision manifest.
+
+    ``workers`` above one parses and renders entries in that many processes;
+    see ``VodCatalogWriter``.
+    """
+    options = {"overrides_path": overrides_path, "stream_base": stream_base, "active_mirror": active_mirror}
+    inputs, unchanged = vod_catalog_inputs(playlist, destination, profile, **options)
+    if unchanged is not None:
+        return unchanged
+    parse_cache = VodParseCache.load(Path(playlist).with_name(PARSE_CACHE_FILE), **options)
+    writer = VodCatalogWriter(destination, profile, inputs, parse_cache=parse_cache, workers=workers, **options)
+    try:
         for entry in iter_m3u(Path(playlist)):
-            group = entry.attributes.get("group-title", "")
-            record = None
-            if entry.content_kind == "movie" and profile.get("include_movies", True) and _selected(group, profile.get("movie_groups", [])) and _below(counts["movies"], profile.get("max_movies")):
-                title, year = _movie_info(entry)
-                item_id = _stable_id(entry)
-                folder = f"Movies/{_safe(title)} [m3u-{item_id}]"
-                record = {
-                    "id": item_id,
-                    "kind": "movie",
-                    "relative_path": f"{folder}/movie.strm",
-                    "stream_url": _jellyfin_stream_url(rewrite_provider_url(entry.url, stream_base, active_mirror)),
-                    "nfo_relative_path": f"{folder}/movie.nfo",
-                    "nfo": _nfo("movie", {
-                        "title": title, "originaltitle": entry.attributes.get("tvg-name") or title,
-                        "year": year, "genre": group, "tag": group,
-                        "uniqueid": item_id, "thumb": entry.attributes.get("tvg-logo"),
-                    }),
-                }
-                counts["movies"] += 1
-            elif entry.content_kind == "series" and profile.get("include_series", True) and _selected(group, profile.get("series_groups", [])) and _below(counts["episodes"], profile.get("max_episodes")):
-                counts["selected_series_entries"] += 1
-                item_id = _stable_id(entry)
-                parsed = _episode_info(entry)
-                override = item_overrides.get(item_id)
-                if override:
-                    try:
-                        parsed = (
-                            str(override["series"]).strip(), int(override.get("season", 1)),
-                            int(override["episode"]), str(override.get("episode_title") or f'Episode {override["episode"]}').strip(),
-                            "stable source ID override",
-                        )
-                        counts["overrides_applied"] += 1
-                    except (KeyError, TypeError, ValueError):
-                        parsed = None
-                if parsed is None or not parsed[0] or parsed[1] < 0 or parsed[2] < 1:
-                    counts["unparsed_episodes"] += 1
-                    diagnostic = {
-                        "id": item_id,
-                        "original_title": _display_name(entry),
-                        "inferred_series": parsed[0] if parsed else None,
-                        "season": parsed[1] if parsed else None,
-                        "episode": parsed[2] if parsed else None,
-                        "group": group,
-                        "reason": "invalid stable-ID override" if override else "no supported episode marker",
-                    }
-                    diagnostics.write(json.dumps(diagnostic, ensure_ascii=False, separators=(",", ":")) + "\n")
-                    continue
-                series, season, episode, episode_title, parse_note = parsed
-                counts["parsed_series_entries"] += 1
-                series = overrides.get(series, series)
-                series_id = hashlib.sha256(series.casefold().encode("utf-8")).hexdigest()[:24]
-                if series_id not in series_written and not _below(counts["series"], profile.get("max_series")):
-                    continue
-                show = f"Shows/{_safe(series)} [m3u-{series_id}]"
-                if series_id not in series_written:
-                    show_record = {
-                        "id": series_id, "kind": "series",
-                        "relative_path": f"{show}/tvshow.nfo",
-                        "content": _nfo("tvshow", {
-                            "title": series, "originaltitle": entry.attributes.get("tvg-name") or series,
-                            "genre": group, "tag": group, "uniqueid": series_id,
-                            "thumb": entry.attributes.get("tvg-logo"),
-                        }),
-                    }
-                    line = json.dumps(show_record, ensure_ascii=False, separators=(",", ":")) + "\n"
-                    catalog.write(line)
-                    digest.update(line.encode("utf-8"))
-                    series_written.add(series_id)
-                    counts["series"] += 1
-                season_key = (series_id, season)
-                if season_key not in seasons_written:
-                    season_record = {
-                        "id": f"{series_id}-season-{season}", "kind": "series",
-                        "relative_path": f"{show}/Season {season:02d}/season.nfo",
-                        "content": _nfo("season", {
-                            "title": f"Season {season}", "seasonnumber": season,
-                            "showtitle": series, "genre": group, "tag": group,
-                            "uniqueid": f"{series_id}-season-{season}",
-                            "thumb": entry.attributes.get("tvg-logo"),
-                        }),
-                    }
-                    line = json.dumps(season_record, ensure_ascii=False, separators=(",", ":")) + "\n"
-                    catalog.write(line)
-                    digest.update(line.encode("utf-8"))
-                    seasons_written.add(season_key)
-                    counts["seasons"] += 1
-                stem = f"S{season:02d}E{episode:03d} [m3u-{item_id}]"
-                folder = f"{show}/Season {season:02d}"
-                record = {
-                    "id": item_id, "kind": "episode",
-                    "relative_path": f"{folder}/{stem}.strm",
-                    "stream_url": _jellyfin_stream_url(rewrite_provider_url(entry.url, stream_base, active_mirror)),
-                    "nfo_relative_path": f"{folder}/{stem}.nfo",
-                    "nfo": _nfo("episodedetails", {
-                        "title": episode_title, "originaltitle": entry.attributes.get("tvg-name") or episode_title,
-                        "showtitle": series, "season": season,
-                        "episode": episode, "genre": group, "tag": group,
-                        "uniqueid": item_id, "thumb": entry.attributes.get("tvg-logo"),
-                    }),
-                    "parse_note": parse_note,
-                }
-                counts["episodes"] += 1
-            if record is not None:
-                line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
-                catalog.write(line)
-                digest.update(line.encode("utf-8"))
-
-    manifest = {
-        "format": "m3u.guide-vod-catalog",
-        "version": 1,
-        "profile": profile["name"],
-        "revision": digest.hexdigest(),
-        "counts": dict(counts),
-        "catalog_bytes": catalog_path.stat().st_size,
-        "diagnostics_bytes": diagnostics_path.stat().st_size,
-        "remove_missing": bool(profile.get("remove_missing_vod", True)),
-    }
-    (destination / "vod.manifest.json").write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
-    return manifest
+            parse_cache.seen(entry)
+            writer.add(entry)
+        manifest = writer.publish()
+        parse_cache.save()
+        return manifest
+    finally:
+        writer.discard()
+
+
+def iter_catalog_archive(path: Path) -> Iterator[bytes]:
+    """Stream a zip of the library a catalog describes, for one-request imports.
+
+    Each record's ``.strm`` and ``.nfo`` files (or a show's or season's
+    ``content``) are archived under their relative paths while the catalog
+    is read, so neither the archive nor the tree is built anywhere first.
+    A path listed twice (the same stream in two groups) is archived once.
+    """
+    def files():
+        seen = set()
+        for line in _iter_catalog_lines(Path(path), Path(path).suffix == ".gz"):
+            record = json.loads(line)
+            if "stream_url" in record:
+                entries = (
+                    (record["relative_path"], record["stream_url"] + "\n"),
+                    (record["nfo_relative_path"], record["nfo"]),
+                )
+            else:
+                entries = ((record["relative_path"], record["content"]),)
+            for name, data in entries:
+                if name not in seen:
+                    seen.add(name)
+                    yield name, data
+
+    return iter_library_archive(files())
 
 
 def read_catalog_page(path: Path, cursor: int, limit: int) -> tuple[list[dict], int | None]:
-    records = []
+    """Up to ``limit`` records from ``cursor`` and the cursor after them (None at the end).
+
+    Cursors are offsets into the uncompressed JSONL, so they mean the same
+    thing for a plain and a block-compressed (``.gz``) catalog.
+    """
+    if Path(path).suffix == ".gz":
+        return _read_block_page(Path(path), cursor, limit)
     with Path(path).open("rb") as catalog:
-        catalog.seek(cursor)
-        while len(records) < limit:
-            line = catalog.readline()
-            if not line:
-                return records, None
-            records.append(json.loads(line))
-        next_cursor = catalog.tell()
-        if not catalog.read(1):
-            next_cursor = None
-    return records, next_cursor
+        return _read_stream_page(catalog, cursor, limit)
@@ -4,30 +4,23 @@ from __future__ import annotations
 
 from collections import Counter
 import hashlib
+import io
 import json
 from pathlib import Path
 import re
 import shutil
+from typing import Iterator
 import zipfile
 
 from lxml import etree
 
 from jellyfin_export import M3uEntry, _jellyfin_stream_url, iter_m3u
+from title_parsing import parse_episode_title, parse_movie_title
 
 
 _INVALID_FILENAME = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
-_YEAR = re.compile(r"\((19\d{2}|20\d{2})\)")
-_EPISODE = re.compile(r"\bS(\d{1,2})E(\d{1,3})\b", re.IGNORECASE)
-_SEASON_EPISODE_WORDS = re.compile(
-    r"\b(?:season|saison|temporada|staffel)\s*(\d{1,2})\s*[-_. ]*"
-    r"(?:episode|episodio|épisode|folge|ep)\s*(\d{1,3})\b", re.IGNORECASE
-)
-_EPISODE_WORD = re.compile(r"\b(?:episode|episodio|épisode|folge|ep)\s*(\d{1,4})\b", re.IGNORECASE)
-_DATE_EPISODE = re.compile(r"\b(20\d{2})[-._ ](0?[1-9]|1[0-2])[-._ ](0?[1-9]|[12]\d|3[01])\b")
-_PUNCTUATED_EPISODE = re.compile(r"\b(\d{1,2})\s*[xX._-]\s*(\d{1,3})\b")
-_ABSOLUTE_EPISODE = re.compile(r"(?:^|\s)[#-]\s*(\d{1,4})\b")
-_PREFIX = re.compile(r"^(?:TOP|NF)\s*[-:]\s*", re.IGNORECASE)
-_SUSPICIOUS_SERIES = re.compile(r"^(?:and|or|the)\b", re.IGNORECASE)
+# Streamed archives are yielded in chunks of about this size, not one per file
+ARCHIVE_CHUNK_BYTES = 64 * 1024
 
 
 def _display_name(entry: M3uEntry) -> str:
@@ -40,69 +33,95 @@ def _safe(value: str) -> str:
 
 
 def _stable_id(entry: M3uEntry) -> str:
-    return hashlib.sha256(entry.url.encode("utf-8")).hexdigest()[:24]
+    return entry.stable_id
 
 
-def _write_nfo(path: Path, root_name: str, values: dict[str, object]) -> None:
+def _nfo_document(root_name: str, values: dict[str, object]) -> bytes:
     root = etree.Element(root_name)
     for key, value in values.items():
         if value is None or value == "":
             continue
         child = etree.SubElement(root, key)
         child.text = str(value)
-    path.write_bytes(etree.tostring(root, pretty_print=True, xml_declaration=True, encoding="utf-8"))
+    return etree.tostring(root, pretty_print=True, xml_declaration=True, encoding="utf-8")
+
+
+class _StreamedZip(io.RawIOBase):
+    """Unseekable sink for ``zipfile``; ``take`` returns what was written since the last call."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks: list[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+class LibraryArchive:
+    """Write library files straight into a zip archive.
+
+    ``.strm`` files are a single URL, so they are stored; everything else is
+    deflated. Entries go to ``file`` as they are written, which may be an
+    unseekable stream.
+    """
+
+    def __init__(self, file) -> None:
+        self.zip = zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, name: str, data: str | bytes) -> None:
+        compression = zipfile.ZIP_STORED if name.endswith(".strm") else zipfile.ZIP_DEFLATED
+        self.zip.writestr(name, data, compress_type=compression)
+
+    def close(self) -> None:
+        self.zip.close()
+
+
+def iter_library_archive(files) -> Iterator[bytes]:
+    """Stream a zip of ``(name, data)`` library files in chunks of about ``ARCHIVE_CHUNK_BYTES``."""
+    stream = _StreamedZip()
+    archive = LibraryArchive(stream)
+    for name, data in files:
+        archive.write(name, data)
+        if stream.size >= ARCHIVE_CHUNK_BYTES:
+            yield stream.take()
+    archive.close()
+    yield stream.take()
+
+
+class _FixtureOutput:
+    """Fixture files written to a directory tree, a zip archive, or both."""
+
+    def __init__(self, root: Path | None, archive: LibraryArchive | None) -> None:
+        self.root = root
+        self.archive = archive
+
+    def write(self, name: str, data: str | bytes) -> None:
+        if self.root is not None:
+            path = self.root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data.encode("utf-8") if isinstance(data, str) else data)
+        if self.archive is not None:
+            self.archive.write(name, data)
 
 
 def _movie_info(entry: M3uEntry) -> tuple[str, int | None]:
-    name = _PREFIX.sub("", _display_name(entry)).strip()
-    match = _YEAR.search(name)
-    return name, int(match.group(1)) if match else None
+    return parse_movie_title(_display_name(entry))
 
 
 def _episode_info(entry: M3uEntry) -> tuple[str, int, int, str, str] | None:
-    name = _display_name(entry)
-    matches = list(_EPISODE.finditer(name))
-    if not matches:
-        candidates = [
-            (_SEASON_EPISODE_WORDS.search(name), "season/episode words"),
-            (_DATE_EPISODE.search(name), "dated episode"),
-            (_PUNCTUATED_EPISODE.search(name), "punctuated season/episode"),
-            (_EPISODE_WORD.search(name), "absolute episode word"),
-            (_ABSOLUTE_EPISODE.search(name), "absolute episode number"),
-        ]
-        match, parse_note = next(((match, note) for match, note in candidates if match), (None, ""))
-        if match is None:
-            return None
-        series = _PREFIX.sub("", name[:match.start()].strip(" -_.:|") )
-        if not series:
-            return None
-        if parse_note == "dated episode":
-            season = int(match.group(1))
-            episode = (int(match.group(2)) * 100) + int(match.group(3))
-        elif match.lastindex == 2:
-            season, episode = int(match.group(1)), int(match.group(2))
-        else:
-            season, episode = 1, int(match.group(1))
-        episode_title = name[match.end():].strip(" -_.:|") or f"Episode {episode}"
-        return series, season, episode, episode_title, parse_note
-    first, last = matches[0], matches[-1]
-    series = _PREFIX.sub("", name[:first.start()].strip(" -"))
-    parse_note = "primary episode marker"
-    # Some providers prepend a truncated title, then repeat the real show name
-    # before a second SxxExx marker. Prefer that repeated value when the first
-    # title visibly begins mid-phrase, retaining useful year/country suffixes.
-    if len(matches) > 1 and (_SUSPICIOUS_SERIES.search(series) or len(series) < 4):
-        repeated = name[first.end():last.start()].strip(" -")
-        repeated = _PREFIX.sub("", repeated).strip(" -")
-        if repeated:
-            suffix = " ".join(re.findall(r"\([^)]*\)", series))
-            if suffix and suffix not in repeated:
-                repeated = f"{repeated} {suffix}"
-            series = repeated
-            parse_note = "recovered from repeated title after truncated prefix"
-    episode_title = name[last.end():].strip(" -") or f"Episode {int(last.group(2))}"
-    episode_title = _PREFIX.sub("", episode_title)
-    return series, int(last.group(1)), int(last.group(2)), episode_title, parse_note
+    return parse_episode_title(_display_name(entry))
 
 
 def generate_vod_fixture(
@@ -116,38 +135,71 @@ def generate_vod_fixture(
     episode_limit: int = 24,
     overrides_path: Path | None = None,
     package: bool = True,
+    tree: bool = True,
 ) -> dict[str, int]:
-    """Generate a bounded development VOD projection."""
+    """Generate a bounded development VOD projection.
+
+    Files go to the ``destination`` tree and, with ``package``, straight into
+    ``destination.zip`` as they are generated; ``tree=False`` builds only the
+    archive.
+    """
     destination = Path(destination)
     if destination.exists():
         shutil.rmtree(destination)
-    movies_root = destination / "Movies"
-    shows_root = destination / "Shows"
-    movies_root.mkdir(parents=True)
-    shows_root.mkdir(parents=True)
-
+    if tree:
+        (destination / "Movies").mkdir(parents=True)
+        (destination / "Shows").mkdir(parents=True)
+    archive_path = destination.with_suffix(".zip")
+    staged_archive = archive_path.with_name(f".{archive_path.name}.partial")
+    archive = LibraryArchive(staged_archive) if package else None
+    output = _FixtureOutput(destination if tree else None, archive)
+
+    try:
+        counts = _write_fixture(
+            output, Path(playlist), movie_group, series_group,
+            movie_limit, series_limit, episode_limit, overrides_path,
+        )
+        if archive is not None:
+            archive.close()
+            staged_archive.replace(archive_path)
+    finally:
+        if archive is not None:
+            archive.close()
+            staged_archive.unlink(missing_ok=True)
+    return counts
+
+
+def _write_fixture(
+    output: _FixtureOutput,
+    playlist: Path,
+    movie_group: str,
+    series_group: str,
+    movie_limit: int,
+    series_limit: int,
+    episode_limit: int,
+    overrides_path: Path | None,
+) -> dict[str, int]:
     counts = Counter()
     overrides = {}
     if overrides_path and Path(overrides_path).exists():
         overrides = json.loads(Path(overrides_path).read_text(encoding="utf-8")).get("series_aliases", {})
     report: list[dict[str, object]] = []
     selected_series: list[str] = []
-    for entry in iter_m3u(Path(playlist)):
+    for entry in iter_m3u(playlist):
         group = entry.attributes.get("group-title", "")
         if entry.content_kind == "movie" and group == movie_group and counts["movies"] < movie_limit:
             title, year = _movie_info(entry)
-            folder = movies_root / _safe(title)
-            folder.mkdir(exist_ok=True)
+            folder = f"Movies/{_safe(title)}"
             stem = _safe(title)
-            (folder / f"{stem}.strm").write_text(_jellyfin_stream_url(entry.url) + "\n", encoding="utf-8")
-            _write_nfo(folder / "movie.nfo", "movie", {
+            output.write(f"{folder}/{stem}.strm", _jellyfin_stream_url(entry.url) + "\n")
+            output.write(f"{folder}/movie.nfo", _nfo_document("movie", {
                 "title": title,
                 "year": year,
                 "genre": movie_group,
                 "tag": movie_group,
                 "uniqueid": _stable_id(entry),
                 "thumb": entry.attributes.get("tvg-logo"),
-            })
+            }))
             counts["movies"] += 1
         elif entry.content_kind == "series" and group == series_group and counts["episodes"] < episode_limit:
             info = _episode_info(entry)
@@ -169,22 +221,19 @@ def generate_vod_fixture(
                 if len(selected_series) >= series_limit:
                     continue
                 selected_series.append(series)
-                show = shows_root / _safe(series)
-                show.mkdir(exist_ok=True)
-                _write_nfo(show / "tvshow.nfo", "tvshow", {
+                output.write(f"Shows/{_safe(series)}/tvshow.nfo", _nfo_document("tvshow", {
                     "title": series,
                     "genre": series_group,
                     "tag": series_group,
                     "uniqueid": hashlib.sha256(series.encode("utf-8")).hexdigest()[:24],
-                })
+                }))
                 counts["series"] += 1
             if series not in selected_series:
                 continue
-            season_folder = shows_root / _safe(series) / f"Season {season:02d}"
-            season_folder.mkdir(exist_ok=True)
+            season_folder = f"Shows/{_safe(series)}/Season {season:02d}"
             stem = _safe(f"{series} S{season:02d}E{episode:02d} - {episode_title}")
-            (season_folder / f"{stem}.strm").write_text(_jellyfin_stream_url(entry.url) + "\n", encoding="utf-8")
-            _write_nfo(season_folder / f"{stem}.nfo", "episodedetails", {
+            output.write(f"{season_folder}/{stem}.strm", _jellyfin_stream_url(entry.url) + "\n")
+            output.write(f"{season_folder}/{stem}.nfo", _nfo_document("episodedetails", {
                 "title": episode_title,
                 "showtitle": series,
                 "season": season,
@@ -193,20 +242,13 @@ def generate_vod_fixture(
                 "tag": series_group,
                 "uniqueid": _stable_id(entry),
                 "thumb": entry.attributes.get("tvg-logo"),
-            })
+            }))
             counts["episodes"] += 1
 
         if counts["movies"] >= movie_limit and counts["episodes"] >= episode_limit:
             break
-    (destination / "parse-report.json").write_text(
-        json.dumps({"episodes": report}, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+    output.write(
+        "parse-report.json",
+        json.dumps({"episodes": report}, indent=2, ensure_ascii=False) + "\n",
     )
-    if package:
-        archive = destination.with_suffix(".zip")
-        if archive.exists():
-            archive.unlink()
-        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as bundle:
-            for artifact in destination.rglob("*"):
-                if artifact.is_file():
-                    bundle.write(artifact, artifact.relative_to(destination))
     return dict(counts)
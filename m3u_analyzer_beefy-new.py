@@ -4,10 +4,114 @@ import argparse
 import re
 import os
 import json  # Add this impor
+import hashlib
 from pathlib import Path
+from string import Template
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import urllib.parse
 
+from epg_store import load_epg_store
+import title_parsing
+from title_parsing import parse_episode_marker, parse_series_title
+
+# ── Incremental rendering ────────────────────────────────────────────────────
+# Rendered fragments are stored under the digest of everything that shapes
+# their markup, including this script, so template edits invalidate them too.
+RENDER_CACHE_DIR = '.render-cache'
+ANALYSIS_DATA_DIR = 'data'
+_RENDERER_DIGEST = hashlib.sha256(
+    Path(__file__).read_bytes() + Path(title_parsing.__file__).read_bytes()).hexdigest()
+_FINGERPRINT_FIELDS = ('name', 'url', 'logo', 'tvg_id', 'has_epg')
+_TIMESTAMP_RE = re.compile(r'<div class="timestamp">.*?</div>')
+
+
+def _fingerprint(*parts):
+    digest = hashlib.sha256(_RENDERER_DIGEST.encode('ascii'))
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _group_fingerprint(group_name, channels, **options):
+    """Hash only the channel fields that reach the rendered markup."""
+    rows = [[channel.get(field) for field in _FINGERPRINT_FIELDS] for channel in channels]
+    return _fingerprint(group_name, rows, options)
+
+
+class RenderCache:
+    """Reuse group fragments and pages whose inputs match the previous run."""
+
+    def __init__(self, output_dir):
+        self.root = Path(output_dir) / RENDER_CACHE_DIR
+        self.root.mkdir(exist_ok=True)
+        self.manifest_path = self.root / 'manifest.json'
+        try:
+            self.previous = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.previous = {}
+        self.current = {}
+        self.reused = 0
+        self.rendered = 0
+
+    def retain(self, section, name, digest):
+        """Keep a fragment referenced by a page that was not rewritten."""
+        self.current[f'{section}:{name}'] = digest
+
+    def write_fragment(self, out, section, name, digest, render):
+        """Copy the stored fragment for ``digest`` into ``out``.
+
+        On a miss, ``render()`` is iterated once and each piece is written to
+        both ``out`` and the cache file, so a fragment is never held whole in
+        memory.
+        """
+        self.retain(section, name, digest)
+        path = self.root / f'{digest}.html'
+        try:
+            with open(path, encoding='utf-8') as cached:
+                shutil.copyfileobj(cached, out)
+            self.reused += 1
+            return
+        except FileNotFoundError:
+            pass
+        # Sections render concurrently, so never expose a half-written fragment
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as store:
+            for piece in render():
+                out.write(piece)
+                store.write(piece)
+        os.replace(tmp, path)
+        self.rendered += 1
+
+    def page_unchanged(self, path, *inputs):
+        """Record a page signature; True when the file on disk already matches it."""
+        key = f'page:{os.path.basename(path)}'
+        self.current[key] = _fingerprint(*inputs)
+        return self.previous.get(key) == self.current[key] and os.path.exists(path)
+
+    def state(self):
+        return self.current, self.reused, self.rendered
+
+    def merge(self, state):
+        """Fold in the ``state()`` of a cache used by another section or process."""
+        current, reused, rendered = state
+        self.current.update(current)
+        self.reused += reused
+        self.rendered += rendered
+
+    def save(self):
+        """Persist this run's hashes and drop fragments no group references."""
+        live = set(self.current.values())
+        for path in self.root.glob('*.html'):
+            if path.stem not in live:
+                path.unlink()
+        self.manifest_path.write_text(json.dumps(self.current, indent=1, sort_keys=True), encoding='utf-8')
+        print(f"Reused {self.reused} cached group fragments, rendered {self.rendered}")
+
+
 def analyze_url_pattern(url):
     """
     Analyze if a URL indicates a movie or series based on its pattern.
@@ -65,152 +169,7 @@ def split_no_tvg_content(no_tvg_id_groups):
 
 def parse_series_info(title):
     """Parse series name, season, and episode from title with multiple patterns"""
-    # Clean common prefixes to improve grouping
-    # Matches: "US:", "AMZ -", "4K-AMZ -", "NF -", "GR -", etc.
-    # We strip these so "AMZ - Show" and "4K-AMZ - Show" group together
-    # and "US: Show" and "UK: Show" group together (which is usually desired for unified listing)
-    prefixes = r'^(?:(?:US|UK|CA|AMZ|NF|HULU|DSNY|GR|EN|DE|IT|FR|ES|PT|PL|TR|4K|FHD|HD|SD|RAW|HEVC|VOD|VIP)\s*[-:|]\s*)+'
-    clean_title = re.sub(prefixes, '', title, flags=re.IGNORECASE).strip()
-
-    # 0. Season-only "Up to" pattern: "(Up to S02 Complete)" / "(Up to Season 2 Complete)"
-    match = re.search(r'(.*?)\s*\(Up to\s+(?:S|Season)\s*(\d+)\s*(?:Complete|Full)\)', clean_title, re.IGNORECASE)
-    if match:
-        series_name = match.group(1).strip(" -:")
-        season = int(match.group(2))
-        if season <= 1900:
-            return {
-                'series_name': series_name,
-                'season': season,
-                'episode': 0,  # 0 = complete season, no specific episode
-                'is_series': True
-            }
-
-    # 1. Standard "S01 E01" / "S01E01" / "Season 01 Episode 01"
-    # Matches: "Show S01E01", "Show Season 1 Episode 1", "Show S01 E01"
-    # Also handles: "Show (Up to S01E01)" patterns
-    # Try the "Up to" pattern first
-    match = re.search(r'(.*?)\s*\(Up to\s+(?:S|Season)\s*(\d+)\s*(?:E|Ep|Episode|x)\s*(\d+)\)', clean_title, re.IGNORECASE)
-    if match:
-        series_name = match.group(1).strip(" -:")
-        season = int(match.group(2))
-        episode = int(match.group(3))
-        # Check if the captured number is a year (e.g. 2024), if so, ignore
-        if season > 1900 or episode > 1900:
-            pass  # Continue to next pattern
-        else:
-            return {
-                'series_name': series_name,
-                'season': season,
-                'episode': episode,
-                'is_series': True
-            }
-
-    # Try standard pattern without "Up to"
-    match = re.search(r'(.*?)(?:S|Season)\s*(\d+)\s*(?:E|Ep|Episode|x)\s*(\d+)', clean_title, re.IGNORECASE)
-    if match:
-        series_name = match.group(1).strip(" -:")
-        season = int(match.group(2))
-        episode = int(match.group(3))
-        # Check if the captured number is a year (e.g. 2024), if so, ignore
-        if season > 1900 or episode > 1900:
-            pass  # Continue to next pattern
-        else:
-            return {
-                'series_name': series_name,
-                'season': season,
-                'episode': episode,
-                'is_series': True
-            }
-
-    # 2. "1x01" format
-    # Try the "Up to" pattern first
-    match = re.search(r'(.*?)\s*\(Up to\s+(\d+)x(\d+)\)', clean_title, re.IGNORECASE)
-    if match:
-        series_name = match.group(1).strip(" -:")
-        season = int(match.group(2))
-        episode = int(match.group(3))
-        if season > 1900 or episode > 1900:
-            pass  # Continue to next pattern
-        else:
-            return {
-                'series_name': series_name,
-                'season': season,
-                'episode': episode,
-                'is_series': True
-            }
-
-    # Try standard "1x01" pattern
-    match = re.search(r'(.*?)(\d+)x(\d+)', clean_title, re.IGNORECASE)
-    if match:
-        series_name = match.group(1).strip(" -:")
-        season = int(match.group(2))
-        episode = int(match.group(3))
-        if season > 1900 or episode > 1900:
-            pass  # Continue to next pattern
-        else:
-            return {
-                'series_name': series_name,
-                'season': season,
-                'episode': episode,
-                'is_series': True
-            }
-
-    # 3. "Episode 01" / "Ep 01" / "E01" / "Series 1" / "Part 1" format
-    # Matches: "Title Episode 1", "Title Ep 1", "Title E1", "Title - E1", "Title Part 1", "Title Vol 1", "Title Series 1"
-    # Try the "Up to" pattern first
-    match = re.search(r'(.*?)\s*\(Up to\s+(?:Episode|Ep|E|Part|Pt|Vol|Volume|Series)\s*(\d+)\)', clean_title, re.IGNORECASE)
-    if match:
-        potential_series_name = match.group(1).strip(" -:")
-        episode_num = int(match.group(2))
-
-        # Check if the captured number is a year (e.g. 2024), if so, ignore
-        if episode_num > 1900:
-            pass  # Not a series
-        else:
-            # For this pattern, we assume Season 1 if not specified
-            return {
-                'series_name': potential_series_name,
-                'season': 1,
-                'episode': episode_num,
-                'is_series': True
-            }
-
-    # Try standard pattern
-    match = re.search(r'(.*?)(?:Episode|Ep|E|Part|Pt|Vol|Volume|Series)\s*(\d+)', clean_title, re.IGNORECASE)
-    if match:
-        potential_series_name = match.group(1).strip(" -:")
-        episode_num = int(match.group(2))
-
-        # Check if the captured number is a year (e.g. 2024), if so, ignore
-        if episode_num > 1900:
-            pass  # Not a series
-        else:
-            # For this pattern, we assume Season 1 if not specified
-            return {
-                'series_name': potential_series_name,
-                'season': 1,
-                'episode': episode_num,
-                'is_series': True
-            }
-
-    # 4. Fallback: Check for common series indicators anywhere in the title
-    # Look for patterns like "S01", "Season 1", "Series 1", etc.
-    # Also handles "(Up to S01)" patterns
-    if re.search(r'(?:\b|Up to\s+)(?:S\d+|Season \d+|Series \d+)\b', clean_title, re.IGNORECASE):
-        # If we find series indicators but couldn't parse them, treat as series with default values
-        return {
-            'series_name': clean_title,
-            'season': 1,
-            'episode': 1,
-            'is_series': True
-        }
-
-    return {
-        'series_name': clean_title or title,
-        'season': None,
-        'episode': None,
-        'is_series': False
-    }
+    return parse_series_title(title)._asdict()
 
 def organize_series_content(channels):
     """Organize channels into series hierarchy"""
@@ -299,10 +258,9 @@ def generate_series_page_content(channels, group_name):
             season_num = str(parsed['season'])
             ep_num = parsed['episode']
         else:
-            # Fallback for items that are in a Series group but don't look like "S01E01"
-            # Strip common prefixes so "GR - Show" and "EN - Show" group together properly
-            prefixes_re = r'^(?:(?:US|UK|CA|AMZ|NF|HULU|DSNY|GR|EN|DE|IT|FR|ES|PT|PL|TR|4K|FHD|HD|SD|RAW|HEVC|VOD|VIP)\s*[-:|]\s*)+'
-            s_name = re.sub(prefixes_re, '', channel['name'], flags=re.IGNORECASE).strip() or channel['name']
+            # Fallback for items that are in a Series group but don't look like "S01E01";
+            # the parser already stripped "GR - "/"EN - " style prefixes from the name
+            s_name = parsed['series_name']
             season_num = "1"
             ep_num = 1
             
@@ -543,11 +501,11 @@ def generate_series_page_content(channels, group_name):
     """
 
 
-def generate_group_content(group_name, channels, include_epg=True, is_series=False, is_movie=False):
-    """Generate HTML content for a group of channels"""
+def iter_group_content(group_name, channels, include_epg=True, is_series=False, is_movie=False):
+    """Yield the HTML for a group of channels piece by piece, row by row"""
     if is_series:
         safe_group_id = 'g-' + ''.join(c if c.isalnum() or c == '-' else '-' for c in group_name.lower())[:60]
-        return f"""
+        yield f"""
             <div class="group" id="{safe_group_id}">
                 <div class="group-header">
                     <span class="chevron">&#9660;</span>
@@ -557,9 +515,34 @@ def generate_group_content(group_name, channels, include_epg=True, is_series=Fal
                 {generate_series_page_content(channels, group_name)}
             </div>
         """
-    
+        return
+
     # Original table layout for non-series content
-    channel_rows = []
+    epg_header = '<th>EPG Status</th>' if include_epg else ''
+    actions_header = '<th>Actions</th>' if is_movie else ''
+
+    safe_group_id = 'g-' + ''.join(c if c.isalnum() or c == '-' else '-' for c in group_name.lower())[:60]
+    yield f"""
+        <div class="group" id="{safe_group_id}">
+            <div class="group-header">
+                <span class="chevron">&#9660;</span>
+                <span class="group-name">{group_name}</span>
+                <span class="group-count" data-total="{len(channels)}">{len(channels)}</span>
+            </div>
+            <table class="{'movie-table' if is_movie else 'channel-table'}">
+                <thead>
+                    <tr>
+                        <th width="{120 if is_movie else 40}">{("Poster" if is_movie else "Logo")}</th>
+                        <th>Name</th>
+                        {'' if is_movie else '<th>TVG ID</th>'}
+                        {actions_header}
+                        <th>Stream</th>
+                        {epg_header}
+                    </tr>
+                </thead>
+                <tbody>
+                    """
+
     for channel in sorted(channels, key=lambda x: x['name']):
         # EPG status handling
         if include_epg:
@@ -616,7 +599,7 @@ def generate_group_content(group_name, channels, include_epg=True, is_series=Fal
         
         # Always add the row, regardless of logo presence
         safe_name = channel['name'].lower().replace('"', '').replace("'", '')
-        channel_rows.append(f"""
+        yield f"""
             <tr data-name="{safe_name}">
                 <td class="{'poster-cell' if is_movie else 'logo-cell'}">{logo_html}</td>
                 <td>{channel['name']}</td>
@@ -625,38 +608,20 @@ def generate_group_content(group_name, channels, include_epg=True, is_series=Fal
                 {stream_cell}
                 {epg_column}
             </tr>
-        """)
-    
-    epg_header = '<th>EPG Status</th>' if include_epg else ''
-    actions_header = '<th>Actions</th>' if is_movie else ''
-    
-    safe_group_id = 'g-' + ''.join(c if c.isalnum() or c == '-' else '-' for c in group_name.lower())[:60]
-    return f"""
-        <div class="group" id="{safe_group_id}">
-            <div class="group-header">
-                <span class="chevron">&#9660;</span>
-                <span class="group-name">{group_name}</span>
-                <span class="group-count" data-total="{len(channels)}">{len(channels)}</span>
-            </div>
-            <table class="{'movie-table' if is_movie else 'channel-table'}">
-                <thead>
-                    <tr>
-                        <th width="{120 if is_movie else 40}">{("Poster" if is_movie else "Logo")}</th>
-                        <th>Name</th>
-                        {'' if is_movie else '<th>TVG ID</th>'}
-                        {actions_header}
-                        <th>Stream</th>
-                        {epg_header}
-                    </tr>
-                </thead>
-                <tbody>
-                    {''.join(channel_rows)}
+        """
+
+    yield """
                 </tbody>
             </table>
         </div>
     """
 
 
+def generate_group_content(group_name, channels, include_epg=True, is_series=False, is_movie=False):
+    """Generate HTML content for a group of channels"""
+    return ''.join(iter_group_content(group_name, channels, include_epg, is_series, is_movie))
+
+
 def parse_m3u_structure(m3u_path):
     """Parse M3U file to extract ALL content, including movies and no-tvg-id entries"""
     groups = defaultdict(list)
@@ -721,15 +686,20 @@ def parse_m3u_structure(m3u_path):
 def check_epg_matches(xml_file, groups):
     """Check which channels from M3U have EPG entries"""
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        
-        # Get all unique channel IDs from EPG
-        epg_channels = set()
-        for programme in root.findall('.//programme'):
-            channel_id = programme.get('channel', '')
-            if channel_id:
-                epg_channels.add(channel_id)
+        # Get all unique channel IDs from EPG, from its SQLite store when current
+        store = load_epg_store(xml_file)
+        if store is not None:
+            with store:
+                epg_channels = store.programme_channel_ids() - {''}
+        else:
+            tree = ET.parse(xml_file)
+            root = tree.getroot()
+
+            epg_channels = set()
+            for programme in root.findall('.//programme'):
+                channel_id = programme.get('channel', '')
+                if channel_id:
+                    epg_channels.add(channel_id)
         
         print(f"\nFound {len(epg_channels)} unique channels in EPG")
         
@@ -749,19 +719,14 @@ def check_epg_matches(xml_file, groups):
 
 def organize_no_tvg_content(channels):
     """Split content into Movies and TV Series and organize accordingly"""
-    # Pattern for detecting TV series format
-    series_pattern = re.compile(r'.*?S(\d+)\s*E(\d+)', re.IGNORECASE)
-    
     tv_series = defaultdict(lambda: defaultdict(list))
     movies = defaultdict(list)
     
     for channel in channels:
-        match = series_pattern.match(channel['name'])
-        if match:
-            # Extract base series name (everything before SXX EXX)
-            series_name = channel['name'][:match.start(1)-1].strip()
-            season = int(match.group(1))
-            episode = int(match.group(2))
+        marker = parse_episode_marker(channel['name'])
+        if marker:
+            # Base series name is everything before SXX EXX
+            series_name, season, episode = marker
             
             tv_series[channel['group']][series_name].append({
                 'name': channel['name'],
@@ -985,19 +950,107 @@ def generate_shared_header(total_channels, total_epg_matches, total_movies, tota
     """
 
 
-def generate_html_page(title, content, shared_header, css_styles, scripts="", m3u_editor_command=None):
-    """Generate a complete HTML page"""
-    command_div = ""
-    if m3u_editor_command:
-        command_div = f"""
-            <div id="optimizationData" 
-                 data-command="{m3u_editor_command}"
-                 style="display: none;">
-            </div>
-        """
+# Page-level rules appended to the report stylesheet; written once per run
+# into analysis.css instead of being inlined into every page.
+_PAGE_CSS = """
+            .nav-tabs { display: flex; gap: 0.4rem; margin-bottom: 1.5rem; flex-wrap: wrap; }
+            .tab {
+                padding: 0.35rem 0.85rem;
+                background: #353534;
+                color: rgba(255,255,255,0.55);
+                border-radius: 9999px;
+                text-decoration: none;
+                font-family: 'Inter', sans-serif;
+                font-size: 0.7rem;
+                font-weight: 500;
+                text-transform: uppercase;
+                letter-spacing: 0.05em;
+                transition: all 0.15s;
+            }
+            .tab:hover { background: #2a2a2a; color: white; }
+            .tab.active { background: #00d4ff; color: #003642; font-weight: 700; }
+            .vlc-btn {
+                background: rgba(245,130,32,0.2);
+                color: #ffba3d;
+                padding: 0.28rem 0.65rem;
+                border-radius: 9999px;
+                text-decoration: none;
+                display: inline-block;
+                font-family: 'Inter', sans-serif;
+                font-size: 0.68rem;
+                font-weight: 500;
+                text-transform: uppercase;
+                letter-spacing: 0.04em;
+                transition: all 0.15s;
+            }
+            .vlc-btn:hover { background: rgba(245,130,32,0.35); color: #ffba3d; text-decoration: none; }
+            .vlc-ios-btn {
+                background: rgba(0,122,255,0.2);
+                color: #a8e8ff;
+                padding: 0.28rem 0.65rem;
+                border-radius: 9999px;
+                text-decoration: none;
+                display: inline-block;
+                font-family: 'Inter', sans-serif;
+                font-size: 0.68rem;
+                font-weight: 500;
+                text-transform: uppercase;
+                letter-spacing: 0.04em;
+                transition: all 0.15s;
+            }
+            .vlc-ios-btn:hover { background: rgba(0,122,255,0.35); text-decoration: none; }
+            .vlc-android-btn {
+                background: rgba(61,220,132,0.2);
+                color: #3cd7ff;
+                padding: 0.28rem 0.65rem;
+                border-radius: 9999px;
+                text-decoration: none;
+                display: inline-block;
+                font-family: 'Inter', sans-serif;
+                font-size: 0.68rem;
+                font-weight: 500;
+                text-transform: uppercase;
+                letter-spacing: 0.04em;
+                transition: all 0.15s;
+            }
+            .vlc-android-btn:hover { background: rgba(61,220,132,0.35); text-decoration: none; }
+            .copy-btn {
+                background: rgba(0,212,255,0.12);
+                color: #a8e8ff;
+                padding: 0.28rem 0.65rem;
+                border-radius: 9999px;
+                border: none;
+                display: inline-block;
+                font-family: 'Inter', sans-serif;
+                font-size: 0.68rem;
+                font-weight: 500;
+                cursor: pointer;
+                text-transform: uppercase;
+                letter-spacing: 0.04em;
+                transition: all 0.15s;
+            }
+            .copy-btn:hover { background: #00d4ff; color: #003642; }
+            .stream-cell { white-space: nowrap; }
+            .stream-actions { display: flex; flex-direction: column; gap: 4px; }
+            .platform-info {
+                background: rgba(0,212,255,0.05);
+                border-left: 3px solid #00d4ff;
+                padding: 0.65rem 1rem;
+                margin: 0.75rem 0 1.25rem;
+                border-radius: 0 0.5rem 0.5rem 0;
+                font-size: 0.78rem;
+                color: #bbc9cf;
+            }
+            @media (max-width: 768px) {
+                .stream-actions { flex-direction: column; }
+                .action-btn { margin: 4px 0; text-align: center; }
+                .container { padding: 0.75rem; }
+                table { display: block; overflow-x: auto; }
+            }
+"""
 
-    # Additional scripts for platform detection and URL copying
-    additional_scripts = """
+# Shared page behaviour, written once per run into analysis.js
+_PAGE_JS = """
         // Platform detection
         function detectPlatform() {
             const userAgent = navigator.userAgent || navigator.vendor || window.opera;
@@ -1030,22 +1083,69 @@ def generate_html_page(title, content, shared_header, css_styles, scripts="", m3
         }
 
         // ── Lazy group renderer ──────────────────────────────────────────────────────
-        function _renderGroup(group) {
-            var gid = group.id;
-            var body = group.querySelector('.group-body');
-            if (!body || body.dataset.rendered) return;
-            if (typeof _GDATA === 'undefined' || !_GDATA[gid]) return;
-            body.dataset.rendered = '1';
+        var _GCACHE = {}, _GSEARCH_INDEX = null, _filterSeq = 0;
 
-            var data = _GDATA[gid];
-            var type = typeof _GTYPE !== 'undefined' ? _GTYPE : 'channel';
-            var platform = detectPlatform();
+        function _isLazyPage() {
+            return typeof _GDATA !== 'undefined' || typeof _GSHARDS !== 'undefined';
+        }
+
+        function _isLazyGroup(group) {
+            if (typeof _GDATA !== 'undefined') return !!_GDATA[group.id];
+            return !!group.dataset.shard;
+        }
 
-            if (type === 'series') {
-                body.innerHTML = _buildSeriesHTML(data);
-            } else {
-                body.innerHTML = _buildTableHTML(data, type === 'movie', platform);
+        // Resolve a group's data from the inline blob or its fetched shard
+        function _loadGroup(group) {
+            if (typeof _GDATA !== 'undefined') return Promise.resolve(_GDATA[group.id]);
+            var shard = group.dataset.shard;
+            if (!shard) return Promise.resolve(undefined);
+            if (!_GCACHE[shard]) {
+                _GCACHE[shard] = fetch(_GSHARDS + shard + '?v=' + group.dataset.v, { credentials: 'same-origin' })
+                    .then(function(r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+                    .catch(function(err) { delete _GCACHE[shard]; throw err; });
             }
+            return _GCACHE[shard];
+        }
+
+        // Lower-cased searchable names per group, loaded on the first query
+        function _loadSearchKeys() {
+            if (typeof _GDATA !== 'undefined') {
+                return Promise.resolve(function(group) {
+                    var data = _GDATA[group.id];
+                    if (!data) return [];
+                    return Array.isArray(data)
+                        ? data.map(function(ch) { return (ch.n || '').toLowerCase(); })
+                        : Object.keys(data).map(function(sn) { return sn.toLowerCase(); });
+                });
+            }
+            if (!_GSEARCH_INDEX) {
+                _GSEARCH_INDEX = fetch(_GSEARCH, { credentials: 'same-origin' })
+                    .then(function(r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+                    .catch(function(err) { _GSEARCH_INDEX = null; throw err; });
+            }
+            return _GSEARCH_INDEX.then(function(index) {
+                return function(group) { return index[group.dataset.shard] || []; };
+            });
+        }
+
+        function _renderGroup(group) {
+            var body = group.querySelector('.group-body');
+            if (!body || !_isLazyGroup(group)) return Promise.resolve();
+            if (body._pending) return body._pending;
+            body._pending = _loadGroup(group).then(function(data) {
+                if (!data) return;
+                var type = typeof _GTYPE !== 'undefined' ? _GTYPE : 'channel';
+                if (type === 'series') {
+                    body.innerHTML = _buildSeriesHTML(data);
+                } else {
+                    body.innerHTML = _buildTableHTML(data, type === 'movie', detectPlatform());
+                }
+                body.dataset.rendered = '1';
+            }).catch(function(err) {
+                body._pending = null;
+                body.innerHTML = '<p style="color:rgba(255,255,255,0.3);padding:1rem;">Could not load this group</p>';
+            });
+            return body._pending;
         }
 
         function _buildTableHTML(channels, isMovie, platform) {
@@ -1120,7 +1220,7 @@ def generate_html_page(title, content, shared_header, css_styles, scripts="", m3
                 h.addEventListener('click', function(e) {
                     if (e.target.closest('a,button')) return;
                     var group = this.closest('.group');
-                    try { _renderGroup(group); } catch(err) {}
+                    _renderGroup(group);
                     group.classList.toggle('collapsed');
                 });
             });
@@ -1148,99 +1248,80 @@ def generate_html_page(title, content, shared_header, css_styles, scripts="", m3
                 var clearBtn = document.getElementById('clearBtn');
                 if (clearBtn) clearBtn.style.display = q ? 'flex' : 'none';
                 var totalVisible = 0;
-                var lazyMode = typeof _GDATA !== 'undefined';
-
-                document.querySelectorAll('.group').forEach(function(group) {
-                    var gid = group.id;
-                    var badge = group.querySelector('.group-count');
-
-                    if (lazyMode && _GDATA[gid]) {
-                        // ── Data-driven search (lazy pages) ─────────────────
-                        var data = _GDATA[gid];
-                        var gname = (group.querySelector('.group-name') || {}).textContent || '';
-                        var gMatch = !q || gname.toLowerCase().includes(q);
+                var seq = ++_filterSeq;
+                var rc = document.getElementById('resultCount');
 
-                        if (!q) {
+                if (_isLazyPage()) {
+                    // ── Data-driven search (lazy pages) ─────────────────────
+                    var groups = Array.prototype.filter.call(document.querySelectorAll('.group'), _isLazyGroup);
+                    if (!q) {
+                        groups.forEach(function(group) {
+                            var badge = group.querySelector('.group-count');
                             group.style.display = '';
                             group.classList.add('collapsed');
                             if (badge) badge.textContent = badge.dataset.total;
-                            return;
-                        }
-
-                        var type = typeof _GTYPE !== 'undefined' ? _GTYPE : 'channel';
-                        var matchCount = 0;
-
-                        if (type === 'series') {
-                            // Search series names
-                            var seriesObj = data;
-                            matchCount = Object.keys(seriesObj).filter(function(sn) {
-                                return sn.toLowerCase().includes(q);
-                            }).length;
-                        } else {
-                            // Search channel names
-                            matchCount = data.filter(function(ch) {
-                                return (ch.n || '').toLowerCase().includes(q);
-                            }).length;
-                        }
-
-                        if (!gMatch && matchCount === 0) {
-                            group.style.display = 'none';
-                            return;
-                        }
-
-                        group.style.display = '';
-                        group.classList.remove('collapsed');
-                        try { _renderGroup(group); } catch(err) {}
-
-                        // Filter rendered rows (table-based) or series entries
-                        var rows = group.querySelectorAll('tr[data-name]');
-                        var seriesEntries = group.querySelectorAll('.series-entry[data-name]');
-                        if (rows.length > 0) {
-                            var visible = 0;
-                            rows.forEach(function(row) {
-                                var match = gMatch || row.dataset.name.includes(q);
-                                row.style.display = match ? '' : 'none';
-                                if (match) visible++;
-                            });
-                            matchCount = visible;
-                        } else if (seriesEntries.length > 0) {
-                            var visible = 0;
-                            seriesEntries.forEach(function(entry) {
-                                var match = gMatch || entry.dataset.name.includes(q);
-                                entry.style.display = match ? '' : 'none';
-                                if (match) visible++;
+                            group.querySelectorAll('[data-name]').forEach(function(row) { row.style.display = ''; });
+                        });
+                        if (rc) rc.textContent = '';
+                        return;
+                    }
+                    _loadSearchKeys().then(function(keysFor) {
+                        if (seq !== _filterSeq) return;
+                        groups.forEach(function(group) {
+                            var badge = group.querySelector('.group-count');
+                            var gname = (group.querySelector('.group-name') || {}).textContent || '';
+                            var gMatch = gname.toLowerCase().includes(q);
+                            var matchCount = keysFor(group).filter(function(key) { return key.includes(q); }).length;
+
+                            if (!gMatch && matchCount === 0) {
+                                group.style.display = 'none';
+                                return;
+                            }
+                            group.style.display = '';
+                            group.classList.remove('collapsed');
+                            totalVisible += gMatch ? +(badge ? badge.dataset.total : 1) : matchCount;
+                            if (badge) badge.textContent = gMatch ? badge.dataset.total : matchCount;
+
+                            // Filter rendered rows (table-based) or series entries once loaded
+                            _renderGroup(group).then(function() {
+                                if (seq !== _filterSeq) return;
+                                group.querySelectorAll('tr[data-name], .series-entry[data-name]').forEach(function(row) {
+                                    row.style.display = (gMatch || row.dataset.name.includes(q)) ? '' : 'none';
+                                });
                             });
-                            matchCount = visible;
-                        }
+                        });
+                        if (rc) rc.textContent = totalVisible.toLocaleString() + ' results';
+                    }).catch(function() {
+                        if (rc && seq === _filterSeq) rc.textContent = 'Search unavailable';
+                    });
+                    return;
+                }
 
-                        totalVisible += matchCount || (gMatch ? 1 : 0);
-                        if (badge) badge.textContent = matchCount || badge.dataset.total;
+                document.querySelectorAll('.group').forEach(function(group) {
+                    var badge = group.querySelector('.group-count');
 
+                    // ── DOM-based search (standard pages) ────────────────────
+                    var rows = group.querySelectorAll('tr[data-name]');
+                    var groupVisible = 0;
+
+                    if (rows.length > 0) {
+                        rows.forEach(function(row) {
+                            var match = !q || row.dataset.name.includes(q);
+                            row.style.display = match ? '' : 'none';
+                            if (match) groupVisible++;
+                        });
                     } else {
-                        // ── DOM-based search (standard pages) ────────────────
-                        var rows = group.querySelectorAll('tr[data-name]');
-                        var groupVisible = 0;
-
-                        if (rows.length > 0) {
-                            rows.forEach(function(row) {
-                                var match = !q || row.dataset.name.includes(q);
-                                row.style.display = match ? '' : 'none';
-                                if (match) groupVisible++;
-                            });
-                        } else {
-                            var nameEl = group.querySelector('.group-name');
-                            groupVisible = (!q || (nameEl && nameEl.textContent.toLowerCase().includes(q))) ? 1 : 0;
-                        }
-
-                        totalVisible += groupVisible;
-                        group.style.display = (groupVisible === 0 && q) ? 'none' : '';
-                        if (q) group.classList.remove('collapsed');
-                        else group.classList.add('collapsed');
-                        if (badge) badge.textContent = (q && rows.length > 0) ? groupVisible : badge.dataset.total;
+                        var nameEl = group.querySelector('.group-name');
+                        groupVisible = (!q || (nameEl && nameEl.textContent.toLowerCase().includes(q))) ? 1 : 0;
                     }
+
+                    totalVisible += groupVisible;
+                    group.style.display = (groupVisible === 0 && q) ? 'none' : '';
+                    if (q) group.classList.remove('collapsed');
+                    else group.classList.add('collapsed');
+                    if (badge) badge.textContent = (q && rows.length > 0) ? groupVisible : badge.dataset.total;
                 });
 
-                var rc = document.getElementById('resultCount');
                 if (rc) rc.textContent = q ? (totalVisible.toLocaleString() + ' results') : '';
             }, 150);
         }
@@ -1255,263 +1336,268 @@ def generate_html_page(title, content, shared_header, css_styles, scripts="", m3
             if (!groupId) return;
             var el = document.getElementById(groupId);
             if (!el) return;
-            try { _renderGroup(el); } catch(err) {}
+            _renderGroup(el);
             el.classList.remove('collapsed');
             el.scrollIntoView({ behavior: 'smooth', block: 'start' });
             var sel = document.getElementById('groupJump');
             if (sel) sel.value = '';
         }
-    """
+"""
 
-    return f"""
+ANALYSIS_CSS_FILE = 'analysis.css'
+ANALYSIS_JS_FILE = 'analysis.js'
+
+_PAGE_HEAD = Template("""
     <!DOCTYPE html>
     <html lang="en">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{title} - Content Analysis</title>
+        <title>$title - Content Analysis</title>
         <link href="https://fonts.googleapis.com/css2?family=Manrope:wght@400;700;800&family=Inter:wght@300;400;500;600&display=swap" rel="stylesheet">
         <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-        <style>
-            {css_styles}
-            .nav-tabs {{ display: flex; gap: 0.4rem; margin-bottom: 1.5rem; flex-wrap: wrap; }}
-            .tab {{
-                padding: 0.35rem 0.85rem;
-                background: #353534;
-                color: rgba(255,255,255,0.55);
-                border-radius: 9999px;
-                text-decoration: none;
-                font-family: 'Inter', sans-serif;
-                font-size: 0.7rem;
-                font-weight: 500;
-                text-transform: uppercase;
-                letter-spacing: 0.05em;
-                transition: all 0.15s;
-            }}
-            .tab:hover {{ background: #2a2a2a; color: white; }}
-            .tab.active {{ background: #00d4ff; color: #003642; font-weight: 700; }}
-            .vlc-btn {{
-                background: rgba(245,130,32,0.2);
-                color: #ffba3d;
-                padding: 0.28rem 0.65rem;
-                border-radius: 9999px;
-                text-decoration: none;
-                display: inline-block;
-                font-family: 'Inter', sans-serif;
-                font-size: 0.68rem;
-                font-weight: 500;
-                text-transform: uppercase;
-                letter-spacing: 0.04em;
-                transition: all 0.15s;
-            }}
-            .vlc-btn:hover {{ background: rgba(245,130,32,0.35); color: #ffba3d; text-decoration: none; }}
-            .vlc-ios-btn {{
-                background: rgba(0,122,255,0.2);
-                color: #a8e8ff;
-                padding: 0.28rem 0.65rem;
-                border-radius: 9999px;
-                text-decoration: none;
-                display: inline-block;
-                font-family: 'Inter', sans-serif;
-                font-size: 0.68rem;
-                font-weight: 500;
-                text-transform: uppercase;
-                letter-spacing: 0.04em;
-                transition: all 0.15s;
-            }}
-            .vlc-ios-btn:hover {{ background: rgba(0,122,255,0.35); text-decoration: none; }}
-            .vlc-android-btn {{
-                background: rgba(61,220,132,0.2);
-                color: #3cd7ff;
-                padding: 0.28rem 0.65rem;
-                border-radius: 9999px;
-                text-decoration: none;
-                display: inline-block;
-                font-family: 'Inter', sans-serif;
-                font-size: 0.68rem;
-                font-weight: 500;
-                text-transform: uppercase;
-                letter-spacing: 0.04em;
-                transition: all 0.15s;
-            }}
-            .vlc-android-btn:hover {{ background: rgba(61,220,132,0.35); text-decoration: none; }}
-            .copy-btn {{
-                background: rgba(0,212,255,0.12);
-                color: #a8e8ff;
-                padding: 0.28rem 0.65rem;
-                border-radius: 9999px;
-                border: none;
-                display: inline-block;
-                font-family: 'Inter', sans-serif;
-                font-size: 0.68rem;
-                font-weight: 500;
-                cursor: pointer;
-                text-transform: uppercase;
-                letter-spacing: 0.04em;
-                transition: all 0.15s;
-            }}
-            .copy-btn:hover {{ background: #00d4ff; color: #003642; }}
-            .stream-cell {{ white-space: nowrap; }}
-            .stream-actions {{ display: flex; flex-direction: column; gap: 4px; }}
-            .platform-info {{
-                background: rgba(0,212,255,0.05);
-                border-left: 3px solid #00d4ff;
-                padding: 0.65rem 1rem;
-                margin: 0.75rem 0 1.25rem;
-                border-radius: 0 0.5rem 0.5rem 0;
-                font-size: 0.78rem;
-                color: #bbc9cf;
-            }}
-            @media (max-width: 768px) {{
-                .stream-actions {{ flex-direction: column; }}
-                .action-btn {{ margin: 4px 0; text-align: center; }}
-                .container {{ padding: 0.75rem; }}
-                table {{ display: block; overflow-x: auto; }}
-            }}
-        </style>
-        <script>{scripts}</script>
+        <link rel="stylesheet" href="$css_href">
+        <script>$scripts</script>
     </head>
     <body>
         <div class="container">
-            {shared_header}
+            $shared_header
             <div class="platform-info">
                 <p><strong>Stream Playback</strong>: We've detected your device type and are showing the appropriate VLC button. You can also copy the stream URL to use in any compatible player.</p>
             </div>
             <div class="section-header">
-                <h2>{title}</h2>
+                <h2>$title</h2>
             </div>
-            {command_div}
-            {content}
+            $command_div
+""")
+
+_PAGE_TAIL = Template("""
         </div>
         
-        <script>
-        {additional_scripts}
-        </script>
+        <script src="$js_href"></script>
     </body>
     </html>
-    """
-
-LARGE_PAGE_CHANNEL_LIMIT = 1500   # max channels per page for movies / no_tvg
-LARGE_PAGE_GROUP_LIMIT   = 50     # max groups per page for series
-
-
-def _pagination_nav(page, total_pages, total_items, page_items, prev_url, next_url):
-    prev_btn = f'<a href="{prev_url}" class="pag-btn">\u2190 Prev</a>' if prev_url else '<span class="pag-btn pag-disabled">\u2190 Prev</span>'
-    next_btn = f'<a href="{next_url}" class="pag-btn">Next \u2192</a>' if next_url else '<span class="pag-btn pag-disabled">Next \u2192</span>'
-    return f"""
-    <div class="pagination-nav">
-        {prev_btn}
-        <span class="pag-info">Page {page} of {total_pages} &nbsp;&middot;&nbsp; {page_items:,} items (of {total_items:,} total) &nbsp;&middot;&nbsp; <em style="opacity:.6">search filters this page only</em></span>
-        {next_btn}
-    </div>"""
-
-
-def _page_filename(stem, n):
-    return f'{stem}.html' if n == 1 else f'{stem}_p{n}.html'
-
-
-def generate_paginated_html_files(output_dir, base_name, title, sorted_groups,
-                                   shared_header, css_styles,
-                                   include_epg=False, is_movie=False, is_series=False):
-    """Generate one or more size-bounded HTML files for large content sets."""
-    max_per_page = LARGE_PAGE_GROUP_LIMIT if is_series else LARGE_PAGE_CHANNEL_LIMIT
-
-    # Build pages — keep groups intact, accumulate until limit
-    pages, current, current_size = [], [], 0
-    for group_name, channels in sorted_groups:
-        item_count = 1 if is_series else len(channels)
-        if current_size + item_count > max_per_page and current:
-            pages.append(current)
-            current, current_size = [], 0
-        current.append((group_name, channels))
-        current_size += item_count
-    if current:
-        pages.append(current)
-
-    stem = base_name.replace('.html', '')
-    total_pages = len(pages)
-    total_items = sum(len(ch) for page in pages for _, ch in page)
-    files_created = []
+""")
 
-    for i, page_groups in enumerate(pages, 1):
-        page_items = sum(len(ch) for _, ch in page_groups)
-        prev_url = _page_filename(stem, i - 1) if i > 1 else None
-        next_url = _page_filename(stem, i + 1) if i < total_pages else None
-        out_file = _page_filename(stem, i)
+_COMMAND_DIV = Template("""
+            <div id="optimizationData" 
+                 data-command="$command"
+                 style="display: none;">
+            </div>
+""")
 
-        nav = _pagination_nav(i, total_pages, total_items, page_items, prev_url, next_url) if total_pages > 1 else ''
-        content = [nav]
-        for group_name, channels in page_groups:
-            content.append(generate_group_content(group_name, channels,
-                                                   include_epg=include_epg,
-                                                   is_movie=is_movie,
-                                                   is_series=is_series))
-        content.append(nav)
 
-        page_title = f'{title} — Page {i} of {total_pages}' if total_pages > 1 else title
-        path = os.path.join(output_dir, out_file)
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(generate_html_page(page_title, ''.join(content), shared_header, css_styles))
-        files_created.append(path)
+def write_analysis_assets(output_dir, css_styles):
+    """Write the shared stylesheet and script once; return their version tag.
 
-    return files_created
+    Pages reference both files with ``?v=<tag>`` so browsers can cache them
+    for as long as the tag stays the same.
+    """
+    css = (css_styles + _PAGE_CSS).encode('utf-8')
+    js = _PAGE_JS.encode('utf-8')
+    _write_if_changed(Path(output_dir) / ANALYSIS_CSS_FILE, css)
+    _write_if_changed(Path(output_dir) / ANALYSIS_JS_FILE, js)
+    return hashlib.sha256(css + b'\0' + js).hexdigest()[:12]
+
+
+def write_html_page(out, title, parts, shared_header, asset_version, scripts="", m3u_editor_command=None):
+    """Stream a complete HTML page to ``out``; ``parts`` may be any iterable of
+    strings or a callable that writes the body content to ``out`` itself."""
+    out.write(_PAGE_HEAD.substitute(
+        title=title,
+        css_href=f'{ANALYSIS_CSS_FILE}?v={asset_version}',
+        scripts=scripts,
+        shared_header=shared_header,
+        command_div=_COMMAND_DIV.substitute(command=m3u_editor_command) if m3u_editor_command else '',
+    ))
+    if callable(parts):
+        parts(out)
+    else:
+        for part in parts:
+            out.write(part)
+    out.write(_PAGE_TAIL.substitute(js_href=f'{ANALYSIS_JS_FILE}?v={asset_version}'))
 
 
 def _safe_group_id(group_name):
     return 'g-' + ''.join(c if c.isalnum() or c == '-' else '-' for c in group_name.lower())[:60]
 
 
-def generate_lazy_content(groups_dict, is_movie=False, is_series=False):
-    """
-    Generate page content that stores all channel data as compact JSON.
-    Only group header shells are in the DOM initially. Content is rendered
-    client-side on expand or search — no pagination needed, full search works.
-    """
-    gdata = {}   # group_id -> channel list or series structure
-    shells = []
-
-    for group_name, channels in sorted(groups_dict.items()):
-        gid = _safe_group_id(group_name)
+def _lazy_group_data(channels, is_series=False):
+    """Compact JSON structure for one group, as consumed by ``_renderGroup``."""
+    if not is_series:
+        return [
+            {'n': ch['name'], 'u': ch.get('url', ''), 'l': ch.get('logo', '')}
+            for ch in sorted(channels, key=lambda x: x['name'])
+        ]
+    # Organise episodes by series name -> season -> episode list
+    organised = defaultdict(lambda: defaultdict(list))
+    for ch in channels:
+        raw = ch['name']
+        series_name, season, episode = parse_episode_marker(raw) or ('', 1, 0)
+        series_name = series_name or raw
+        organised[series_name][str(season)].append({
+            'ep': episode,
+            'n': raw,
+            'u': ch.get('url', ''),
+        })
+    # Convert defaultdicts to plain dicts for JSON
+    return {sn: dict(seasons) for sn, seasons in organised.items()}
 
-        if is_series:
-            # Organise episodes by series name -> season -> episode list
-            from collections import defaultdict
-            organised = defaultdict(lambda: defaultdict(list))
-            for ch in channels:
-                raw = ch['name']
-                # parse S##E## pattern
-                import re as _re
-                m = _re.search(r'[Ss](\d+)[Ee](\d+)', raw)
-                season = int(m.group(1)) if m else 1
-                episode = int(m.group(2)) if m else 0
-                series_name = _re.sub(r'\s*[Ss]\d+[Ee]\d+.*', '', raw).strip() or raw
-                organised[series_name][str(season)].append({
-                    'ep': episode,
-                    'n': raw,
-                    'u': ch.get('url', ''),
-                })
-            # Convert defaultdicts to plain dicts for JSON
-            gdata[gid] = {sn: dict(seasons) for sn, seasons in organised.items()}
-        else:
-            gdata[gid] = [
-                {'n': ch['name'], 'u': ch.get('url', ''), 'l': ch.get('logo', '')}
-                for ch in sorted(channels, key=lambda x: x['name'])
-            ]
 
-        shells.append(f'''
-            <div class="group collapsed" id="{gid}">
+def _lazy_group_shell(gid, group_name, count, attrs=''):
+    return f'''
+            <div class="group collapsed" id="{gid}"{attrs}>
                 <div class="group-header">
                     <span class="chevron">&#9660;</span>
                     <span class="group-name">{group_name}</span>
-                    <span class="group-count" data-total="{len(channels)}">{len(channels)}</span>
+                    <span class="group-count" data-total="{count}">{count}</span>
                 </div>
                 <div class="group-body"></div>
-            </div>''')
+            </div>'''
 
-    data_type = 'series' if is_series else ('movie' if is_movie else 'channel')
-    gdata_json = json.dumps(gdata, ensure_ascii=False, separators=(',', ':'))
 
-    return f'<script>var _GDATA={gdata_json};var _GTYPE="{data_type}";</script>\n' + '\n'.join(shells)
+def _compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _write_if_changed(path, payload):
+    """Write ``payload`` unless the file already holds exactly those bytes."""
+    try:
+        if path.stat().st_size == len(payload) and path.read_bytes() == payload:
+            return False
+    except OSError:
+        pass
+    path.write_bytes(payload)
+    return True
+
+
+def generate_lazy_content(groups_dict, is_movie=False, is_series=False, data_dir=None, section=None):
+    """
+    Generate page content for client-side group rendering.
+
+    Without ``data_dir`` every group's data is inlined as one ``_GDATA``
+    object. With it, each group is written to ``<data_dir>/<section>/`` as its
+    own JSON shard next to an ``index.json`` manifest and a ``search.json``
+    name index; the page then only fetches the shards of groups that are
+    expanded or matched by a search.
+    """
+    data_type = 'series' if is_series else ('movie' if is_movie else 'channel')
+    if data_dir is None:
+        gdata = {}   # group_id -> channel list or series structure
+        shells = []
+        for group_name, channels in sorted(groups_dict.items()):
+            gid = _safe_group_id(group_name)
+            gdata[gid] = _lazy_group_data(channels, is_series)
+            shells.append(_lazy_group_shell(gid, group_name, len(channels)))
+        return f'<script>var _GDATA={_compact_json(gdata)};var _GTYPE="{data_type}";</script>\n' + '\n'.join(shells)
+
+    shard_dir = Path(data_dir) / section
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    manifest, search, shells = [], {}, []
+    written = 0
+    for group_name, channels in sorted(groups_dict.items()):
+        gid = _safe_group_id(group_name)
+        shard = hashlib.sha1(group_name.encode('utf-8')).hexdigest()[:16] + '.json'
+        data = _lazy_group_data(channels, is_series)
+        payload = _compact_json(data).encode('utf-8')
+        version = hashlib.sha256(payload).hexdigest()[:12]
+        written += _write_if_changed(shard_dir / shard, payload)
+        search[shard] = [key.lower() for key in (data if is_series else (ch['n'] for ch in data))]
+        manifest.append({'id': gid, 'name': group_name, 'count': len(channels),
+                         'shard': shard, 'v': version})
+        shells.append(_lazy_group_shell(gid, group_name, len(channels),
+                                        f' data-shard="{shard}" data-v="{version}"'))
+
+    live = {entry['shard'] for entry in manifest} | {'index.json', 'search.json'}
+    for stale in shard_dir.glob('*.json'):
+        if stale.name not in live:
+            stale.unlink()
+    search_payload = _compact_json(search).encode('utf-8')
+    search_v = hashlib.sha256(search_payload).hexdigest()[:12]
+    _write_if_changed(shard_dir / 'search.json', search_payload)
+    _write_if_changed(shard_dir / 'index.json', _compact_json({
+        'type': data_type,
+        'search_v': search_v,
+        'groups': manifest,
+    }).encode('utf-8'))
+    print(f"Wrote {written} of {len(manifest)} {section} data shards")
+
+    base = f'{Path(data_dir).name}/{section}/'
+    config = f'var _GSHARDS="{base}";var _GSEARCH="{base}search.json?v={search_v}";var _GTYPE="{data_type}";'
+    return f'<script>{config}</script>\n' + '\n'.join(shells)
+
+
+ANALYSIS_SECTION_PAGES = {
+    'matched': ('content_analysis_matched.html', 'Content with EPG Matches'),
+    'unmatched': ('content_analysis_unmatched.html', 'Content without EPG Matches'),
+    'movies': ('content_analysis_movies.html', 'Movies without TVG-ID'),
+    'series': ('content_analysis_series.html', 'Series without TVG-ID'),
+    'unmatched_no_tvg': ('content_analysis_unmatched_no_tvg.html', 'Other Content without TVG-ID'),
+}
+PARALLEL_SECTION_MIN_ITEMS = 20000   # below this, process start-up costs more than it saves
+
+
+def _render_section(section, output_dir, section_groups, shared_header, asset_version, m3u_editor_command=None):
+    """Render one analysis page. Runs in a worker process, so it only returns
+    plain data: the files written and this section's render-cache state.
+
+    A page whose groups, title, assets and header statistics match the last
+    run is left untouched on disk (the header timestamp is ignored).
+    """
+    filename, title = ANALYSIS_SECTION_PAGES[section]
+    path = os.path.join(output_dir, filename)
+    render_cache = RenderCache(output_dir)
+    if section in ('matched', 'unmatched'):
+        groups = sorted(section_groups.items())
+        digests = [_group_fingerprint(group_name, channels, is_movie=False) for group_name, channels in groups]
+        signature = digests
+
+        def content(out):
+            for (group_name, channels), digest in zip(groups, digests):
+                render_cache.write_fragment(
+                    out, section, group_name, digest,
+                    lambda: iter_group_content(group_name, channels, is_movie=False))
+    else:
+        # Shards are refreshed either way; the page only holds their versions
+        content = [generate_lazy_content(
+            section_groups,
+            is_movie=section == 'movies',
+            is_series=section == 'series',
+            data_dir=os.path.join(output_dir, ANALYSIS_DATA_DIR),
+            section='unmatched' if section == 'unmatched_no_tvg' else section,
+        )]
+        signature = content
+
+    if render_cache.page_unchanged(path, title, signature, asset_version,
+                                   _TIMESTAMP_RE.sub('', shared_header), m3u_editor_command):
+        if section in ('matched', 'unmatched'):
+            for (group_name, _), digest in zip(groups, digests):
+                render_cache.retain(section, group_name, digest)
+        return [path], render_cache.state()
+
+    with open(path, 'w', encoding='utf-8') as f:
+        write_html_page(f, title, content, shared_header, asset_version,
+                        m3u_editor_command=m3u_editor_command)
+    return [path], render_cache.state()
+
+
+def _render_sections(jobs, parallel=True):
+    """Run ``_render_section`` for every job, in a process pool when worthwhile.
+
+    Falls back to rendering in this process when the pool cannot be started or
+    its workers die (e.g. when the module was loaded under a name the workers
+    cannot import); sections are idempotent, so re-rendering is safe. Errors
+    raised while rendering a section propagate.
+    """
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if parallel and workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_render_section, *job) for job in jobs]
+                return [future.result() for future in futures]
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Parallel section rendering unavailable ({e}); rendering sequentially")
+    return [_render_section(*job) for job in jobs]
 
 
 def generate_split_html_reports(groups, no_tvg_id_groups, matched_groups, output_dir):
@@ -1813,21 +1899,6 @@ def generate_split_html_reports(groups, no_tvg_id_groups, matched_groups, output
         .download-btn:hover { background: #00d4ff; color: #003642; }
         .watch-btn { background: rgba(60,215,255,0.15); color: #3cd7ff; }
         .watch-btn:hover { background: #00d4ff; color: #003642; }
-        .pagination-nav {
-            display: flex; align-items: center; justify-content: space-between;
-            padding: 0.75rem 1rem; margin: 0.5rem 0 1rem;
-            background: #1c1b1b; border-radius: 0.625rem;
-            font-family: 'Inter', sans-serif; font-size: 0.75rem;
-        }
-        .pag-btn {
-            padding: 0.3rem 0.85rem; border-radius: 9999px;
-            background: #353534; color: rgba(255,255,255,0.7);
-            text-decoration: none; font-size: 0.7rem; font-weight: 500;
-            text-transform: uppercase; letter-spacing: 0.05em; transition: all 0.15s;
-        }
-        .pag-btn:hover { background: #00d4ff; color: #003642; text-decoration: none; }
-        .pag-disabled { opacity: 0.3; cursor: default; }
-        .pag-info { color: rgba(255,255,255,0.4); font-size: 0.7rem; text-align: center; flex: 1; padding: 0 1rem; }
     """
 
     # Define JavaScript scripts
@@ -1995,101 +2066,34 @@ def generate_split_html_reports(groups, no_tvg_id_groups, matched_groups, output
         m3u_editor_command=m3u_editor_command
     )
 
-    # Create command.json file to store the command for the optimize button
-    command_file = os.path.join(output_dir, 'command.json')
-    with open(command_file, 'w') as f:
-        json.dump({
-            'channel_ids': ','.join(sorted(matched_channel_ids)),
-            'total_channels': total_channels,
-            'total_epg_matches': total_epg_matches,
-            'total_movies': total_movies,
-            'total_series': total_series,
-            'total_unmatched': total_unmatched
-        }, f)
-
-
-    # Generate content for matched channels
-    matched_content = []
-    for group_name, channels in sorted(matched_groups.items()):
-        matched_channels = [c for c in channels if c['has_epg']]
-        if matched_channels:
-            matched_content.append(generate_group_content(group_name, matched_channels, is_movie=False))
-
-    # Generate content for unmatched channels
-    unmatched_content = []
-    for group_name, channels in sorted(matched_groups.items()):
-        unmatched_channels = [c for c in channels if not c['has_epg']]
-        if unmatched_channels:
-            unmatched_content.append(generate_group_content(group_name, unmatched_channels, is_movie=False))
-
-    # Generate content for no-tvg-id channels
-    no_tvg_content = []
-    for group_name, channels in sorted(no_tvg_id_groups.items()):
-        no_tvg_content.append(generate_group_content(group_name, channels, include_epg=False))
-
-    # Create separate files for each section
+    # Stylesheet and script are shared by every page instead of inlined
+    asset_version = write_analysis_assets(output_dir, css_styles)
+
+    # Render the five pages concurrently; each section only reads its own groups
+    sections = [
+        ('matched', {name: [c for c in channels if c['has_epg']]
+                     for name, channels in matched_groups.items()}),
+        ('unmatched', {name: [c for c in channels if not c['has_epg']]
+                       for name, channels in matched_groups.items()}),
+        ('movies', movies_groups),
+        ('series', series_groups),
+        ('unmatched_no_tvg', unmatched_no_tvg),
+    ]
+    jobs = [
+        (section, output_dir, {name: channels for name, channels in section_groups.items() if channels},
+         shared_header, asset_version, m3u_editor_command if section == 'matched' else None)
+        for section, section_groups in sections
+    ]
+    total_items = sum(len(channels) for _, section_groups in sections for channels in section_groups.values())
+    results = _render_sections(jobs, parallel=total_items >= PARALLEL_SECTION_MIN_ITEMS)
+
+    # Merge step: fold every section's render-cache state back together
+    render_cache = RenderCache(output_dir)
     files_created = []
-    
-    # Matched channels page
-    matched_file = os.path.join(output_dir, 'content_analysis_matched.html')
-    with open(matched_file, 'w', encoding='utf-8') as f:
-        f.write(generate_html_page(
-            "Content with EPG Matches",
-            ''.join(matched_content),
-            shared_header,
-            css_styles,
-            m3u_editor_command=m3u_editor_command
-        ))
-    files_created.append(matched_file)
-
-    # Unmatched channels page
-    unmatched_file = os.path.join(output_dir, 'content_analysis_unmatched.html')
-    with open(unmatched_file, 'w', encoding='utf-8') as f:
-        f.write(generate_html_page(
-            "Content without EPG Matches",
-            ''.join(unmatched_content),
-            shared_header,
-            css_styles
-        ))
-    files_created.append(unmatched_file)
-
-     # Split no TVG-ID content
-    movies_groups, series_groups, unmatched_no_tvg = split_no_tvg_content(no_tvg_id_groups)
-    
-    # Calculate new statistics
-    total_channels = sum(len(channels) for channels in matched_groups.values())
-    total_epg_matches = sum(
-        sum(1 for c in channels if c['has_epg'])
-        for channels in matched_groups.values()
-    )
-    total_movies = sum(len(channels) for channels in movies_groups.values())
-    total_series = sum(len(channels) for channels in series_groups.values())
-    total_unmatched = sum(len(channels) for channels in unmatched_no_tvg.values())
-    
-    # Update shared header to include new statistics (reuse styled header with search)
-    shared_header = generate_shared_header(
-        total_channels=total_channels,
-        total_epg_matches=total_epg_matches,
-        total_movies=total_movies,
-        total_series=total_series,
-        total_unmatched=total_unmatched,
-        m3u_editor_command=m3u_editor_command
-    )
-    
-    # Generate movies (lazy-rendered — all data in JS, DOM built on demand)
-    movies_content = generate_lazy_content(movies_groups, is_movie=True)
-    with open(os.path.join(output_dir, 'content_analysis_movies.html'), 'w', encoding='utf-8') as f:
-        f.write(generate_html_page('Movies without TVG-ID', movies_content, shared_header, css_styles))
-
-    # Generate series (lazy-rendered)
-    series_content = generate_lazy_content(series_groups, is_series=True)
-    with open(os.path.join(output_dir, 'content_analysis_series.html'), 'w', encoding='utf-8') as f:
-        f.write(generate_html_page('Series without TVG-ID', series_content, shared_header, css_styles))
-
-    # Generate other no-TVG-ID content (lazy-rendered)
-    notvg_content = generate_lazy_content(unmatched_no_tvg, is_movie=False)
-    with open(os.path.join(output_dir, 'content_analysis_unmatched_no_tvg.html'), 'w', encoding='utf-8') as f:
-        f.write(generate_html_page('Other Content without TVG-ID', notvg_content, shared_header, css_styles))
+    for section, (section_files, cache_state) in zip([job[0] for job in jobs], results):
+        render_cache.merge(cache_state)
+        if section in ('matched', 'unmatched'):
+            files_created.extend(section_files)
 
     # Create an index page that redirects to the matched content
     index_file = os.path.join(output_dir, 'index.html')
@@ -2106,6 +2110,21 @@ def generate_split_html_reports(groups, no_tvg_id_groups, matched_groups, output
         </html>
         """)
     files_created.append(index_file)
+    render_cache.save()
+
+    # command.json is written last so the optimize button never sees stats
+    # for pages that have not been rendered yet
+    command_file = os.path.join(output_dir, 'command.json')
+    with open(command_file + '.tmp', 'w') as f:
+        json.dump({
+            'channel_ids': ','.join(sorted(matched_channel_ids)),
+            'total_channels': total_channels,
+            'total_epg_matches': total_epg_matches,
+            'total_movies': total_movies,
+            'total_series': total_series,
+            'total_unmatched': total_unmatched
+        }, f)
+    os.replace(command_file + '.tmp', command_file)
     
     return files_created, {
         'total_channels': total_channels,
@@ -8,6 +8,8 @@ from pathlib import Path
 from datetime import datetime
 import urllib.parse
 
+from epg_store import load_epg_store
+
 def analyze_url_pattern(url):
     """
     Analyze if a URL indicates a movie or series based on its pattern.
@@ -650,15 +652,20 @@ def parse_m3u_structure(m3u_path):
 def check_epg_matches(xml_file, groups):
     """Check which channels from M3U have EPG entries"""
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        
-        # Get all unique channel IDs from EPG
-        epg_channels = set()
-        for programme in root.findall('.//programme'):
-            channel_id = programme.get('channel', '')
-            if channel_id:
-                epg_channels.add(channel_id)
+        # Get all unique channel IDs from EPG, from its SQLite store when current
+        store = load_epg_store(xml_file)
+        if store is not None:
+            with store:
+                epg_channels = store.programme_channel_ids() - {''}
+        else:
+            tree = ET.parse(xml_file)
+            root = tree.getroot()
+
+            epg_channels = set()
+            for programme in root.findall('.//programme'):
+                channel_id = programme.get('channel', '')
+                if channel_id:
+                    epg_channels.add(channel_id)
         
         print(f"\nFound {len(epg_channels)} unique channels in EPG")
         
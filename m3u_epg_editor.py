@@ -44,6 +44,8 @@ import random
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from epg_store import load_epg_store
+
 log_enabled = False
 log_items = []
 start_timestamp = None
@@ -1244,25 +1246,39 @@ def is_in_range(args, timestamp):
     return range_start <= timestamp <= range_end
 
 
+# creates the tv root element of an epg written by this editor
+def create_epg_root():
+    root = Element("tv")
+    root.set("source-info-name", "m3u-epg-editor")
+    root.set("source-info-url", "github.com/bebo-dot-dev/m3u-epg-editor")
+    root.set("source-data-url", "github.com/bebo-dot-dev/m3u-epg-editor")
+    root.set("generator-info-name", "m3u-epg-editor")
+    root.set("generator-info-url", "https://github.com/bebo-dot-dev/m3u-epg-editor")
+    return root
+
+
 # creates a new epg from the epg represented by original_epg_filename using the given m3u_entries as a template
 def create_new_epg(args, original_epg_filename, m3u_entries):
     tvg_id_unique_entries = {e.tvg_id.lower(): e for e in m3u_entries}.values()
     output_str("creating new xml epg for {} m3u items".format(len(tvg_id_unique_entries)))
     try:
-        xml_parser = XMLParser(recover=True)
-        original_tree = parse(original_epg_filename, xml_parser)
-        original_root = original_tree.getroot()
+        epg_store = load_source_epg_store(args)
+        if epg_store is not None:
+            output_str("querying the epg store for the m3u channels and the configured range")
+            with epg_store:
+                original_root, store_latest_start = select_store_epg(args, epg_store, tvg_id_unique_entries)
+            original_tree = original_root.getroottree()
+        else:
+            store_latest_start = None
+            xml_parser = XMLParser(recover=True)
+            original_tree = parse(original_epg_filename, xml_parser)
+            original_root = original_tree.getroot()
 
         if original_root is None:
             output_str("epg creation failure, the supplied source {0} epg file appears to have no root element. Check the source data.".format(original_epg_filename))
             return None
 
-        new_root = Element("tv")
-        new_root.set("source-info-name", "m3u-epg-editor")
-        new_root.set("source-info-url", "github.com/bebo-dot-dev/m3u-epg-editor")
-        new_root.set("source-data-url", "github.com/bebo-dot-dev/m3u-epg-editor")
-        new_root.set("generator-info-name", "m3u-epg-editor")
-        new_root.set("generator-info-url", "https://github.com/bebo-dot-dev/m3u-epg-editor")
+        new_root = create_epg_root()
 
         # create a channel element for every channel present in the m3u
         epg_channel_count = 0
@@ -1388,6 +1404,11 @@ def create_new_epg(args, original_epg_filename, m3u_entries):
                             programme_start_timestamp = programme_start_timestamp + datetime.timedelta(hours=2)
                             programme_stop_timestamp = programme_stop_timestamp + datetime.timedelta(hours=2)
 
+        if store_latest_start is not None:
+            # the store only returned programmes near the range window
+            store_latest_start = datetime.datetime.fromtimestamp(store_latest_start, tzlocal.get_localzone())
+            max_programme_start_timestamp = max(max_programme_start_timestamp, store_latest_start)
+
         now = datetime.datetime.now(tzlocal.get_localzone())
         range_start = now - datetime.timedelta(hours=args.range)
         range_end = now + datetime.timedelta(hours=args.range)
@@ -1407,6 +1428,26 @@ def create_new_epg(args, original_epg_filename, m3u_entries):
         return None
 
 
+# returns the sqlite store built next to a file:// epg source while it is still current, otherwise None
+def load_source_epg_store(args):
+    if not args.epgurl or not args.epgurl.lower().startswith("file:"):
+        return None
+    return load_epg_store(url2pathname(urlparse(args.epgurl).path))
+
+
+# queries the epg store for the channel and programme elements of the given m3u entries with programmes limited to
+# the configured range window, and returns them under an editor root element with the latest programme start timestamp
+def select_store_epg(args, epg_store, m3u_entries):
+    folded_ids = {e.tvg_id.strip().casefold() for e in m3u_entries if e.tvg_id}
+    now = int(time.time())
+    # the store reads timestamps without an offset as UTC, so widen the window by the largest timezone offset;
+    # is_in_range still applies the exact window
+    window = (args.range + 14) * 3600
+    root = create_epg_root()
+    root.extend(epg_store.iter_elements(folded_ids, start_from=now - window, start_to=now + window + 1))
+    return root, epg_store.latest_start(folded_ids)
+
+
 # creates a dictionary of channels from the supplied EPG root node
 def create_channel_dictionary(epg_root):
     channel_dict = {}
@@ -32,12 +32,35 @@ def normalize_mirrors(values: list[str]) -> list[str]:
     return result
 
 
+class ProviderRewriter:
+    """``rewrite_provider_url`` for one pair of origins, normalized and encoded once.
+
+    Exports rewrite every entry against the same origins, so they build one
+    rewriter and call it per URL. Rewriters are immutable and picklable.
+    """
+
+    __slots__ = ("source", "active", "encoded_source", "encoded_active")
+
+    def __init__(self, source_origin: str | None, active_origin: str | None) -> None:
+        source = normalize_origin(source_origin)
+        active = normalize_origin(active_origin)
+        if not source or not active or source.casefold() == active.casefold():
+            source = active = None
+        self.source = source
+        self.active = active
+        self.encoded_source = quote(source, safe="/") if source else None
+        self.encoded_active = quote(active, safe="/") if active else None
+
+    def __bool__(self) -> bool:
+        """False when URLs are returned unchanged."""
+        return self.source is not None
+
+    def __call__(self, url: str) -> str:
+        if self.source is None or (self.source not in url and self.encoded_source not in url):
+            return url
+        return url.replace(self.encoded_source, self.encoded_active).replace(self.source, self.active)
+
+
 def rewrite_provider_url(url: str, source_origin: str | None, active_origin: str | None) -> str:
     """Replace only the configured provider origin, including proxy-encoded URLs."""
-    source = normalize_origin(source_origin)
-    active = normalize_origin(active_origin)
-    if not source or not active or source.casefold() == active.casefold():
-        return url
-    encoded_source = quote(source, safe="/")
-    encoded_active = quote(active, safe="/")
-    return url.replace(encoded_source, encoded_active).replace(source, active)
+    return ProviderRewriter(source_origin, active_origin)(url)
@@ -0,0 +1,86 @@
+"""Coalesce concurrent identical operations into one in-flight call."""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from threading import Event, Lock
+from typing import Callable, Hashable, Iterator
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share it.
+
+    The first caller for a key runs the function. Callers arriving while it
+    runs wait for it and get the same return value, or the same exception.
+    The key is forgotten as soon as the call finishes, so a later request
+    runs again and sees the files as they are then. Coalescing is
+    in-process, like ``security_controls.rate_limit``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, function: Callable, *args, **kwargs) -> tuple[object, bool]:
+        """``(result, shared)``, where ``shared`` is true for callers that joined a running call."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
+class KeyedLock:
+    """One lock per key, for work that differs but must not overlap.
+
+    ``SingleFlight`` only merges identical calls; different calls that
+    write the same files hold the same key here and run one after another.
+    A key's lock is dropped once nobody holds or waits for it. In-process,
+    like ``SingleFlight``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._locks: dict[Hashable, list] = {}
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Iterator[None]:
+        with self._lock:
+            entry = self._locks.setdefault(key, [Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
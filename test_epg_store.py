@@ -0,0 +1,126 @@
+import contextlib
+from datetime import datetime, timedelta, timezone
+import io
+from pathlib import Path
+from types import SimpleNamespace
+import tempfile
+import unittest
+from unittest import mock
+
+from lxml import etree
+
+from epg_store import build_epg_store, load_epg_store, store_path, xmltv_timestamp
+from jellyfin_export import generate_jellyfin_export
+import m3u_epg_editor as editor
+
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="News.One" group-title="News",One
+http://provider/live/u/p/1
+#EXTINF:-1 tvg-id="sport&more" group-title="Sports",Sport
+http://provider/live/u/p/2
+"""
+
+
+def _guide(now: datetime) -> str:
+    def at(hours):
+        return (now + timedelta(hours=hours)).strftime("%Y%m%d%H0000 +0000")
+
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<tv generator-info-name="provider">
+  <channel id="news.one"><display-name>One</display-name></channel>
+  <channel id="skipped"><display-name>Skipped &amp; gone</display-name></channel>
+  <channel id="SPORT&amp;MORE"><display-name>Sport</display-name></channel>
+  <programme channel="news.one" start="{at(-30)}" stop="{at(-29)}"><title>Yesterday</title></programme>
+  <programme channel="news.one" start="{at(1)}" stop="{at(2)}"><title>Soon</title><category>News</category></programme>
+  <programme channel="skipped" start="{at(1)}"><title>Not exported</title></programme>
+  <programme channel="sport&amp;more" start="{at(2)}"><title>Match &lt;Live&gt;</title></programme>
+  <programme channel="news.one" start="{at(90)}" stop="{at(91)}"><title>Later</title></programme>
+</tv>
+"""
+
+
+def _playlist(root: Path, now: datetime) -> Path:
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+    (root / "epg.xml").write_text(_guide(now), encoding="utf-8")
+    return root
+
+
+class EpgStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    def test_timestamps(self):
+        self.assertEqual(1786492800, xmltv_timestamp("20260812000000 +0000"))
+        self.assertEqual(1786492800 - 3600, xmltv_timestamp("20260812000000 +0100"))
+        self.assertEqual(1786492800, xmltv_timestamp("20260812"))
+        self.assertIsNone(xmltv_timestamp("soon"))
+
+    def test_store_queries_match_full_parse(self):
+        with tempfile.TemporaryDirectory() as directory:
+            parsed = _playlist(Path(directory) / "parsed", self.now)
+            stored = _playlist(Path(directory) / "stored", self.now)
+            build_epg_store(stored / "epg.xml")
+
+            with load_epg_store(stored / "epg.xml") as store:
+                self.assertEqual({"news.one", "skipped", "sport&more"}, store.programme_channel_ids())
+                start = int(self.now.timestamp())
+                titles = [
+                    element.findtext("title")
+                    for element in store.iter_elements({"news.one"}, start_from=start, start_to=start + 86400)
+                ]
+                self.assertEqual([None, "Soon"], titles)
+                self.assertEqual(start + 90 * 3600, store.latest_start({"news.one"}))
+
+            expected = generate_jellyfin_export(parsed)
+            with mock.patch("jellyfin_export.etree.iterparse", wraps=etree.iterparse) as full_parses:
+                manifest = generate_jellyfin_export(stored)
+            self.assertEqual(0, full_parses.call_count)
+            self.assertEqual(expected["counts"], manifest["counts"])
+            self.assertEqual(
+                (parsed / "exports" / "jellyfin" / "default" / "epg.xml").read_bytes(),
+                (stored / "exports" / "jellyfin" / "default" / "epg.xml").read_bytes(),
+            )
+
+    def test_editor_uses_store_for_its_range(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = _playlist(Path(directory), self.now)
+            guide = root / "epg.xml"
+            entries = [
+                SimpleNamespace(tvg_id="News.One", tvg_name="One"),
+                SimpleNamespace(tvg_id="sport&more", tvg_name="Sport"),
+            ]
+            args = SimpleNamespace(
+                epgurl=guide.as_uri(), outdirectory=directory, range=24, preserve_case=False,
+                channel_transforms=[], http_for_images=False, no_tvg_id=False, force_epg=False,
+                xml_sort_type=None,
+            )
+
+            def create():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return etree.tostring(editor.create_new_epg(args, str(guide), entries))
+
+            expected = create()
+            build_epg_store(guide)
+            with mock.patch.object(editor, "parse", side_effect=AssertionError("guide parsed")):
+                self.assertEqual(expected, create())
+            self.assertIn(b"Soon", expected)
+            self.assertNotIn(b"Later", expected)
+            with load_epg_store(guide) as store:
+                selected, _ = editor.select_store_epg(args, store, entries)
+            self.assertEqual(editor.create_epg_root().attrib, selected.attrib)
+            self.assertIn(b'generator-info-name="m3u-epg-editor"', expected)
+
+    def test_stale_stores_are_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            guide = _playlist(Path(directory), self.now) / "epg.xml"
+            self.assertEqual(store_path(guide), build_epg_store(guide))
+            load_epg_store(guide).close()
+
+            guide.write_text(_guide(self.now).replace("Soon", "Sooner"), encoding="utf-8")
+            self.assertIsNone(load_epg_store(guide))
+
+
+if __name__ == "__main__":
+    unittest.main()
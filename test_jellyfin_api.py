@@ -0,0 +1,298 @@
+from collections import defaultdict
+import hashlib
+import json
+from pathlib import Path
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import uuid
+
+import app as web
+from conftest import WatchJoiners
+from jellyfin_pipeline import export_jellyfin_profile
+from jellyfin_profiles import load_profiles
+from models import IntegrationToken, Playlist, User, db
+
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="live.one" group-title="News",One
+http://provider/live/u/p/1
+#EXTINF:-1 group-title="MOVIES",Film (2025)
+http://provider/movie/u/p/2.mkv
+"""
+
+
+class JellyfinApiTestCase(unittest.TestCase):
+    """Integration-token routes for throwaway accounts whose playlists live in a temporary directory."""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        paths = mock.patch.object(
+            web.playlist_manager, "get_playlist_path", lambda user_id, name: self.directory / str(user_id) / name
+        )
+        paths.start()
+        self.addCleanup(paths.stop)
+        self.client = web.app.test_client()
+        self.user_id, self.token = self._account()
+        self.playlist_dir = web.playlist_manager.get_playlist_path(self.user_id, "Tonight")
+        self.playlist_dir.mkdir(parents=True)
+        (self.playlist_dir / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+        (self.playlist_dir / "epg.xml").write_text('<tv><channel id="live.one"/></tv>', encoding="utf-8")
+
+    def _account(self):
+        """A new user with a "Tonight" playlist; returns ``(user id, raw token)``."""
+        name = f"api-test-{uuid.uuid4().hex[:12]}"
+        with web.app.app_context():
+            user = User(username=name, email=f"{name}@example.invalid")
+            user.set_password(uuid.uuid4().hex)
+            db.session.add(user)
+            db.session.commit()
+            db.session.add(Playlist(name="Tonight", source="m3u", user_id=user.id, details={}))
+            db.session.commit()
+            _, token = IntegrationToken.issue(user)
+            user_id = user.id
+        self.addCleanup(self._delete_account, user_id)
+        return user_id, token
+
+    def _delete_account(self, user_id):
+        with web.app.app_context():
+            user = db.session.get(User, user_id)
+            if user is not None:
+                db.session.delete(user)
+                db.session.commit()
+
+    def _headers(self, token=None, **headers):
+        return {"Authorization": f"Bearer {token or self.token}", **headers}
+
+    def _export(self):
+        return export_jellyfin_profile(self.playlist_dir, "default", load_profiles(self.playlist_dir)["default"])
+
+
+class ArtifactTests(JellyfinApiTestCase):
+    URL = "/api/jellyfin/playlists/Tonight/artifacts/live.m3u8"
+
+    def test_manifest_digest_is_the_etag(self):
+        manifest = self._export()
+        response = self.client.get(self.URL, headers=self._headers())
+        self.assertEqual(200, response.status_code)
+        etag = manifest["artifacts"]["live.m3u8"]["sha256"][:32]
+        self.assertEqual(etag, response.get_etag()[0])
+
+        response = self.client.get(self.URL, headers=self._headers(**{"If-None-Match": f'"{etag}"'}))
+        self.assertEqual(304, response.status_code)
+
+        compressed = self.client.get(self.URL, headers=self._headers(**{"Accept-Encoding": "gzip"}))
+        self.assertEqual("gzip", compressed.headers["Content-Encoding"])
+        self.assertEqual(f"{etag}-gzip", compressed.get_etag()[0])
+
+    def test_changed_artifact_gets_a_new_etag(self):
+        etag = self._export()["artifacts"]["live.m3u8"]["sha256"][:32]
+        (self.playlist_dir / "tv.m3u").write_text(PLAYLIST + """#EXTINF:-1 tvg-id="live.two" group-title="News",Two
+http://provider/live/u/p/3
+""", encoding="utf-8")
+        republished = self._export()
+        response = self.client.get(self.URL, headers=self._headers(**{"If-None-Match": f'"{etag}"'}))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(republished["artifacts"]["live.m3u8"]["sha256"][:32], response.get_etag()[0])
+        self.assertIn(b"http://provider/live/u/p/3", response.data)
+
+    def test_artifact_the_manifest_does_not_describe_keeps_a_file_etag(self):
+        etag = self._export()["artifacts"]["live.m3u8"]["sha256"][:32]
+        # Same size, other bytes: a file replaced before its manifest
+        live = self.playlist_dir / "exports" / "jellyfin" / "default" / "live.m3u8"
+        live.write_bytes(live.read_bytes().replace(b"provider", b"PROVIDER"))
+        response = self.client.get(self.URL, headers=self._headers(**{"If-None-Match": f'"{etag}"'}))
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.get_etag()[0])
+
+    def test_stream_playlist_etag_follows_its_content(self):
+        static = mock.patch.object(web.app, "_static_folder", str(self.directory / "static"))
+        static.start()
+        self.addCleanup(static.stop)
+        source = self.directory / "static" / "playlists" / str(self.user_id) / "Tonight" / "tv.m3u"
+        source.parent.mkdir(parents=True)
+        source.write_text(PLAYLIST, encoding="utf-8")
+        with web.app.app_context():
+            url = f"/stream/{db.session.get(User, self.user_id).stream_token}/Tonight/tv.m3u"
+
+        etag = hashlib.sha256(PLAYLIST.encode("utf-8")).hexdigest()[:32]
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(etag, response.get_etag()[0])
+        self.assertEqual(304, self.client.get(url, headers={"If-None-Match": f'"{etag}"'}).status_code)
+
+        source.write_text(PLAYLIST.replace("One", "Uno"), encoding="utf-8")
+        response = self.client.get(url, headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(200, response.status_code)
+        self.assertIn(b"Uno", response.data)
+
+    def test_range_request(self):
+        self._export()
+        whole = self.client.get(self.URL, headers=self._headers()).data
+        response = self.client.get(self.URL, headers=self._headers(Range="bytes=0-6"))
+        self.assertEqual(206, response.status_code)
+        self.assertEqual(whole[:7], response.data)
+
+    def test_requires_a_token_for_the_playlist_owner(self):
+        self._export()
+        self.assertEqual(401, self.client.get(self.URL).status_code)
+        # Another account's "Tonight" is its own playlist, which has no export
+        _, other = self._account()
+        self.assertEqual(404, self.client.get(self.URL, headers=self._headers(other)).status_code)
+
+
+class VodDeltaTests(JellyfinApiTestCase):
+    URL = "/api/jellyfin/playlists/Tonight/profiles/default/vod/delta"
+
+    def _delta(self, **query):
+        return self.client.get(self.URL, query_string=query, headers=self._headers())
+
+    def test_checks_token_arguments_and_export(self):
+        self.assertEqual(401, self.client.get(self.URL, query_string={"since": "a"}).status_code)
+        self.assertEqual(400, self._delta().status_code)
+        self.assertEqual(400, self._delta(since="a", limit="many").status_code)
+        self.assertEqual(404, self._delta(since="a").status_code)
+        response = self.client.get(
+            self.URL.replace("Tonight", "Missing"), query_string={"since": "a"}, headers=self._headers()
+        )
+        self.assertEqual(404, response.status_code)
+
+    def test_pages_changes_since_a_revision(self):
+        first = self._export()["vod"]["revision"]
+        (self.playlist_dir / "tv.m3u").write_text(PLAYLIST + """#EXTINF:-1 group-title="MOVIES",Sequel (2026)
+http://provider/movie/u/p/3.mkv
+#EXTINF:-1 group-title="MOVIES",Threequel (2027)
+http://provider/movie/u/p/4.mkv
+""", encoding="utf-8")
+        second = self._export()["vod"]["revision"]
+
+        page = self._delta(since=first, limit=1).get_json()
+        self.assertEqual({"since", "revision", "remove_missing", "items", "next_cursor"}, set(page))
+        self.assertEqual((first, second, True), (page["since"], page["revision"], page["remove_missing"]))
+        self.assertEqual(["added"], [item["change"] for item in page["items"]])
+        rest = self._delta(since=first, cursor=page["next_cursor"], limit=10).get_json()
+        self.assertIsNone(rest["next_cursor"])
+        titles = [item["record"]["relative_path"].split("/")[1] for item in page["items"] + rest["items"]]
+        self.assertEqual(2, len(titles))
+        self.assertTrue(titles[0].startswith("Sequel (2026)") and titles[1].startswith("Threequel (2027)"))
+
+        current = self._delta(since=second).get_json()
+        self.assertEqual(([], None), (current["items"], current["next_cursor"]))
+
+    def test_unknown_base_and_stale_revision_conflict(self):
+        revision = self._export()["vod"]["revision"]
+        response = self._delta(since="0" * 64)
+        self.assertEqual(409, response.status_code)
+        self.assertEqual(revision, response.get_json()["revision"])
+        response = self._delta(since="0" * 64, revision="1" * 64)
+        self.assertEqual(409, response.status_code)
+        self.assertIn("restart synchronization", response.get_json()["error"])
+
+
+class ExportJobTests(JellyfinApiTestCase):
+    URL = "/api/jellyfin/playlists/Tonight/export/jobs"
+
+    def setUp(self):
+        super().setUp()
+        self.finished = defaultdict(threading.Event)
+        job_set = web._job_set
+
+        def finishing(job_id, step, status=None, **kw):
+            job_set(job_id, step, status, **kw)
+            if status in ("complete", "error"):
+                self.finished[job_id].set()
+
+        patch = mock.patch.object(web, "_job_set", finishing)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _start(self):
+        response = self.client.post(self.URL, json={}, headers=self._headers())
+        self.assertEqual(202, response.status_code)
+        return response.get_json()
+
+    def _finish(self, job):
+        self.assertTrue(self.finished[job["job_id"]].wait(10))
+        return self.client.get(job["status_url"], headers=self._headers()).get_json()
+
+    def test_completed_job_reports_progress_and_manifest(self):
+        status = self._finish(self._start())
+        self.assertEqual(("complete", None), (status["status"], status["error"]))
+        self.assertEqual("vod", status["progress"]["stage"])
+        self.assertEqual(2, status["progress"]["entries_scanned"])
+        self.assertGreater(status["progress"]["bytes_written"], 0)
+        self.assertIn("Scanning playlist…", status["steps"])
+        published = json.loads((self.playlist_dir / "exports" / "jellyfin" / "default" / "manifest.json").read_text())
+        self.assertEqual(published["artifacts"], status["result"]["artifacts"])
+
+    def test_status_is_private_to_the_owner(self):
+        self.assertEqual(401, self.client.post(self.URL, json={}).status_code)
+        job = self._start()
+        self._finish(job)
+        self.assertEqual(401, self.client.get(job["status_url"]).status_code)
+        _, other = self._account()
+        self.assertEqual(404, self.client.get(job["status_url"], headers=self._headers(other)).status_code)
+        missing = job["status_url"].replace(job["job_id"], "0" * 10)
+        self.assertEqual(404, self.client.get(missing, headers=self._headers()).status_code)
+
+    def test_exports_of_one_playlist_take_turns(self):
+        started, release = threading.Event(), threading.Event()
+        running = []
+
+        def export(playlist_path, profile_name, profile, progress=None, **options):
+            running.append(profile_name)
+            started.set()
+            release.wait(5)
+            running.remove(profile_name)
+            return {"revision": "x"}
+
+        def export_all(playlist_path, profiles, progress=None, **options):
+            return {name: {"overlapped": list(running)} for name in profiles}
+
+        with mock.patch.object(web, "export_jellyfin_profile", export), \
+                mock.patch.object(web, "export_jellyfin_profiles", export_all):
+            first = self._start()
+            self.assertTrue(started.wait(5))
+            response = self.client.post(self.URL, json={"all_profiles": True}, headers=self._headers())
+            second = response.get_json()
+            # A different export of the same playlist waits for the running one
+            self.assertFalse(self.finished[second["job_id"]].wait(0.2))
+            release.set()
+            statuses = [self._finish(first), self._finish(second)]
+        self.assertEqual({"revision": "x"}, statuses[0]["result"])
+        self.assertEqual({"profiles": {"default": {"overlapped": []}}}, statuses[1]["result"])
+
+    def test_joined_job_follows_the_running_export(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def export(playlist_path, profile_name, profile, progress=None, **options):
+            calls.append(profile_name)
+            progress("playlist", 0, 0)
+            started.set()
+            release.wait(5)
+            progress("xmltv", 10, 100)
+            return {"revision": "x"}
+
+        with mock.patch.object(web, "export_jellyfin_profile", export), WatchJoiners() as joiners:
+            first = self._start()
+            self.assertTrue(started.wait(5))
+            second = self._start()
+            self.assertTrue(joiners.wait_for(1))
+            waiting = self.client.get(second["status_url"], headers=self._headers()).get_json()
+            self.assertEqual("playlist", waiting["progress"]["stage"])
+            release.set()
+            statuses = [self._finish(first), self._finish(second)]
+        self.assertEqual(["default"], calls)
+        for status in statuses:
+            self.assertEqual(("complete", {"revision": "x"}), (status["status"], status["result"]))
+            self.assertEqual({"stage": "xmltv", "entries_scanned": 10, "bytes_written": 100}, status["progress"])
+            self.assertIn("Trimming XMLTV guide…", status["steps"])
+        self.assertIn("Waiting for the export already running…", statuses[1]["steps"])
+
+
+if __name__ == "__main__":
+    unittest.main()
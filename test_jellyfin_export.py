@@ -1,11 +1,16 @@
+import gzip
+import hashlib
 import json
 from pathlib import Path
+import re
 import tempfile
 import unittest
+from unittest import mock
 
 from lxml import etree
 
-from jellyfin_export import generate_jellyfin_export, iter_m3u
+import jellyfin_export
+from jellyfin_export import generate_jellyfin_export, iter_m3u, stamp_m3u
 
 
 def _write_fixture(root: Path):
@@ -125,6 +130,161 @@ http://provider/live/us
             tree = etree.parse(str(output / "epg.xml"))
             self.assertEqual(["ca.news"], tree.xpath("/tv/channel/@id"))
 
+    def test_group_facts_are_derived_once_per_group(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            _write_fixture(root)
+            lines = ["#EXTM3U"]
+            for number in range(40):
+                group = ("CA| SPORTS EN", "US| NEWS")[number % 2]
+                lines += [f'#EXTINF:-1 tvg-id="ch{number}" group-title="{group}",Channel {number}',
+                          f"http://provider/live/u/p/{number}"]
+            (root / "tv.m3u").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+            with mock.patch.object(jellyfin_export, "group_categories", wraps=jellyfin_export.group_categories) as categories, \
+                    mock.patch.object(jellyfin_export, "_matches_group_prefix", wraps=jellyfin_export._matches_group_prefix) as prefixes:
+                manifest = generate_jellyfin_export(root, profile="canada", group_prefixes=("CA",))
+            self.assertEqual(2, categories.call_count)
+            self.assertEqual(2, prefixes.call_count)
+            self.assertEqual(20, manifest["counts"]["m3u"]["exported_live"])
+            self.assertEqual(20, manifest["counts"]["m3u"]["excluded_by_group"])
+
+    def test_stamped_playlists_keep_kinds_and_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            _write_fixture(root)
+            before = list(iter_m3u(root / "tv.m3u"))
+
+            self.assertEqual(4, stamp_m3u(root / "tv.m3u"))
+            self.assertEqual(0, stamp_m3u(root / "tv.m3u"))
+            after = list(iter_m3u(root / "tv.m3u"))
+            self.assertEqual([entry.url for entry in before], [entry.url for entry in after])
+            for old, new in zip(before, after):
+                self.assertEqual(old.content_kind, new.attributes["x-m3uguide-kind"])
+                self.assertEqual(hashlib.sha256(old.url.encode("utf-8")).hexdigest()[:24], new.attributes["x-m3uguide-id"])
+                self.assertEqual(old.extinf.rsplit(",", 1)[-1], new.extinf.rsplit(",", 1)[-1])
+
+            with mock.patch.object(jellyfin_export, "unquote", side_effect=AssertionError("URL classified")):
+                manifest = generate_jellyfin_export(root)
+            self.assertEqual(2, manifest["counts"]["m3u"]["exported_live"])
+            live = list(iter_m3u(root / "exports" / "jellyfin" / "default" / "live.m3u8"))
+            self.assertEqual(
+                [entry.attributes["x-m3uguide-id"] for entry in after if entry.content_kind == "live"],
+                [entry.attributes["x-m3uguide-id"] for entry in live],
+            )
+
+    def test_stale_stamps_are_ignored_and_not_exported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            _write_fixture(root)
+            stamp_m3u(root / "tv.m3u")
+            text = (root / "tv.m3u").read_text(encoding="utf-8")
+            # The provider reused the live line for a movie
+            (root / "tv.m3u").write_text(
+                text.replace("http://provider/live/u/p/1\n", "http://provider/movie/u/p/9.mkv\n"), encoding="utf-8"
+            )
+            reused = next(iter_m3u(root / "tv.m3u"))
+            self.assertEqual("live", reused.attributes["x-m3uguide-kind"])
+            self.assertEqual("movie", reused.content_kind)
+            self.assertEqual(hashlib.sha256(reused.url.encode("utf-8")).hexdigest()[:24], reused.stable_id)
+
+            manifest = generate_jellyfin_export(root)
+            self.assertEqual(1, manifest["counts"]["m3u"]["exported_live"])
+            live = (root / "exports" / "jellyfin" / "default" / "live.m3u8").read_text(encoding="utf-8")
+            self.assertNotIn("x-m3uguide-kind", live)
+            self.assertNotIn("x-m3uguide-urlsum", live)
+            self.assertIn("x-m3uguide-id=", live)
+
+    def test_stamping_keeps_every_other_byte(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = Path(directory) / "tv.m3u"
+            original = (
+                b'\xef\xbb\xbf#EXTM3U x-tvg-url="http://guide/epg.xml"\r\n'
+                b'#EXTINF:-1 tvg-id="tele.one" group-title="FR - T\xe9l\xe9",Cha\xeene Un\r\n'
+                b'#EXTVLCOPT:http-user-agent=Lecteur\r\n'
+                b'http://provider/live/u/p/1?n=Cha\xeene\r\n'
+                b'#EXTINF:0 group-title="MOVIES",Film (2025)\n'
+                b'http://provider/movie/u/p/2.mkv\n'
+            )
+            source.write_bytes(original)
+            before = list(iter_m3u(source))
+
+            self.assertEqual(2, stamp_m3u(source))
+            stamped = source.read_bytes()
+            self.assertEqual(original, re.sub(rb' x-m3uguide-(?:kind|id|urlsum)="[^"]*"', b"", stamped))
+            self.assertTrue(stamped.startswith(b"\xef\xbb\xbf#EXTM3U"))
+            self.assertIn(b'#EXTINF:-1 x-m3uguide-kind="live" x-m3uguide-id="', stamped)
+            self.assertIn(b'group-title="FR - T\xe9l\xe9",Cha\xeene Un\r\n', stamped)
+            after = list(iter_m3u(source))
+            self.assertEqual([entry.stable_id for entry in before], [entry.stable_id for entry in after])
+            self.assertEqual(0, stamp_m3u(source))
+
+    def test_stale_stamps_fall_back_to_the_url(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            _write_fixture(root)
+            stamp_m3u(root / "tv.m3u")
+            first, second = list(iter_m3u(root / "tv.m3u"))[:2]
+            # A line copied onto another stream keeps the first stream's stamps
+            copied = jellyfin_export.M3uEntry(extinf=first.extinf, url=second.url, attributes=first.attributes)
+            self.assertEqual(second.stable_id, copied.stable_id)
+            self.assertNotEqual(first.stable_id, copied.stable_id)
+
+            text = (root / "tv.m3u").read_text(encoding="utf-8")
+            (root / "tv.m3u").write_text(text.replace(second.url, second.url + "?edited"), encoding="utf-8")
+            self.assertEqual(1, stamp_m3u(root / "tv.m3u"))
+            edited = list(iter_m3u(root / "tv.m3u"))[1]
+            self.assertEqual(hashlib.sha256(edited.url.encode("utf-8")).hexdigest()[:24], edited.attributes["x-m3uguide-id"])
+
+    def test_unchanged_inputs_reuse_published_revision(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            _write_fixture(root)
+            output = root / "exports" / "jellyfin" / "default"
+            first = generate_jellyfin_export(root)
+            live_mtime = (output / "live.m3u8").stat().st_mtime_ns
+
+            second = generate_jellyfin_export(root)
+            self.assertTrue(second["unchanged"])
+            self.assertEqual(first["generated_at"], second["generated_at"])
+            self.assertEqual(live_mtime, (output / "live.m3u8").stat().st_mtime_ns)
+
+            # Rewriting identical bytes changes the mtime but not the revision
+            (root / "epg.xml").write_bytes((root / "epg.xml").read_bytes())
+            self.assertTrue(generate_jellyfin_export(root)["unchanged"])
+
+            changed_filter = generate_jellyfin_export(root, group_prefixes=("News",))
+            self.assertNotIn("unchanged", changed_filter)
+            self.assertNotEqual(first["generated_at"], changed_filter["generated_at"])
+
+    def test_manifest_digests_are_computed_while_writing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            _write_fixture(root)
+            output = root / "exports" / "jellyfin" / "default"
+            manifest = generate_jellyfin_export(root)
+            for name, artifact in manifest["artifacts"].items():
+                with self.subTest(artifact=name):
+                    data = (output / name).read_bytes()
+                    self.assertEqual(len(data), artifact["bytes"])
+                    self.assertEqual(hashlib.sha256(data).hexdigest(), artifact["sha256"])
+
+    def test_large_artifacts_are_published_with_gzip_siblings(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            _write_fixture(root)
+            output = root / "exports" / "jellyfin" / "default"
+            output.mkdir(parents=True)
+            (output / "epg.xml.br").write_bytes(b"stale")
+            with mock.patch("jellyfin_export.brotli", None):
+                generate_jellyfin_export(root)
+            for name in ("live.m3u8", "epg.xml"):
+                with self.subTest(artifact=name):
+                    compressed = (output / f"{name}.gz").read_bytes()
+                    self.assertEqual((output / name).read_bytes(), gzip.decompress(compressed))
+            self.assertFalse((output / "epg.xml.br").exists())
+            self.assertFalse((output / "manifest.json.gz").exists())
+
     def test_canadian_provider_groups_receive_canonical_categories(self):
         from jellyfin_export import _group_categories
 
@@ -0,0 +1,271 @@
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import types
+import unittest
+from unittest import mock
+
+from lxml import etree
+
+from epg_store import build_epg_store
+import jellyfin_export
+import jellyfin_pipeline
+import jellyfin_vod_catalog
+from jellyfin_export import generate_jellyfin_export
+from jellyfin_pipeline import export_jellyfin_profile, export_jellyfin_profiles
+from jellyfin_vod_catalog import generate_vod_catalog
+
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="live.one" group-title="News",One
+http://provider/live/u/p/1
+#EXTINF:-1 group-title="MOVIES",Film (2025)
+http://provider/movie/u/p/2.mkv
+#EXTINF:-1 group-title="SHOWS",Show S01E01 - Pilot
+http://provider/series/u/p/3.mkv
+#EXTINF:-1 group-title="SHOWS",Show Special
+http://provider/series/u/p/4.mkv
+"""
+
+PROFILE = {
+    "name": "default", "include_movies": True, "include_series": True,
+    "movie_groups": [], "series_groups": [], "live_group_prefixes": [], "remove_missing_vod": True,
+}
+
+
+class JellyfinPipelineTests(unittest.TestCase):
+    def test_single_pass_matches_separate_exports(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+            (root / "epg.xml").write_text('<tv><channel id="live.one"/></tv>', encoding="utf-8")
+
+            with mock.patch.object(jellyfin_pipeline, "iter_m3u", wraps=jellyfin_pipeline.iter_m3u) as scans:
+                manifest = export_jellyfin_profile(root, "default", PROFILE)
+            self.assertEqual(1, scans.call_count)
+            self.assertEqual(1, manifest["counts"]["m3u"]["exported_live"])
+            self.assertEqual(1, manifest["vod"]["counts"]["movies"])
+            self.assertEqual(1, manifest["vod"]["counts"]["unparsed_episodes"])
+            export_dir = root / "exports" / "jellyfin" / "default"
+            self.assertEqual([], sorted(path.name for path in export_dir.glob(".*.partial")))
+            self.assertEqual(1, len((export_dir / "vod.parse-diagnostics.jsonl").read_text().splitlines()))
+
+            separate = generate_vod_catalog(root / "tv.m3u", root / "separate", PROFILE)
+            self.assertEqual(separate["revision"], manifest["vod"]["revision"])
+            self.assertEqual(
+                (root / "separate" / "vod.catalog.jsonl").read_bytes(),
+                (export_dir / "vod.catalog.jsonl").read_bytes(),
+            )
+
+            # Live unchanged, catalog profile changed: only the catalog is rebuilt
+            changed = {**PROFILE, "include_movies": False}
+            with mock.patch.object(jellyfin_pipeline, "iter_m3u", wraps=jellyfin_pipeline.iter_m3u) as scans:
+                again = export_jellyfin_profile(root, "default", changed)
+            self.assertEqual(1, scans.call_count)
+            self.assertTrue(again["unchanged"])
+            self.assertNotIn("unchanged", again["vod"])
+            self.assertNotIn("movies", again["vod"]["counts"])
+            stored = json.loads((export_dir / "vod.manifest.json").read_text(encoding="utf-8"))
+            self.assertEqual(again["vod"]["revision"], stored["revision"])
+
+            self.assertTrue(export_jellyfin_profile(root, "default", changed)["vod"]["unchanged"])
+
+    def test_all_profiles_share_one_playlist_and_guide_pass(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "tv.m3u").write_text(PLAYLIST + """#EXTINF:-1 tvg-id="SPORT.one" group-title="Sports",Game
+http://provider/live/u/p/5
+""", encoding="utf-8")
+            (root / "epg.xml").write_text("""<tv>
+<channel id="live.one"/><channel id="sport.one"/>
+<programme channel="live.one" start="20260812000000 +0000"><title>Headlines</title></programme>
+<programme channel="sport.one" start="20260812000000 +0000"><title>Match</title></programme>
+</tv>""", encoding="utf-8")
+            profiles = {
+                "everything": {**PROFILE, "name": "everything"},
+                "sports": {**PROFILE, "name": "sports", "live_group_prefixes": ["Sports"], "include_series": False},
+            }
+            with mock.patch("jellyfin_export.etree.iterparse", wraps=etree.iterparse) as guide_scans, \
+                    mock.patch.object(jellyfin_pipeline, "iter_m3u", wraps=jellyfin_pipeline.iter_m3u) as scans:
+                manifests = export_jellyfin_profiles(root, profiles)
+            self.assertEqual(1, scans.call_count)
+            self.assertEqual(1, guide_scans.call_count)
+            self.assertEqual(2, manifests["everything"]["counts"]["m3u"]["exported_live"])
+            self.assertEqual(1, manifests["sports"]["counts"]["m3u"]["exported_live"])
+            self.assertEqual(2, manifests["everything"]["counts"]["xmltv"]["programmes"])
+            self.assertEqual(1, manifests["sports"]["counts"]["xmltv"]["programmes"])
+            self.assertNotIn("episodes", manifests["sports"]["vod"]["counts"])
+
+            exports = root / "exports" / "jellyfin"
+            sports_guide = (exports / "sports" / "epg.xml").read_text(encoding="utf-8")
+            self.assertIn('channel="SPORT.one"', sports_guide)
+            self.assertNotIn("Headlines", sports_guide)
+            self.assertEqual([], [path.name for path in exports.glob(".jellyfin-export-*")])
+
+            alone = root / "alone"
+            alone.mkdir()
+            for name in ("tv.m3u", "epg.xml"):
+                (alone / name).write_bytes((root / name).read_bytes())
+            generate_jellyfin_export(alone, profile="sports", group_prefixes=("Sports",))
+            for name in ("live.m3u8", "epg.xml"):
+                self.assertEqual(
+                    (alone / "exports" / "jellyfin" / "sports" / name).read_bytes(),
+                    (exports / "sports" / name).read_bytes(),
+                )
+
+            single = export_jellyfin_profile(root, "everything", profiles["everything"])
+            self.assertTrue(single["unchanged"])
+            self.assertTrue(single["vod"]["unchanged"])
+
+    def test_failed_catalog_publishes_nothing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+            (root / "epg.xml").write_text('<tv><channel id="live.one"/></tv>', encoding="utf-8")
+            first = export_jellyfin_profile(root, "default", PROFILE)
+            export_dir = root / "exports" / "jellyfin" / "default"
+            published = {path.name: path.read_bytes() for path in export_dir.iterdir() if path.is_file()}
+
+            (root / "tv.m3u").write_text(PLAYLIST + """#EXTINF:-1 tvg-id="live.two" group-title="News",Two
+http://provider/live/u/p/5
+""", encoding="utf-8")
+            with mock.patch.object(jellyfin_pipeline.VodCatalogWriter, "stage", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    export_jellyfin_profile(root, "default", PROFILE)
+            self.assertEqual(published, {path.name: path.read_bytes() for path in export_dir.iterdir() if path.is_file()})
+            self.assertEqual([], [path.name for path in export_dir.parent.glob(".jellyfin-export-*")])
+
+            again = export_jellyfin_profile(root, "default", PROFILE)
+            self.assertEqual(2, again["counts"]["m3u"]["exported_live"])
+            self.assertNotEqual(first["artifacts"]["live.m3u8"]["sha256"], again["artifacts"]["live.m3u8"]["sha256"])
+
+    def test_profiles_keep_each_others_parse_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+            (root / "epg.xml").write_text('<tv><channel id="live.one"/></tv>', encoding="utf-8")
+            movies = {**PROFILE, "name": "movies", "include_series": False}
+            shows = {**PROFILE, "name": "shows", "include_movies": False}
+            export_jellyfin_profile(root, "movies", movies)
+            export_jellyfin_profile(root, "shows", shows)
+
+            put = jellyfin_pipeline.VodParseCache.put
+            with mock.patch.object(jellyfin_pipeline.VodParseCache, "put", autospec=True, side_effect=put) as misses:
+                again = export_jellyfin_profile(root, "movies", {**movies, "max_movies": 10})
+            self.assertNotIn("unchanged", again["vod"])
+            self.assertEqual(1, again["vod"]["counts"]["movies"])
+            self.assertEqual(0, misses.call_count)
+
+            # Entries gone from the playlist are dropped from the cache
+            (root / "tv.m3u").write_text(PLAYLIST.split("#EXTINF:-1 group-title=\"SHOWS\"")[0], encoding="utf-8")
+            export_jellyfin_profile(root, "movies", movies)
+            with (root / jellyfin_pipeline.PARSE_CACHE_FILE).open(encoding="utf-8") as cached:
+                cached.readline()
+                self.assertEqual(1, len(json.loads(cached.readline())))
+
+    def test_profiles_share_one_preparation_and_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            for playlist_dir in (root, root / "sequential"):
+                playlist_dir.mkdir(exist_ok=True)
+                (playlist_dir / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+                (playlist_dir / "epg.xml").write_text('<tv><channel id="live.one"/></tv>', encoding="utf-8")
+            profiles = {name: {**PROFILE, "name": name} for name in ("first", "second")}
+            prepare = jellyfin_vod_catalog._EntryPreparer.prepare
+            with mock.patch.object(jellyfin_vod_catalog._EntryPreparer, "prepare", autospec=True,
+                                   side_effect=prepare) as prepared:
+                sequential = export_jellyfin_profiles(root / "sequential", profiles)
+            # Three VOD entries, each prepared once for both profiles
+            self.assertEqual(3, prepared.call_count)
+
+            # A server started as a script must not be re-run by the workers
+            marker = root / "imported"
+            script = root / "server.py"
+            script.write_text(f"open({str(marker)!r}, 'w').close()\n", encoding="utf-8")
+            server = types.ModuleType("__main__")
+            server.__file__ = str(script)
+            with mock.patch.object(jellyfin_vod_catalog, "PARALLEL_MIN_ENTRIES", 0), \
+                    mock.patch.dict(sys.modules, {"__main__": server}), \
+                    mock.patch.object(jellyfin_vod_catalog, "ProcessPoolExecutor",
+                                      wraps=jellyfin_vod_catalog.ProcessPoolExecutor) as pools:
+                parallel = export_jellyfin_profiles(root, profiles, vod_workers=2)
+            pools.assert_called_once()
+            self.assertEqual(str(script), server.__file__)
+            self.assertFalse(marker.exists())
+            for name in profiles:
+                self.assertEqual(sequential[name]["vod"]["revision"], parallel[name]["vod"]["revision"])
+
+    def test_progress_reports_stages_entries_and_bytes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+            (root / "epg.xml").write_text('<tv><channel id="live.one"/></tv>', encoding="utf-8")
+            reports = []
+            with mock.patch.object(jellyfin_pipeline, "PROGRESS_INTERVAL", 2):
+                manifest = export_jellyfin_profile(
+                    root, "default", PROFILE, progress=lambda *report: reports.append(report)
+                )
+            self.assertEqual(
+                [("playlist", 0), ("playlist", 2), ("playlist", 4), ("xmltv", 4), ("vod", 4)],
+                [(stage, scanned) for stage, scanned, _ in reports],
+            )
+            written = [written for _, _, written in reports]
+            self.assertEqual(sorted(written), written)
+            # Playlist, guide and catalog are all in by the last report
+            self.assertGreaterEqual(
+                written[-1], manifest["vod"]["catalog_bytes"] + manifest["artifacts"]["live.m3u8"]["bytes"]
+            )
+
+            reports.clear()
+            self.assertTrue(export_jellyfin_profile(root, "default", PROFILE, progress=reports.append)["unchanged"])
+            self.assertEqual([], reports)
+
+    def test_profile_guide_window(self):
+        now = 1786492800 + 1800
+
+        def at(hours):
+            return time.strftime("%Y%m%d%H%M%S +0000", time.gmtime(now + hours * 3600))
+
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+            (root / "epg.xml").write_text(f"""<tv>
+<channel id="live.one"/>
+<programme channel="live.one" start="{at(-30)}" stop="{at(-29)}"><title>Yesterday</title></programme>
+<programme channel="live.one" start="{at(-8)}" stop="{at(1)}"><title>Airing</title></programme>
+<programme channel="live.one" start="{at(10)}"><title>Tonight</title></programme>
+<programme channel="live.one" start="{at(100)}" stop="{at(101)}"><title>Next week</title></programme>
+<programme channel="live.one" start="soon"><title>Unknown</title></programme>
+</tv>""", encoding="utf-8")
+            profiles = {
+                "everything": {**PROFILE, "name": "everything"},
+                "recent": {**PROFILE, "name": "recent", "epg_past_hours": 6, "epg_future_hours": 72},
+            }
+            with mock.patch("jellyfin_export.time.time", return_value=now):
+                manifests = export_jellyfin_profiles(root, profiles)
+                self.assertTrue(export_jellyfin_profile(root, "recent", profiles["recent"])["unchanged"])
+            self.assertEqual(5, manifests["everything"]["counts"]["xmltv"]["programmes"])
+            counts = manifests["recent"]["counts"]["xmltv"]
+            self.assertEqual(3, counts["programmes"])
+            self.assertEqual(2, counts["programmes_outside_window"])
+            guide = (root / "exports" / "jellyfin" / "recent" / "epg.xml").read_text(encoding="utf-8")
+            self.assertNotIn("Yesterday", guide)
+            self.assertNotIn("Next week", guide)
+
+            # Unchanged sources keep the guide for a few hours, then it is rebuilt
+            build_epg_store(root / "epg.xml")
+            with mock.patch("jellyfin_export.time.time", return_value=now + 3600):
+                self.assertTrue(export_jellyfin_profile(root, "recent", profiles["recent"])["unchanged"])
+            hours = jellyfin_export.EPG_WINDOW_REUSE_HOURS + 1
+            with mock.patch("jellyfin_export.time.time", return_value=now + hours * 3600):
+                later = export_jellyfin_profile(root, "recent", profiles["recent"])
+            self.assertNotIn("unchanged", later)
+            # The store leaves programmes outside the window out of its query
+            self.assertEqual(3, later["counts"]["xmltv"]["programmes"])
+            self.assertEqual(guide, (root / "exports" / "jellyfin" / "recent" / "epg.xml").read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
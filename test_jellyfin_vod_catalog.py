@@ -1,8 +1,14 @@
+import gzip
+import io
+import json
 from pathlib import Path
 import tempfile
 import unittest
+from unittest import mock
+import zipfile
 
-from jellyfin_vod_catalog import generate_vod_catalog, read_catalog_page
+import jellyfin_vod_catalog
+from jellyfin_vod_catalog import generate_vod_catalog, iter_catalog_archive, read_catalog_page
 
 
 class JellyfinVodCatalogTests(unittest.TestCase):
@@ -39,6 +45,225 @@ https://example/series/u/p/3.mkv
             season = next(item for item in records if item["relative_path"].endswith("season.nfo"))
             self.assertIn("<seasonnumber>1</seasonnumber>", season["content"])
 
+            archive = b"".join(iter_catalog_archive(root / "export" / "vod.catalog.jsonl"))
+            with zipfile.ZipFile(io.BytesIO(archive)) as bundle:
+                self.assertEqual(8, len(bundle.namelist()))
+                self.assertEqual(season["content"], bundle.read(season["relative_path"]).decode("utf-8"))
+                movie = next(item for item in records if item["kind"] == "movie")
+                self.assertEqual(movie["stream_url"] + "\n", bundle.read(movie["relative_path"]).decode("utf-8"))
+
+            again = generate_vod_catalog(playlist, root / "export", profile)
+            self.assertTrue(again["unchanged"])
+            self.assertEqual(manifest["revision"], again["revision"])
+            changed = generate_vod_catalog(playlist, root / "export", {**profile, "include_series": False})
+            self.assertNotIn("unchanged", changed)
+            self.assertEqual(0, changed["counts"].get("episodes", 0))
+
+    def test_publishes_delta_against_previous_revision(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            playlist = root / "tv.m3u"
+            export = root / "export"
+            profile = {"name": "default", "movie_groups": [], "series_groups": []}
+            playlist.write_text("""#EXTM3U
+#EXTINF:-1 group-title="MOVIES",Kept (2020)
+https://example/movie/u/p/1.mkv
+#EXTINF:-1 group-title="MOVIES",Renamed (2021)
+https://example/movie/u/p/2.mkv
+#EXTINF:-1 group-title="MOVIES",Dropped (2022)
+https://example/movie/u/p/3.mkv
+""", encoding="utf-8")
+            first = generate_vod_catalog(playlist, export, profile)
+            self.assertIsNone(first["delta"])
+            self.assertFalse((export / "vod.delta.jsonl").exists())
+            ids = [record["id"] for record in read_catalog_page(export / "vod.catalog.jsonl", 0, 10)[0]]
+
+            playlist.write_text("""#EXTM3U
+#EXTINF:-1 group-title="MOVIES",Kept (2020)
+https://example/movie/u/p/1.mkv
+#EXTINF:-1 group-title="MOVIES",Renamed Again (2021)
+https://example/movie/u/p/2.mkv
+#EXTINF:-1 group-title="MOVIES",New (2023)
+https://example/movie/u/p/4.mkv
+""", encoding="utf-8")
+            second = generate_vod_catalog(playlist, export, profile)
+            self.assertEqual(
+                {"from": first["revision"], "changed": 1, "added": 1, "removed": 1}, second["delta"]
+            )
+            changes, cursor = read_catalog_page(export / "vod.delta.jsonl", 0, 10)
+            self.assertIsNone(cursor)
+            self.assertEqual(["changed", "added", "removed"], [change["change"] for change in changes])
+            self.assertEqual(ids[1], changes[0]["record"]["id"])
+            self.assertIn("Renamed Again", changes[0]["record"]["relative_path"])
+            self.assertEqual({"change": "removed", "id": ids[2]}, changes[2])
+
+            # A rebuild with identical content keeps the delta that led here
+            again = generate_vod_catalog(playlist, export, {**profile, "max_series": 5})
+            self.assertEqual(second["delta"], again["delta"])
+            self.assertEqual(3, len(read_catalog_page(export / "vod.delta.jsonl", 0, 10)[0]))
+
+    def test_block_compressed_catalog_keeps_cursor_semantics(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            playlist = root / "tv.m3u"
+            playlist.write_text("#EXTM3U\n" + "".join(
+                f'#EXTINF:-1 group-title="SHOWS",Show {n // 10} S01E{n % 10 + 1:02d} - Part {n}\n'
+                f"https://example/series/u/p/{n}.mkv\n"
+                for n in range(60)
+            ), encoding="utf-8")
+            profile = {"name": "default", "movie_groups": [], "series_groups": []}
+            plain = generate_vod_catalog(playlist, root / "plain", profile)
+            with mock.patch.object(jellyfin_vod_catalog, "CATALOG_BLOCK_BYTES", 2048):
+                blocks = generate_vod_catalog(playlist, root / "blocks", {**profile, "compress_catalog": True})
+
+            self.assertEqual(plain["revision"], blocks["revision"])
+            self.assertEqual(plain["records"], blocks["records"])
+            self.assertEqual("vod.catalog.jsonl.gz", blocks["catalog_file"])
+            self.assertFalse((root / "blocks" / "vod.catalog.jsonl").exists())
+            self.assertEqual(
+                (root / "plain" / "vod.catalog.jsonl").read_bytes(),
+                gzip.decompress((root / "blocks" / "vod.catalog.jsonl.gz").read_bytes()),
+            )
+            self.assertGreater(len(json.loads((root / "blocks" / "vod.catalog.blocks.json").read_text())["blocks"]), 3)
+
+            cursors = {"plain": 0, "blocks": 0}
+            while cursors["plain"] is not None:
+                pages = {}
+                for name, filename in (("plain", "vod.catalog.jsonl"), ("blocks", "vod.catalog.jsonl.gz")):
+                    pages[name], cursors[name] = read_catalog_page(root / name / filename, cursors[name], 7)
+                self.assertEqual(pages["plain"], pages["blocks"])
+                self.assertEqual(cursors["plain"], cursors["blocks"])
+
+            # Switching back to plain storage removes the compressed files
+            generate_vod_catalog(playlist, root / "blocks", profile)
+            self.assertEqual([], sorted(path.name for path in (root / "blocks").glob("vod.catalog*.gz")))
+
+    def test_catalog_read_between_catalog_and_index_replacement(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            playlist = root / "tv.m3u"
+            profile = {"name": "default", "movie_groups": [], "series_groups": [], "compress_catalog": True}
+            export = root / "export"
+
+            def publish(count):
+                playlist.write_text("#EXTM3U\n" + "".join(
+                    f'#EXTINF:-1 group-title="MOVIES",Film {n} (2025)\nhttps://example/movie/u/p/{n}.mkv\n'
+                    for n in range(count)
+                ), encoding="utf-8")
+                with mock.patch.object(jellyfin_vod_catalog, "CATALOG_BLOCK_BYTES", 1024):
+                    generate_vod_catalog(playlist, export, profile)
+
+            publish(40)
+            stale_index = (export / "vod.catalog.blocks.json").read_bytes()
+            publish(25)
+            # A reader arriving after the catalog was replaced but before its index
+            (export / "vod.catalog.blocks.json").write_bytes(stale_index)
+
+            expected = [
+                json.loads(line)
+                for line in gzip.decompress((export / "vod.catalog.jsonl.gz").read_bytes()).splitlines()
+            ]
+            records, cursor = [], 0
+            while cursor is not None:
+                page, cursor = read_catalog_page(export / "vod.catalog.jsonl.gz", cursor, 7)
+                records.extend(page)
+            self.assertEqual(expected, records)
+
+    def test_parse_cache_is_reused_until_overrides_change(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            playlist = root / "tv.m3u"
+            playlist.write_text("""#EXTM3U
+#EXTINF:-1 group-title="MOVIES",Film (2025)
+https://example/movie/u/p/1.mkv
+#EXTINF:-1 group-title="SHOWS",Show S01E01 - Pilot
+https://example/series/u/p/2.mkv
+#EXTINF:-1 group-title="SHOWS",Mystery installment
+https://example/series/u/p/3.mkv
+""", encoding="utf-8")
+            profile = {"name": "default", "movie_groups": [], "series_groups": []}
+            first = generate_vod_catalog(playlist, root / "first", profile)
+            self.assertTrue((root / jellyfin_vod_catalog.PARSE_CACHE_FILE).exists())
+
+            with mock.patch.object(jellyfin_vod_catalog, "_episode_info") as episode_info, \
+                    mock.patch.object(jellyfin_vod_catalog, "_movie_info") as movie_info:
+                second = generate_vod_catalog(playlist, root / "second", profile)
+            self.assertEqual(0, episode_info.call_count + movie_info.call_count)
+            self.assertEqual(first["revision"], second["revision"])
+            self.assertEqual(
+                (root / "first" / "vod.parse-diagnostics.jsonl").read_bytes(),
+                (root / "second" / "vod.parse-diagnostics.jsonl").read_bytes(),
+            )
+
+            diagnostic = json.loads((root / "first" / "vod.parse-diagnostics.jsonl").read_text(encoding="utf-8"))
+            overrides = root / "vod-overrides.json"
+            overrides.write_text(json.dumps({"items": {
+                diagnostic["id"]: {"series": "Mystery Show", "season": 1, "episode": 2},
+            }}), encoding="utf-8")
+            signature = jellyfin_vod_catalog.VodParseCache.recorded_signature(root / jellyfin_vod_catalog.PARSE_CACHE_FILE)
+            self.assertNotEqual(jellyfin_vod_catalog.overrides_digest(overrides), signature["overrides"])
+            third = generate_vod_catalog(playlist, root / "third", profile, overrides_path=overrides)
+            self.assertEqual(1, third["counts"]["overrides_applied"])
+            self.assertEqual(0, third["counts"].get("unparsed_episodes", 0))
+            signature = jellyfin_vod_catalog.VodParseCache.recorded_signature(root / jellyfin_vod_catalog.PARSE_CACHE_FILE)
+            self.assertEqual(jellyfin_vod_catalog.overrides_digest(overrides), signature["overrides"])
+
+    def test_parallel_generation_matches_sequential(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            playlist = root / "tv.m3u"
+            lines = ["#EXTM3U"]
+            for number in range(60):
+                group = ("NETFLIX", "HBO", "KIDS & FAMILY")[number % 3]
+                if number % 4 == 0:
+                    lines += [f'#EXTINF:-1 group-title="{group}",Film {number} ({2000 + number})',
+                              f"https://example/movie/u/p/{number}.mkv"]
+                elif number % 11 == 0:
+                    lines += [f'#EXTINF:-1 group-title="{group}",Mystery {number}',
+                              f"https://example/series/u/p/{number}.mkv"]
+                else:
+                    lines += [f'#EXTINF:-1 group-title="{group}",Show {number % 5} S0{number % 3 + 1}E{number:02d}',
+                              f"https://example/series/u/p/{number}.mkv"]
+            playlist.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            profile = {"name": "default", "movie_groups": [], "series_groups": [], "max_movies": 10, "max_series": 4}
+
+            sequential = generate_vod_catalog(playlist, root / "sequential", profile)
+            (root / jellyfin_vod_catalog.PARSE_CACHE_FILE).unlink()
+            accept_batch = jellyfin_vod_catalog.VodPreparation._accept_batch
+            in_flight = []
+
+            def accept(preparation, batch, futures):
+                in_flight.append(len(preparation.in_flight))
+                accept_batch(preparation, batch, futures)
+
+            # Batches of 7 put more in flight than the bound of two per worker
+            with mock.patch.object(jellyfin_vod_catalog, "PARALLEL_MIN_ENTRIES", 0), \
+                    mock.patch.object(jellyfin_vod_catalog, "PARALLEL_BATCH_ENTRIES", 7), \
+                    mock.patch.object(jellyfin_vod_catalog.VodPreparation, "_accept_batch", accept), \
+                    mock.patch.object(jellyfin_vod_catalog, "ProcessPoolExecutor",
+                                      wraps=jellyfin_vod_catalog.ProcessPoolExecutor) as pool:
+                parallel = generate_vod_catalog(playlist, root / "parallel", profile, workers=2)
+            pool.assert_called_once()
+            self.assertEqual(2, pool.call_args.args[0])
+            self.assertEqual("spawn", pool.call_args.kwargs["mp_context"].get_start_method())
+            self.assertGreater(len(in_flight), 4)
+            self.assertEqual(4, max(in_flight))
+            self.assertEqual(sequential["revision"], parallel["revision"])
+            self.assertEqual(sequential["counts"], parallel["counts"])
+            for name in ("vod.catalog.jsonl", "vod.parse-diagnostics.jsonl"):
+                self.assertEqual((root / "sequential" / name).read_bytes(), (root / "parallel" / name).read_bytes())
+
+    def test_nfo_rendering_matches_lxml(self):
+        from jellyfin_vod_catalog import _nfo, _nfo_tree
+
+        for text in ("Tom & Jerry <Uncut>", 'Rock \'n\' "Roll"', "Amélie ]]>", "Line\rbreak", "tab\tand\nnewline"):
+            with self.subTest(text=text):
+                values = {"title": text, "year": 2025, "thumb": None, "genre": "", "tag": 0}
+                self.assertEqual(_nfo_tree("movie", values), _nfo("movie", values))
+        self.assertEqual("<season/>", _nfo("season", {"title": None}))
+        with self.assertRaises(ValueError):
+            _nfo("movie", {"title": "bad\x01byte"})
+
 
 if __name__ == "__main__":
     unittest.main()
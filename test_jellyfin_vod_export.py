@@ -1,10 +1,12 @@
+import io
 from pathlib import Path
 import tempfile
 import unittest
+import zipfile
 
 from lxml import etree
 
-from jellyfin_vod_export import generate_vod_fixture
+from jellyfin_vod_export import ARCHIVE_CHUNK_BYTES, generate_vod_fixture, iter_library_archive
 
 
 class JellyfinVodExportTests(unittest.TestCase):
@@ -41,6 +43,40 @@ http://m3u.futurepr0n.com/stream_proxy?url=http%3A//provider/series/u/p/2.mkv
             self.assertEqual("2", tree.xpath("string(/episodedetails/episode)"))
             self.assertEqual("Pilot", tree.xpath("string(/episodedetails/title)"))
 
+    def test_archive_only_fixture_streams_entries_without_a_tree(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            playlist = root / "tv.m3u"
+            playlist.write_text("""#EXTM3U
+#EXTINF:-1 group-title="EN - NEW RELEASE",Film (2025)
+http://provider/movie/u/p/1.mkv
+""", encoding="utf-8")
+            with_tree = generate_vod_fixture(playlist, root / "tree", movie_limit=1)
+            archive_only = generate_vod_fixture(playlist, root / "vod", movie_limit=1, tree=False)
+
+            self.assertEqual(with_tree, archive_only)
+            self.assertFalse((root / "vod").exists())
+            with zipfile.ZipFile(root / "vod.zip") as bundle, zipfile.ZipFile(root / "tree.zip") as tree_bundle:
+                self.assertEqual(sorted(tree_bundle.namelist()), sorted(bundle.namelist()))
+                stream = bundle.getinfo("Movies/Film (2025)/Film (2025).strm")
+                self.assertEqual(zipfile.ZIP_STORED, stream.compress_type)
+                self.assertEqual(zipfile.ZIP_DEFLATED, bundle.getinfo("Movies/Film (2025)/movie.nfo").compress_type)
+                self.assertEqual(
+                    (root / "tree" / "Movies" / "Film (2025)" / "movie.nfo").read_bytes(),
+                    bundle.read("Movies/Film (2025)/movie.nfo"),
+                )
+            self.assertEqual([], list(root.glob(".*.partial")))
+
+    def test_streamed_archive_is_yielded_in_large_chunks(self):
+        files = [(f"Movies/Film {number}/movie.strm", f"http://provider/movie/u/p/{number}.mkv\n")
+                 for number in range(5000)]
+        chunks = list(iter_library_archive(files))
+        self.assertLess(len(chunks), 10)
+        self.assertTrue(all(len(chunk) >= ARCHIVE_CHUNK_BYTES for chunk in chunks[:-1]))
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as bundle:
+            self.assertEqual([name for name, _ in files], bundle.namelist())
+            self.assertEqual(files[-1][1], bundle.read(files[-1][0]).decode("utf-8"))
+
 
 if __name__ == "__main__":
     unittest.main()
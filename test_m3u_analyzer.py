@@ -0,0 +1,174 @@
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import importlib.util
+import io
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+def _load_analyzer():
+    """The analyzer is a script with a hyphenated name; register it so workers can import it."""
+    spec = importlib.util.spec_from_file_location(
+        "m3u_analyzer", Path(__file__).with_name("m3u_analyzer_beefy-new.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+analyzer = _load_analyzer()
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="news.one" group-title="News",News One
+http://provider/live/u/p/1
+#EXTINF:-1 tvg-id="news.two" group-title="News",News Two
+http://provider/live/u/p/2
+#EXTINF:-1 tvg-id="sport.one" group-title="Sports",Game
+http://provider/live/u/p/3
+#EXTINF:-1 tvg-id="" group-title="MOVIES",Film (2025)
+http://provider/movie/u/p/4.mkv
+#EXTINF:-1 tvg-id="" group-title="MOVIES",Sequel (2026)
+http://provider/movie/u/p/5.mkv
+#EXTINF:-1 tvg-id="" group-title="SHOWS",Show S01E01 - Pilot
+http://provider/series/u/p/6.mkv
+#EXTINF:-1 tvg-id="" group-title="SHOWS",Show S01E02 - Second
+http://provider/series/u/p/7.mkv
+#EXTINF:-1 tvg-id="" group-title="Radio",Station
+http://provider/radio/8
+"""
+
+GUIDE = """<tv>
+<channel id="news.one"/><channel id="sport.one"/>
+<programme channel="news.one" start="20260812000000 +0000"><title>Headlines</title></programme>
+<programme channel="sport.one" start="20260812000000 +0000"><title>Match</title></programme>
+</tv>"""
+
+
+class AnalyzerTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        (self.root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+        (self.root / "epg.xml").write_text(GUIDE, encoding="utf-8")
+
+    def _report(self, name="report", playlist=None):
+        """Run the analysis into ``<name>/static/playlists/1/Tonight`` and return that directory."""
+        if playlist is not None:
+            (self.root / "tv.m3u").write_text(playlist, encoding="utf-8")
+        output = self.root / name / "static" / "playlists" / "1" / "Tonight"
+        output.mkdir(parents=True, exist_ok=True)
+        groups, no_tvg_id_groups = analyzer.parse_m3u_structure(self.root / "tv.m3u")
+        matched_groups = analyzer.check_epg_matches(str(self.root / "epg.xml"), groups)
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer.generate_split_html_reports(groups, no_tvg_id_groups, matched_groups, str(output))
+        return output
+
+    @staticmethod
+    def _files(output):
+        """Every file the analysis wrote, with the header timestamp left out."""
+        return {
+            str(path.relative_to(output)): analyzer._TIMESTAMP_RE.sub("", path.read_text(encoding="utf-8"))
+            for path in sorted(output.rglob("*")) if path.is_file()
+        }
+
+
+class SectionRenderingTests(AnalyzerTestCase):
+    def test_parallel_rendering_matches_sequential(self):
+        sequential = self._files(self._report("sequential"))
+        with mock.patch.object(analyzer, "PARALLEL_SECTION_MIN_ITEMS", 0), \
+                mock.patch.object(analyzer.os, "cpu_count", return_value=2), \
+                mock.patch.object(analyzer, "ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pools:
+            parallel = self._files(self._report("parallel"))
+        self.assertEqual(1, pools.call_count)
+        self.assertEqual(sequential, parallel)
+        self.assertIn("content_analysis_series.html", parallel)
+
+    def test_falls_back_when_no_pool_can_start(self):
+        sequential = self._files(self._report("sequential"))
+        with mock.patch.object(analyzer, "PARALLEL_SECTION_MIN_ITEMS", 0), \
+                mock.patch.object(analyzer.os, "cpu_count", return_value=2), \
+                mock.patch.object(analyzer, "ProcessPoolExecutor", side_effect=OSError("no semaphores")):
+            self.assertEqual(sequential, self._files(self._report("fallback")))
+
+    def test_rendering_errors_propagate(self):
+        output = self.root / "broken"
+        output.mkdir()
+        jobs = [(section, str(output), {}, "", "v") for section in ("matched", "missing")]
+        printed = io.StringIO()
+        with mock.patch.object(analyzer.os, "cpu_count", return_value=2), contextlib.redirect_stdout(printed):
+            with self.assertRaises(KeyError):
+                analyzer._render_sections(jobs)
+        self.assertNotIn("sequentially", printed.getvalue())
+
+
+class IncrementalReportTests(AnalyzerTestCase):
+    def _pages(self, output):
+        return {filename: output / filename for filename, _ in analyzer.ANALYSIS_SECTION_PAGES.values()}
+
+    def test_unchanged_pages_are_not_rewritten(self):
+        output = self._report()
+        pages = self._pages(output)
+        for path in pages.values():
+            os.utime(path, ns=(0, 0))
+
+        self._report()
+        self.assertEqual({0}, {path.stat().st_mtime_ns for path in pages.values()})
+        manifest = json.loads((output / analyzer.RENDER_CACHE_DIR / "manifest.json").read_text(encoding="utf-8"))
+        self.assertTrue((output / analyzer.RENDER_CACHE_DIR / f"{manifest['matched:News']}.html").exists())
+
+        # Same counts, one renamed entry: only the page showing it is rebuilt
+        self._report(playlist=PLAYLIST.replace(",Station", ",Station Two"))
+        rewritten = {name for name, path in pages.items() if path.stat().st_mtime_ns}
+        self.assertEqual({"content_analysis_unmatched_no_tvg.html"}, rewritten)
+        self.assertIn("station two", (output / "data" / "unmatched" / "search.json").read_text(encoding="utf-8"))
+
+    def test_shards_and_search_index_match_groups(self):
+        output = self._report()
+        movies = output / "data" / "movies"
+        index = json.loads((movies / "index.json").read_text(encoding="utf-8"))
+        self.assertEqual("movie", index["type"])
+        [group] = index["groups"]
+        self.assertEqual(("MOVIES", 2), (group["name"], group["count"]))
+        shard = json.loads((movies / group["shard"]).read_text(encoding="utf-8"))
+        self.assertEqual(["Film (2025)", "Sequel (2026)"], [channel["n"] for channel in shard])
+        search = (movies / "search.json").read_bytes()
+        self.assertEqual({group["shard"]: ["film (2025)", "sequel (2026)"]}, json.loads(search))
+        self.assertEqual(hashlib.sha256(search).hexdigest()[:12], index["search_v"])
+        page = (output / "content_analysis_movies.html").read_text(encoding="utf-8")
+        self.assertIn(f'data-shard="{group["shard"]}" data-v="{group["v"]}"', page)
+        self.assertIn(f'data/movies/search.json?v={index["search_v"]}', page)
+
+        series = json.loads((output / "data" / "series" / "search.json").read_text(encoding="utf-8"))
+        self.assertEqual([["show"]], list(series.values()))
+
+        # A renamed group replaces its shard
+        self._report(playlist=PLAYLIST.replace('group-title="MOVIES"', 'group-title="FILMS"'))
+        self.assertFalse((movies / group["shard"]).exists())
+        [renamed] = json.loads((movies / "index.json").read_text(encoding="utf-8"))["groups"]
+        self.assertEqual(
+            {renamed["shard"], "index.json", "search.json"}, {path.name for path in movies.iterdir()}
+        )
+
+    def test_pages_share_versioned_assets(self):
+        output = self._report()
+        css = (output / analyzer.ANALYSIS_CSS_FILE).read_bytes()
+        js = (output / analyzer.ANALYSIS_JS_FILE).read_bytes()
+        version = hashlib.sha256(css + b"\0" + js).hexdigest()[:12]
+        for name, path in self._pages(output).items():
+            with self.subTest(page=name):
+                page = path.read_text(encoding="utf-8")
+                self.assertIn(f'href="analysis.css?v={version}"', page)
+                self.assertIn(f'src="analysis.js?v={version}"', page)
+                self.assertNotIn("<style>", page)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import threading
+import unittest
+
+from conftest import WatchJoiners
+from single_flight import KeyedLock, SingleFlight
+
+
+class SingleFlightTests(unittest.TestCase):
+    def _join(self, flight, key, function, started, count):
+        """Start ``count`` callers and return once all but the first wait on the first one's call."""
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(flight.do(key, function))
+            except Exception as error:
+                outcomes.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        with WatchJoiners() as joiners:
+            threads[0].start()
+            self.assertTrue(started.wait(5))
+            self.assertTrue(flight.in_flight(key))
+            for thread in threads[1:]:
+                thread.start()
+            self.assertTrue(joiners.wait_for(count - 1))
+        return threads, outcomes
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def export():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"revision": "abc"}
+
+        threads, outcomes = self._join(flight, ("export", "playlist"), export, started, 4)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(1, len(calls))
+        self.assertEqual([{"revision": "abc"}] * 4, [result for result, _ in outcomes])
+        self.assertEqual([False, True, True, True], sorted(shared for _, shared in outcomes))
+        self.assertFalse(flight.in_flight(("export", "playlist")))
+
+        self.assertEqual(({"revision": "abc"}, False), flight.do(("export", "playlist"), export))
+        self.assertEqual(2, len(calls))
+
+    def test_failures_reach_every_waiting_caller(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def analyze():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("analyzer failed")
+
+        threads, outcomes = self._join(flight, "analyze", analyze, started, 3)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(3, len(outcomes))
+        self.assertTrue(all(isinstance(outcome, RuntimeError) for outcome in outcomes))
+        self.assertEqual(("ok", False), flight.do("analyze", lambda: "ok"))
+
+
+class KeyedLockTests(unittest.TestCase):
+    def test_holders_of_one_key_take_turns(self):
+        locks = KeyedLock()
+        inside, release = threading.Event(), threading.Event()
+        order = []
+
+        def first():
+            with locks.hold("playlist"):
+                inside.set()
+                release.wait(5)
+                order.append("first")
+
+        def second():
+            with locks.hold("playlist"):
+                order.append("second")
+
+        holder = threading.Thread(target=first)
+        holder.start()
+        self.assertTrue(inside.wait(5))
+        with locks.hold("other playlist"):
+            order.append("other")
+        waiter = threading.Thread(target=second)
+        waiter.start()
+        waiter.join(0.2)
+        self.assertTrue(waiter.is_alive())
+        release.set()
+        holder.join(5)
+        waiter.join(5)
+        self.assertEqual(["other", "first", "second"], order)
+        with locks.hold("playlist"):
+            order.append("again")
+        self.assertEqual("again", order[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
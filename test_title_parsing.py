@@ -0,0 +1,35 @@
+import unittest
+
+from title_parsing import parse_episode_marker, parse_episode_title, parse_movie_title, parse_series_title
+
+
+class TitleParsingTests(unittest.TestCase):
+    def test_series_grouping_patterns(self):
+        cases = {
+            "NF - Show S01E02 - Pilot": ("Show", 1, 2, True),
+            "4K-AMZ - Show Season 2 Episode 5": ("Show", 2, 5, True),
+            "US: Show 3x04": ("Show", 3, 4, True),
+            "Show (Up to S02 Complete)": ("Show", 2, 0, True),
+            "Anime Part 7": ("Anime", 1, 7, True),
+            "Show Season 3": ("Show Season 3", 1, 1, True),
+            "EN - Film (2024)": ("Film (2024)", None, None, False),
+            "Film Ep 2024": ("Film Ep 2024", None, None, False),
+        }
+        for title, expected in cases.items():
+            with self.subTest(title=title):
+                self.assertEqual(expected, tuple(parse_series_title(title)))
+
+    def test_results_are_memoized_per_title(self):
+        parse_episode_title.cache_clear()
+        first = parse_episode_title("Show S01E02 - Pilot")
+        self.assertIs(first, parse_episode_title("Show S01E02 - Pilot"))
+        self.assertEqual(1, parse_episode_title.cache_info().hits)
+
+    def test_markers_and_movies(self):
+        self.assertEqual(("Show", 1, 2), parse_episode_marker("Show S01 E02 - Pilot"))
+        self.assertIsNone(parse_episode_marker("Plain channel"))
+        self.assertEqual(("Film (2025)", 2025), parse_movie_title("TOP - Film (2025)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
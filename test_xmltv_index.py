@@ -0,0 +1,79 @@
+import gzip
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+from lxml import etree
+
+from jellyfin_export import generate_jellyfin_export
+from xmltv_index import build_xmltv_index, index_path, load_xmltv_index
+
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="News.One" group-title="News",One
+http://provider/live/u/p/1
+#EXTINF:-1 tvg-id="sport&more" group-title="Sports",Sport
+http://provider/live/u/p/2
+"""
+
+GUIDE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE tv SYSTEM "xmltv.dtd">
+<tv generator-info-name="provider">
+  <channel id="news.one"><display-name>One</display-name></channel>
+  <channel id="skipped"><display-name>Skipped &amp; gone</display-name></channel>
+  <channel id='SPORT&amp;MORE'/>
+  <channel id="NEWS.ONE"><display-name>Duplicate</display-name></channel>
+  <programme channel="news.one" start="20260812000000 +0000" stop="20260812010000 +0000"><title>Early</title></programme>
+  <programme channel="news.one" start="20260812010000 +0000" stop="20260812020000 +0000"><title>Late</title><category>News</category></programme>
+  <programme channel="skipped" start="20260812000000 +0000"><title>Not exported</title></programme>
+  <programme channel="sport&amp;more" start="20260812000000 +0000"><title>Match &lt;Live&gt;</title></programme>
+</tv>
+"""
+
+
+def _playlist(root: Path) -> Path:
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "tv.m3u").write_text(PLAYLIST, encoding="utf-8")
+    (root / "epg.xml").write_text(GUIDE, encoding="utf-8")
+    return root
+
+
+class XmltvIndexTests(unittest.TestCase):
+    def test_indexed_trim_matches_full_parse(self):
+        with tempfile.TemporaryDirectory() as directory:
+            parsed = _playlist(Path(directory) / "parsed")
+            indexed = _playlist(Path(directory) / "indexed")
+            index = build_xmltv_index(indexed / "epg.xml")
+            self.assertEqual(1, len(index["programme"]["news.one"]))
+            self.assertIn("sport&more", index["channel"])
+
+            expected = generate_jellyfin_export(parsed)
+            with mock.patch("jellyfin_export.etree.iterparse", wraps=etree.iterparse) as full_parses:
+                manifest = generate_jellyfin_export(indexed)
+            self.assertEqual(0, full_parses.call_count)
+            self.assertEqual(expected["counts"], manifest["counts"])
+            self.assertEqual(
+                (parsed / "exports" / "jellyfin" / "default" / "epg.xml").read_bytes(),
+                (indexed / "exports" / "jellyfin" / "default" / "epg.xml").read_bytes(),
+            )
+            self.assertEqual(3, manifest["counts"]["xmltv"]["programmes"])
+            self.assertEqual(1, manifest["counts"]["xmltv"]["duplicate_channels_removed"])
+
+    def test_stale_or_unsupported_guides_are_not_indexed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = _playlist(Path(directory))
+            guide = root / "epg.xml"
+            build_xmltv_index(guide)
+            self.assertIsNotNone(load_xmltv_index(guide))
+
+            guide.write_text(GUIDE.replace("Early", "Earlier"), encoding="utf-8")
+            self.assertIsNone(load_xmltv_index(guide))
+
+            guide.write_bytes(gzip.compress(GUIDE.encode("utf-8")))
+            self.assertIsNone(build_xmltv_index(guide))
+            self.assertFalse(index_path(guide).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+"""Shared, memoized parsing of movie, series and episode titles.
+
+The analyzer reports and both Jellyfin VOD paths parse the same provider
+titles over and over (every analysis run, every export, every diagnostics
+request). All patterns are compiled once here and every parser is wrapped in
+an LRU cache keyed by the title, so a repeated title costs a dict lookup.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+import re
+from typing import NamedTuple
+
+
+TITLE_CACHE_SIZE = 1 << 17
+
+# -- Analyzer grouping (parse_series_title) ---------------------------------
+
+# Provider/quality prefixes stripped so "AMZ - Show" and "4K-AMZ - Show",
+# or "US: Show" and "UK: Show", group together.
+_GROUPING_PREFIXES = re.compile(
+    r'^(?:(?:US|UK|CA|AMZ|NF|HULU|DSNY|GR|EN|DE|IT|FR|ES|PT|PL|TR|4K|FHD|HD|SD|RAW|HEVC|VOD|VIP)\s*[-:|]\s*)+',
+    re.IGNORECASE,
+)
+_UP_TO_SEASON = re.compile(r'(.*?)\s*\(Up to\s+(?:S|Season)\s*(\d+)\s*(?:Complete|Full)\)', re.IGNORECASE)
+_UP_TO_SEASON_EPISODE = re.compile(
+    r'(.*?)\s*\(Up to\s+(?:S|Season)\s*(\d+)\s*(?:E|Ep|Episode|x)\s*(\d+)\)', re.IGNORECASE)
+_SEASON_EPISODE = re.compile(r'(.*?)(?:S|Season)\s*(\d+)\s*(?:E|Ep|Episode|x)\s*(\d+)', re.IGNORECASE)
+_UP_TO_CROSS = re.compile(r'(.*?)\s*\(Up to\s+(\d+)x(\d+)\)', re.IGNORECASE)
+_CROSS = re.compile(r'(.*?)(\d+)x(\d+)', re.IGNORECASE)
+_UP_TO_PART = re.compile(
+    r'(.*?)\s*\(Up to\s+(?:Episode|Ep|E|Part|Pt|Vol|Volume|Series)\s*(\d+)\)', re.IGNORECASE)
+_PART = re.compile(r'(.*?)(?:Episode|Ep|E|Part|Pt|Vol|Volume|Series)\s*(\d+)', re.IGNORECASE)
+_SERIES_HINT = re.compile(r'(?:\b|Up to\s+)(?:S\d+|Season \d+|Series \d+)\b', re.IGNORECASE)
+_DIGIT = re.compile(r'\d')
+
+# Numbers above this are years, not seasons or episodes
+_MAX_NUMBER = 1900
+
+# -- Jellyfin episodes (parse_episode_title) ---------------------------------
+
+_EPISODE = re.compile(r"\bS(\d{1,2})E(\d{1,3})\b", re.IGNORECASE)
+_SEASON_EPISODE_WORDS = re.compile(
+    r"\b(?:season|saison|temporada|staffel)\s*(\d{1,2})\s*[-_. ]*"
+    r"(?:episode|episodio|épisode|folge|ep)\s*(\d{1,3})\b", re.IGNORECASE
+)
+_EPISODE_WORD = re.compile(r"\b(?:episode|episodio|épisode|folge|ep)\s*(\d{1,4})\b", re.IGNORECASE)
+_DATE_EPISODE = re.compile(r"\b(20\d{2})[-._ ](0?[1-9]|1[0-2])[-._ ](0?[1-9]|[12]\d|3[01])\b")
+_PUNCTUATED_EPISODE = re.compile(r"\b(\d{1,2})\s*[xX._-]\s*(\d{1,3})\b")
+_ABSOLUTE_EPISODE = re.compile(r"(?:^|\s)[#-]\s*(\d{1,4})\b")
+_FALLBACK_EPISODE_PATTERNS = (
+    (_SEASON_EPISODE_WORDS, "season/episode words"),
+    (_DATE_EPISODE, "dated episode"),
+    (_PUNCTUATED_EPISODE, "punctuated season/episode"),
+    (_EPISODE_WORD, "absolute episode word"),
+    (_ABSOLUTE_EPISODE, "absolute episode number"),
+)
+_PREFIX = re.compile(r"^(?:TOP|NF)\s*[-:]\s*", re.IGNORECASE)
+_SUSPICIOUS_SERIES = re.compile(r"^(?:and|or|the)\b", re.IGNORECASE)
+_PARENTHESIZED = re.compile(r"\([^)]*\)")
+_YEAR = re.compile(r"\((19\d{2}|20\d{2})\)")
+
+# -- Simple "S01E02" markers used by the analyzer's lazy pages -----------------
+
+_MARKER = re.compile(r"S(\d+)\s*E(\d+)", re.IGNORECASE)
+
+
+class SeriesTitle(NamedTuple):
+    series_name: str
+    season: int | None
+    episode: int | None
+    is_series: bool
+
+
+def _series(name: str, season: int, episode: int) -> SeriesTitle:
+    return SeriesTitle(name.strip(" -:"), season, episode, True)
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def parse_series_title(title: str) -> SeriesTitle:
+    """Series name, season and episode used to group titles in analysis reports.
+
+    Patterns are tried in order: "(Up to S02 Complete)", "S01E01"/"Season 1
+    Episode 1", "1x01", "Episode 1"/"Part 1"/"Vol 1", then a bare "S01" or
+    "Season 1" hint. Each "Up to" variant is tried before its plain form, and
+    a number above 1900 is treated as a year, so that pattern is skipped.
+    """
+    clean_title = _GROUPING_PREFIXES.sub('', title).strip()
+    if not _DIGIT.search(clean_title):
+        # Every pattern below needs a number
+        return SeriesTitle(clean_title or title, None, None, False)
+    up_to = 'up to' in clean_title.lower()
+
+    if up_to:
+        match = _UP_TO_SEASON.search(clean_title)
+        if match and int(match.group(2)) <= _MAX_NUMBER:
+            # 0 = complete season, no specific episode
+            return _series(match.group(1), int(match.group(2)), 0)
+
+    for pattern in ((_UP_TO_SEASON_EPISODE, _SEASON_EPISODE, _UP_TO_CROSS, _CROSS) if up_to
+                    else (_SEASON_EPISODE, _CROSS)):
+        match = pattern.search(clean_title)
+        if match:
+            season, episode = int(match.group(2)), int(match.group(3))
+            if season <= _MAX_NUMBER and episode <= _MAX_NUMBER:
+                return _series(match.group(1), season, episode)
+
+    for pattern in (_UP_TO_PART, _PART) if up_to else (_PART,):
+        match = pattern.search(clean_title)
+        if match and int(match.group(2)) <= _MAX_NUMBER:
+            # Season 1 unless the title says otherwise
+            return _series(match.group(1), 1, int(match.group(2)))
+
+    if _SERIES_HINT.search(clean_title):
+        # Series indicators we could not parse: default season/episode
+        return SeriesTitle(clean_title, 1, 1, True)
+
+    return SeriesTitle(clean_title or title, None, None, False)
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def parse_episode_marker(title: str) -> tuple[str, int, int] | None:
+    """The text before the first "S01E02" (or "S01 E02") marker, plus its numbers."""
+    match = _MARKER.search(title)
+    if match is None:
+        return None
+    return title[:match.start()].strip(), int(match.group(1)), int(match.group(2))
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def parse_movie_title(name: str) -> tuple[str, int | None]:
+    """Movie title without the provider prefix, and its "(YYYY)" year if any."""
+    name = _PREFIX.sub("", name).strip()
+    match = _YEAR.search(name)
+    return name, int(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def parse_episode_title(name: str) -> tuple[str, int, int, str, str] | None:
+    """Series, season, episode, episode title and a parse note for Jellyfin.
+
+    Returns None when the title has no supported episode marker.
+    """
+    matches = list(_EPISODE.finditer(name))
+    if not matches:
+        match, parse_note = next(
+            ((match, note) for match, note in
+             ((pattern.search(name), note) for pattern, note in _FALLBACK_EPISODE_PATTERNS) if match),
+            (None, ""),
+        )
+        if match is None:
+            return None
+        series = _PREFIX.sub("", name[:match.start()].strip(" -_.:|"))
+        if not series:
+            return None
+        if parse_note == "dated episode":
+            season = int(match.group(1))
+            episode = (int(match.group(2)) * 100) + int(match.group(3))
+        elif match.lastindex == 2:
+            season, episode = int(match.group(1)), int(match.group(2))
+        else:
+            season, episode = 1, int(match.group(1))
+        episode_title = name[match.end():].strip(" -_.:|") or f"Episode {episode}"
+        return series, season, episode, episode_title, parse_note
+    first, last = matches[0], matches[-1]
+    series = _PREFIX.sub("", name[:first.start()].strip(" -"))
+    parse_note = "primary episode marker"
+    # Some providers prepend a truncated title, then repeat the real show name
+    # before a second SxxExx marker. Prefer that repeated value when the first
+    # title visibly begins mid-phrase, retaining useful year/country suffixes.
+    if len(matches) > 1 and (_SUSPICIOUS_SERIES.search(series) or len(series) < 4):
+        repeated = name[first.end():last.start()].strip(" -")
+        repeated = _PREFIX.sub("", repeated).strip(" -")
+        if repeated:
+            suffix = " ".join(_PARENTHESIZED.findall(series))
+            if suffix and suffix not in repeated:
+                repeated = f"{repeated} {suffix}"
+            series = repeated
+            parse_note = "recovered from repeated title after truncated prefix"
+    episode_title = name[last.end():].strip(" -") or f"Episode {int(last.group(2))}"
+    episode_title = _PREFIX.sub("", episode_title)
+    return series, int(last.group(1)), int(last.group(2)), episode_title, parse_note
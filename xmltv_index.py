@@ -0,0 +1,146 @@
+"""Byte-range index of an XMLTV file's <channel> and <programme> elements.
+
+Provider guides run to gigabytes while a Jellyfin profile usually wants a few
+hundred channels. The index is built once, when the guide is downloaded, by a
+regex scan over a memory map (no XML parsing). It records where each channel
+id's elements start and end, so an export can parse only the selected ranges
+instead of every element in the file. An index that no longer matches the
+guide's size and mtime is ignored, and callers fall back to a full parse.
+"""
+
+from __future__ import annotations
+
+import html
+import json
+import mmap
+from pathlib import Path
+import re
+from typing import Iterator
+
+from lxml import etree
+
+
+INDEX_VERSION = 1
+# Neighbouring ranges are parsed together up to this many bytes
+MAX_CHUNK_BYTES = 8 * 1024 * 1024
+
+_START_TAG = re.compile(rb"<(channel|programme)\b[^>]*>")
+_ID_ATTRIBUTE = {
+    b"channel": re.compile(rb"""\sid\s*=\s*(["'])(.*?)\1""", re.DOTALL),
+    b"programme": re.compile(rb"""\schannel\s*=\s*(["'])(.*?)\1""", re.DOTALL),
+}
+_ENCODING = re.compile(rb"""^\s*<\?xml[^>]*encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+# Only whitespace may sit between two ranges that are merged into one
+_MAX_MERGE_GAP = 64
+
+
+def index_path(source: Path) -> Path:
+    return source.with_name(f"{source.name}.index.json")
+
+
+def _add_range(ranges: dict[str, list[list[int]]], key: str, start: int, end: int, data) -> None:
+    spans = ranges.setdefault(key, [])
+    if spans:
+        previous_end = spans[-1][1]
+        if 0 <= start - previous_end <= _MAX_MERGE_GAP and not data[previous_end:start].strip():
+            spans[-1][1] = end
+            return
+    spans.append([start, end])
+
+
+def build_xmltv_index(source: Path) -> dict | None:
+    """Scan ``source`` and write its index next to it.
+
+    Returns the index, or None (removing any old index) when the file is not
+    a plain XMLTV document this scanner can handle, e.g. gzip data or UTF-16.
+    """
+    source = Path(source)
+    destination = index_path(source)
+    stat = source.stat()
+    index = None
+    if stat.st_size:
+        with source.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            index = _scan(data)
+    if index is None:
+        destination.unlink(missing_ok=True)
+        return None
+    index["source"] = {"bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    staged = destination.with_name(f".{destination.name}.tmp")
+    staged.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+    staged.replace(destination)
+    return index
+
+
+def _scan(data) -> dict | None:
+    head = data[:256]
+    if head.startswith((b"\x1f\x8b", b"\xff\xfe", b"\xfe\xff")) or b"<tv" not in data[:64 * 1024]:
+        return None
+    declared = _ENCODING.match(head)
+    encoding = declared.group(1).decode("ascii") if declared else "utf-8"
+    ranges = {"channel": {}, "programme": {}}
+    position = 0
+    while True:
+        match = _START_TAG.search(data, position)
+        if match is None:
+            break
+        tag = match.group(1)
+        start_tag = match.group(0)
+        if start_tag.endswith(b"/>"):
+            end = match.end()
+        else:
+            closing = b"</" + tag + b">"
+            close = data.find(closing, match.end())
+            if close < 0:
+                return None
+            end = close + len(closing)
+        attribute = _ID_ATTRIBUTE[tag].search(start_tag)
+        value = attribute.group(2).decode(encoding, "replace") if attribute else ""
+        key = html.unescape(value).strip().casefold()
+        _add_range(ranges[tag.decode("ascii")], key, match.start(), end, data)
+        position = end
+    return {"version": INDEX_VERSION, "encoding": encoding, **ranges}
+
+
+def load_xmltv_index(source: Path) -> dict | None:
+    """The index for ``source`` if one exists and still matches the file."""
+    source = Path(source)
+    try:
+        index = json.loads(index_path(source).read_text(encoding="utf-8"))
+        stat = source.stat()
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("source") != {
+        "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+    }:
+        return None
+    return index
+
+
+def iter_indexed_elements(source: Path, index: dict, folded_ids: set[str]) -> Iterator[etree._Element]:
+    """Yield the <channel> and <programme> elements of ``folded_ids`` in file order."""
+    spans = sorted(
+        span
+        for kind in ("channel", "programme")
+        for folded in folded_ids
+        for span in index[kind].get(folded, ())
+    )
+    parser = etree.XMLParser(recover=True, huge_tree=True, encoding=index["encoding"])
+    with Path(source).open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        chunks: list[list[int]] = []
+        for start, end in spans:
+            if (
+                chunks and 0 <= start - chunks[-1][1] <= _MAX_MERGE_GAP
+                and end - chunks[-1][0] <= MAX_CHUNK_BYTES
+                and not data[chunks[-1][1]:start].strip()
+            ):
+                chunks[-1][1] = end
+            else:
+                chunks.append([start, end])
+        for start, end in chunks:
+            # Keep the whitespace tail a full parse would give the last element
+            while end < len(data) and data[end:end + 1] in b" \t\r\n":
+                end += 1
+            root = etree.fromstring(b"<tv>" + data[start:end] + b"</tv>", parser)
+            if root is not None:
+                # Callers clear and detach elements as they go, so iterate over a copy
+                yield from [child for child in root if child.tag in ("channel", "programme")]